@@ -0,0 +1,131 @@
+import csv
+import hmac
+import io
+import json
+import logging
+from datetime import date, timedelta
+from functools import partial
+from typing import Literal
+
+from decouple import config
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from clients import get_supabase
+from keyset import keyset_pages
+from metrics import timed, record_error
+from payments import registration_stats
+
+
+log = logging.getLogger(__name__)
+
+EXPORT_PAGE_SIZE = int(config("EXPORT_PAGE_SIZE", default="1000"))
+EXPORT_COLUMNS = (
+    "id", "created_at", "name", "email", "phone", "tier", "amount_paid",
+    "location", "conference_date", "college", "type",
+)
+
+
+def admin_token() -> str:
+    return config("ADMIN_TOKEN", default="")
+
+
+def require_admin(x_admin_token: str = Header(default="")):
+    """Admin routes need the X-Admin-Token header to match ADMIN_TOKEN."""
+    expected = admin_token()
+    if not expected:
+        raise HTTPException(status_code=503, detail="Admin API is not configured")
+    if not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@timed("supabase.export_page")
+async def fetch_page(after_id: int, limit: int, tier: str | None, type_: str | None, date_from: date | None, date_to: date | None) -> list[dict]:
+    """One keyset page: rows with id > after_id, in id order."""
+    query = get_supabase().table("registrations").select(",".join(EXPORT_COLUMNS)).gt("id", after_id)
+    if tier:
+        query = query.eq("tier", tier)
+    if type_:
+        query = query.eq("type", type_)
+    if date_from:
+        query = query.gte("created_at", date_from.isoformat())
+    if date_to:
+        query = query.lt("created_at", (date_to + timedelta(days=1)).isoformat())
+    res = await query.order("id").limit(limit).execute()
+    return res.data or []
+
+
+def encode_csv(rows: list[dict], header: bool) -> str:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+def encode_ndjson(rows: list[dict]) -> str:
+    return "".join(json.dumps(row, default=str) + "\n" for row in rows)
+
+
+@router.get("/registrations/export")
+async def export_registrations(
+    format: Literal["csv", "ndjson"] = "csv",
+    tier: str | None = None,
+    type: str | None = None,
+    date_from: date | None = Query(default=None, description="created on or after (YYYY-MM-DD)"),
+    date_to: date | None = Query(default=None, description="created on or before (YYYY-MM-DD)"),
+    page_size: int = Query(default=EXPORT_PAGE_SIZE, ge=1, le=10000),
+):
+    """
+    Stream the registrations table as CSV or NDJSON.
+
+    Pages through Supabase with keyset pagination on id (id > last seen),
+    so each page costs the same however deep into the table it is, and
+    writes each page out as soon as it arrives. Only one or two pages are
+    held in memory at a time.
+    """
+    filters = {"tier": tier, "type_": type, "date_from": date_from, "date_to": date_to}
+    # Fetch the first page up front so a Supabase failure is still a clean 502
+    try:
+        first = await fetch_page(0, page_size, **filters)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Could not read registrations: {e}")
+
+    async def body():
+        count = 0
+        try:
+            async for page in keyset_pages(partial(fetch_page, **filters), page_size, first=first, prefetch=True):
+                yield encode_csv(page, header=count == 0) if format == "csv" else encode_ndjson(page)
+                count += len(page)
+            if format == "csv" and count == 0:
+                yield encode_csv([], header=True)
+            log.info("export finished", extra={"rows": count, "format": format})
+        except Exception as e:
+            # headers are gone already; the client sees a truncated file
+            record_error("admin.export")
+            log.error("export failed", extra={"rows": count, "error": str(e)})
+            if format == "ndjson":
+                yield json.dumps({"error": str(e), "rows_sent": count}) + "\n"
+
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="registrations.{format}"'},
+    )
+
+
+@router.get("/registrations/stats")
+async def registration_stats_summary(top_colleges: int = Query(default=50, ge=1, le=1000)):
+    """
+    Live registration counts (total, revenue, by tier / type / college).
+
+    Served from running totals kept by store_registration, so a dashboard
+    can poll this freely; `reconciled_at` is when they were last recounted
+    from Supabase.
+    """
+    return registration_stats.snapshot(top_colleges)
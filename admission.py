@@ -0,0 +1,186 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from decouple import config
+from starlette.responses import JSONResponse
+
+import metrics
+from shared_state import StateBackend, get_state
+
+
+# "path=rate/burst" pairs; rate is tokens per second per client IP. The
+# defaults allow one browser a burst of 5 coupon checks (then 1/s), 20
+# quotes (then 5/s) and 3 batch quotes (then 1/s). Everything behind one
+# NAT or proxy IP shares a bucket (see TRUST_FORWARDED_FOR); set
+# RATE_LIMITS= (empty) to turn rate limiting off, e.g. for load tests.
+RATE_LIMITS = config(
+    "RATE_LIMITS",
+    default="/payments/validate-coupon=1/5,/payments/quote=5/20,/payments/quote/batch=1/3",
+)
+RATE_LIMIT_MAX_CLIENTS = int(config("RATE_LIMIT_MAX_CLIENTS", default="100000"))
+# in-flight caps; over the cap a request is shed with 503 instead of queueing
+MAX_INFLIGHT = int(config("MAX_INFLIGHT", default="500"))
+MAX_INFLIGHT_LIMITED = int(config("MAX_INFLIGHT_LIMITED", default="100"))
+TRUST_FORWARDED_FOR = config("TRUST_FORWARDED_FOR", default=False, cast=bool)
+# never limited, so monitoring keeps working while the app sheds load
+EXEMPT_PATHS = {"/metrics", "/health"}
+
+
+def parse_rate_limits(spec: str) -> dict[str, tuple[float, float]]:
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        path, _, rule = item.strip().partition("=")
+        rate, _, burst = rule.partition("/")
+        limits[path.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key (client IP). Buckets refill at `rate` tokens per
+    second up to `burst`; each request takes one token.
+
+    Only the `max_keys` most recently seen keys are kept. An evicted key
+    comes back with a full bucket, which is what it would have refilled to
+    anyway unless it was evicted within burst/rate seconds.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Take a token. Returns 0 if allowed, otherwise seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    async def aacquire(self, key: str) -> float:
+        return self.acquire(key)
+
+
+class SharedTokenBucketLimiter:
+    """
+    Same buckets, kept in the shared state backend so a client's rate is
+    counted across every worker rather than per worker. If the backend is
+    unreachable the request is let through; rate limiting is not worth an
+    outage.
+    """
+
+    def __init__(self, state: StateBackend, name: str, rate: float, burst: float):
+        self.state = state
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+    async def aacquire(self, key: str) -> float:
+        try:
+            return await self.state.atake_token(f"rate:{self.name}:{key}", self.rate, self.burst)
+        except Exception:
+            metrics.record_error("state.rate_limit")
+            return 0.0
+
+
+class AdmissionMiddleware:
+    """
+    Plain ASGI middleware that rejects work before it reaches a route.
+
+    - Rate-limited paths (RATE_LIMITS) get a token bucket per client IP;
+      an empty bucket answers 429 with Retry-After. Buckets live in the
+      shared state backend when there is one, in process memory otherwise.
+    - At most MAX_INFLIGHT requests run at once, and at most
+      MAX_INFLIGHT_LIMITED of those on rate-limited paths; anything over
+      the cap answers 503 straight away, so overload shows up as fast
+      rejections instead of a growing queue. The cap is checked first, so
+      a slow shared backend can't pile requests up behind the limiter.
+    """
+
+    def __init__(
+        self,
+        app,
+        limits: dict[str, tuple[float, float]] | None = None,
+        max_inflight: int = MAX_INFLIGHT,
+        max_inflight_limited: int = MAX_INFLIGHT_LIMITED,
+        max_clients: int = RATE_LIMIT_MAX_CLIENTS,
+        trust_forwarded_for: bool = TRUST_FORWARDED_FOR,
+        state: StateBackend | None = None,
+    ):
+        self.app = app
+        limits = parse_rate_limits(RATE_LIMITS) if limits is None else limits
+        state = get_state() if state is None else state
+        self.limiters = {
+            path: (
+                SharedTokenBucketLimiter(state, path, rate, burst) if state.shared
+                else TokenBucketLimiter(rate, burst, max_clients)
+            )
+            for path, (rate, burst) in limits.items()
+        }
+        self.max_inflight = max_inflight
+        self.max_inflight_limited = max_inflight_limited
+        self.trust_forwarded_for = trust_forwarded_for
+        # only touched from the event loop, so plain ints are enough
+        self.inflight = 0
+        self.inflight_limited = 0
+
+    def client_ip(self, scope) -> str:
+        if self.trust_forwarded_for:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+        limiter = self.limiters.get(path)
+        # unconfigured paths share one label so random URLs can't add series
+        label = path if limiter is not None else "other"
+
+        # counted before the limiter: a shared-backend limiter waits on the
+        # blocking pool, and requests waiting there must count against the cap
+        if self.inflight >= self.max_inflight or (limiter is not None and self.inflight_limited >= self.max_inflight_limited):
+            metrics.admission_rejected.inc("overloaded", label)
+            return await self.reject(503, "Server busy, please retry", 1, scope, receive, send)
+
+        self.inflight += 1
+        if limiter is not None:
+            self.inflight_limited += 1
+        try:
+            if limiter is not None:
+                wait = await limiter.aacquire(self.client_ip(scope))
+                if wait:
+                    metrics.admission_rejected.inc("rate_limited", label)
+                    return await self.reject(429, "Too many requests", wait, scope, receive, send)
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
+            if limiter is not None:
+                self.inflight_limited -= 1
+
+    async def reject(self, status: int, detail: str, retry_after: float, scope, receive, send):
+        response = JSONResponse(
+            {"detail": detail},
+            status_code=status,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        await response(scope, receive, send)
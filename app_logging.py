@@ -0,0 +1,195 @@
+import contextvars
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from decouple import config
+
+
+LOG_LEVEL = config("LOG_LEVEL", default="INFO")
+LOG_FORMAT = config("LOG_FORMAT", default="json")   # "json" or "text"
+LOG_QUEUE_SIZE = int(config("LOG_QUEUE_SIZE", default="10000"))
+# share of high-volume success records (logged with extra={"sample": True}) that are kept
+LOG_SAMPLE_RATE = float(config("LOG_SAMPLE_RATE", default="0.1"))
+LOG_REDACT_PII = config("LOG_REDACT_PII", default=True, cast=bool)
+
+PII_FIELDS = {"email", "to", "to_email", "phone", "phones", "name"}
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="")
+
+_EMAIL = re.compile(r"([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9.-]+)")
+_PHONE = re.compile(r"(?<![\d+])\+?\d{10,12}(?!\d)")
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "fields", "sample"}
+
+
+def mask_email(value: str) -> str:
+    return _EMAIL.sub(r"\1***@\2", value)
+
+
+def mask_phone(value: str) -> str:
+    digits = re.sub(r"\D", "", value)
+    return "*" * max(len(digits) - 4, 0) + digits[-4:]
+
+
+def redact_text(text: str) -> str:
+    return _PHONE.sub(lambda m: mask_phone(m.group()), mask_email(text))
+
+
+def redact_value(key: str, value):
+    if value is None:
+        return value
+    if key not in PII_FIELDS:
+        # free text (error messages from Supabase/SMTP, ...) often quotes the email or phone
+        return redact_text(value) if isinstance(value, str) else value
+    if key == "name":
+        return str(value)[:1] + "***"
+    if key in ("phone", "phones"):
+        return ",".join(mask_phone(p) for p in str(value).split(","))
+    return mask_email(str(value))
+
+
+class ContextFilter(logging.Filter):
+    """Runs in the caller's thread, before queueing: stamps the request id and applies sampling."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sample", False) and random.random() >= self.sample_rate:
+            return False
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; PII is masked in the message, every field and tracebacks."""
+
+    def __init__(self, redact: bool = True):
+        super().__init__()
+        self.redact = redact
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        fields = dict(getattr(record, "fields", None) or {})
+        fields.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if self.redact:
+            message = redact_text(message)
+            fields = {k: redact_value(k, v) for k, v in fields.items()}
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": message,
+        }
+        if getattr(record, "request_id", ""):
+            out["request_id"] = record.request_id
+        out.update(fields)
+        exc = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if exc:
+            out["exc"] = redact_text(exc) if self.redact else exc
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+class TextFormatter(JsonFormatter):
+    """Human-readable variant for local runs (LOG_FORMAT=text)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = json.loads(super().format(record))
+        head = f"{data.pop('ts')} {data.pop('level'):<7} {data.pop('logger')}: {data.pop('msg')}"
+        exc = data.pop("exc", None)
+        tail = " ".join(f"{k}={v}" for k, v in data.items())
+        return "\n".join(filter(None, [f"{head} {tail}".rstrip(), exc]))
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: if the listener falls behind, records are dropped and counted."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only stringify what can't cross threads safely; formatting and
+        # redaction happen on the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: QueueListener | None = None
+
+
+def configure():
+    """
+    Route the root logger through a bounded queue to a background listener
+    that formats and writes to stdout. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter(LOG_REDACT_PII) if LOG_FORMAT == "text" else JsonFormatter(LOG_REDACT_PII))
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    handler.addFilter(ContextFilter(LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    # one line per outbound call is noise; our own stage metrics cover it
+    for name in ("httpx", "httpcore", "hpack"):
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown():
+    """Drain the queue; call on the way out so the last records aren't lost."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """Plain ASGI middleware: takes X-Request-ID (or makes one), exposes it to logs and echoes it back."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        rid = ""
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                rid = value.decode("latin-1")[:64]
+                break
+        rid = rid or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        token = request_id.set(rid)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
@@ -0,0 +1,110 @@
+"""
+Latency under overload, with and without AdmissionMiddleware.
+
+Offers --rps requests per second for --duration seconds to POST
+/payments/validate-coupon, in-process (no network), from --clients distinct
+IPs. The route is a stand-in whose only work is a Supabase count query that
+takes --latency seconds and can serve --db-slots queries at once, so the
+"database" tops out at db_slots / latency requests per second.
+
+Without admission control every request past that rate waits its turn, and
+latency grows with the backlog for as long as the overload lasts. With it, the excess is turned away with 429/503 in well
+under a millisecond and admitted requests keep roughly the unloaded latency.
+
+    python benchmarks/admission_overload.py --rps 1000 --duration 3 --clients 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from admission import AdmissionMiddleware
+
+
+def coupon_app(latency: float, db_slots: int) -> FastAPI:
+    app = FastAPI()
+    db = asyncio.Semaphore(db_slots)
+
+    @app.post("/payments/validate-coupon")
+    async def validate_coupon():
+        async with db:
+            await asyncio.sleep(latency)  # stands in for the FREE count query
+        return {"valid": True}
+
+    return app
+
+
+def percentile(samples: list[float], p: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+async def drive(app, rps: float, duration: float, clients: int) -> tuple[dict[int, list[float]], float]:
+    """Open-loop load: a new request every 1/rps seconds, whether or not earlier ones finished."""
+    by_status: dict[int, list[float]] = {}
+    transports = [httpx.ASGITransport(app=app, client=(f"10.0.0.{i}", 1234)) for i in range(clients)]
+    sessions = [httpx.AsyncClient(transport=t, base_url="http://bench") for t in transports]
+
+    async def one(i: int):
+        start = time.perf_counter()
+        resp = await sessions[i % clients].post("/payments/validate-coupon", json={"coupon": "GUESS"})
+        by_status.setdefault(resp.status_code, []).append(time.perf_counter() - start)
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(rps * duration)):
+        delay = start + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    for s in sessions:
+        await s.aclose()
+    return by_status, elapsed
+
+
+def report(name: str, by_status: dict[int, list[float]], elapsed: float):
+    total = sum(len(v) for v in by_status.values())
+    print(f"\n{name}: {total} requests in {elapsed:.2f}s")
+    for status, samples in sorted(by_status.items()):
+        ms = [s * 1000 for s in samples]
+        print(
+            f"  {status}: n={len(ms):5d}  p50 {statistics.median(ms):8.1f} ms"
+            f"  p95 {percentile(ms, 0.95):8.1f} ms  p99 {percentile(ms, 0.99):8.1f} ms  max {max(ms):8.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=1000, help="offered load")
+    parser.add_argument("--duration", type=float, default=3)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--db-slots", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=1, help="tokens per second per client")
+    parser.add_argument("--burst", type=float, default=5)
+    parser.add_argument("--max-inflight", type=int, default=20)
+    args = parser.parse_args()
+
+    plain = coupon_app(args.latency, args.db_slots)
+    guarded = AdmissionMiddleware(
+        coupon_app(args.latency, args.db_slots),
+        limits={"/payments/validate-coupon": (args.rate, args.burst)},
+        max_inflight=args.max_inflight,
+        max_inflight_limited=args.max_inflight,
+    )
+
+    report("no admission control", *asyncio.run(drive(plain, args.rps, args.duration, args.clients)))
+    report("admission control", *asyncio.run(drive(guarded, args.rps, args.duration, args.clients)))
+
+
+if __name__ == "__main__":
+    main()
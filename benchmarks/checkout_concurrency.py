@@ -0,0 +1,94 @@
+"""
+Concurrent checkouts per worker: async router vs. the old blocking style.
+
+Drives POST /payments/create-order in-process (no network) against a fake
+Razorpay that answers after --latency seconds. The "blocking" baseline is a
+sync route doing the same wait with time.sleep, which is what the old
+razorpay SDK call looked like to uvicorn: one threadpool slot per request.
+
+    python benchmarks/checkout_concurrency.py --requests 400 --concurrency 200 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for key, value in {
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_KEY": "bench",
+    "RAZORPAY_KEY_ID": "rzp_bench",
+    "RAZORPAY_SECRET": "bench",
+    "TICKET_SECRET": "bench",
+}.items():
+    os.environ.setdefault(key, value)
+
+import httpx
+from fastapi import FastAPI
+
+import clients
+import payments
+from razorpay_async import AsyncRazorpayClient
+
+
+def fake_razorpay(latency: float) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={"id": "order_bench", "amount": 100000, "notes": {}})
+    return httpx.MockTransport(handler)
+
+
+def blocking_app(latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/payments/create-order")
+    def create_order(body: payments.CreateOrderRequest):
+        time.sleep(latency)  # stands in for the blocking SDK call
+        return {"order": {"id": "order_bench"}}
+
+    return app
+
+
+def async_app(latency: float) -> FastAPI:
+    clients.configure(razorpay=AsyncRazorpayClient(auth=("rzp_bench", "bench"), transport=fake_razorpay(latency)))
+    app = FastAPI()
+    app.include_router(payments.router, prefix="/payments")
+    return app
+
+
+async def drive(app: FastAPI, requests: int, concurrency: int) -> tuple[float, float]:
+    body = {"name": "Bench", "email": "bench@example.com", "phone": 9000000000}
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        async def one():
+            async with gate:
+                start = time.perf_counter()
+                resp = await http.post("/payments/create-order", json=body)
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return requests / elapsed, latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Razorpay latency in seconds")
+    args = parser.parse_args()
+
+    for name, app in (("blocking", blocking_app(args.latency)), ("async", async_app(args.latency))):
+        rps, p95 = asyncio.run(drive(app, args.requests, args.concurrency))
+        print(f"{name:>9}: {rps:8.1f} checkouts/s   p95 {p95 * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
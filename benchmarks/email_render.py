@@ -0,0 +1,111 @@
+"""
+Confirmation email rendering: precompiled template vs. the old per-call f-string.
+
+The "legacy" path rebuilds the whole HTML body with string formatting and wraps
+it in MIMEMultipart("alternative") + MIMEText, as send_ack_email used to. The
+"compiled" path is what send_ack_email does now: the precompiled template
+plus build_message, which base64-encodes the body in C. Both build
+--messages complete messages; rendering and message construction are also
+timed alone, and "wire" adds the as_bytes() flattening smtplib does on
+send (one text part flattens faster than a multipart wrapper).
+
+    python benchmarks/email_render.py --messages 10000
+"""
+import argparse
+import os
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_templates
+
+
+with open(os.path.join(email_templates.TEMPLATE_DIR, "registration_confirmation.html"), encoding="utf-8") as f:
+    # Same text the old f-string produced, with {{ field }} turned back into {field}
+    LEGACY_SOURCE = f.read().replace("{{ ", "{").replace(" }}", "}")
+
+
+def legacy_render(values: dict) -> str:
+    return LEGACY_SOURCE.format(**values)
+
+
+def legacy_message(to: str, body: str):
+    msg = MIMEMultipart("alternative")
+    msg["From"] = "bench@example.com"
+    msg["To"] = to
+    msg["Subject"] = email_templates.CONFIRMATION_SUBJECT
+    msg["Bcc"] = "sgpsmm@sgprs.com"
+    msg.attach(MIMEText(body, "html"))
+    return msg
+
+
+def compiled_message(to: str, body: str):
+    return email_templates.build_message(
+        subject=email_templates.CONFIRMATION_SUBJECT,
+        sender="bench@example.com",
+        to=to,
+        body=body,
+        bcc="sgpsmm@sgprs.com",
+    )
+
+
+def attendees(n: int) -> list[dict]:
+    return [
+        {
+            "name": f"Attendee {i} <O'Brien & Co>",
+            "tier": "Group (12)",
+            "location": "T-HUB",
+            "conference_date": "2025-10-26",
+            "final_amount": "300",
+            "ticket": "IP1.eyJpZCI6IlZ0aGJQaUh2Z0pVYiIsImUiOiJhQGV4YW1wbGUuY29tIn0.Hn3kVqO2rQyJ7c1bTq8Z0w",
+        }
+        for i in range(n)
+    ]
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10_000)
+    args = parser.parse_args()
+    rows = attendees(args.messages)
+
+    legacy_bodies = [legacy_render(r) for r in rows]
+    compiled_bodies = email_templates.render_confirmations(rows)
+
+    results = {
+        "render legacy": timed(lambda: [legacy_render(r) for r in rows]),
+        "render compiled": timed(lambda: [email_templates.REGISTRATION_CONFIRMATION.render(r) for r in rows]),
+        "render compiled batch": timed(lambda: email_templates.render_confirmations(rows)),
+        "message legacy": timed(lambda: [legacy_message("a@example.com", b) for b in legacy_bodies]),
+        "message compiled": timed(lambda: [compiled_message("a@example.com", b) for b in compiled_bodies]),
+        "end-to-end legacy": timed(lambda: [legacy_message("a@example.com", legacy_render(r)) for r in rows]),
+        "end-to-end compiled": timed(lambda: [
+            compiled_message("a@example.com", b) for b in email_templates.render_confirmations(rows)
+        ]),
+        "wire legacy": timed(lambda: [
+            legacy_message("a@example.com", legacy_render(r)).as_bytes() for r in rows
+        ]),
+        "wire compiled": timed(lambda: [
+            compiled_message("a@example.com", b).as_bytes() for b in email_templates.render_confirmations(rows)
+        ]),
+    }
+
+    for name, seconds in results.items():
+        per_msg = seconds / args.messages * 1e6
+        print(f"{name:>22}: {seconds * 1000:9.1f} ms total  {per_msg:8.2f} us/msg")
+    for stage in ("render", "message", "end-to-end", "wire"):
+        compiled = results[f"{stage} compiled batch"] if stage == "render" else results[f"{stage} compiled"]
+        print(f"{stage + ' speedup':>22}: {results[f'{stage} legacy'] / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
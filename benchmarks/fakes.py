@@ -0,0 +1,266 @@
+"""
+Local stand-ins for the services the API talks to, for benchmarks.
+
+- fake_razorpay_app: the /v1/orders and /v1/payments endpoints the app uses
+- fake_supabase_app: enough of PostgREST (/rest/v1/<table>) for inserts,
+  exact counts and simple eq/gt/gte/lt/lte filters with order + limit
+- start_smtp_sink: an aiosmtpd sink that only counts messages
+
+Every fake takes a `latency` (seconds) added to each request, so runs can
+model a slow upstream; the Razorpay fake can also change it (and inject
+errors) mid-run. serve() runs an ASGI app on a background thread.
+"""
+import asyncio
+import itertools
+import json
+import random
+import socket
+import threading
+import time
+import warnings
+
+import uvicorn
+from fastapi import FastAPI, Query, Request, Response
+from starlette.datastructures import QueryParams
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ServerThread:
+    def __init__(self, app, port: int | None = None, **uvicorn_kwargs):
+        self.port = port or free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", **uvicorn_kwargs)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        scheme = "https" if self.server.config.ssl_keyfile else "http"
+        return f"{scheme}://127.0.0.1:{self.port}"
+
+    def start(self) -> "ServerThread":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(5)
+
+
+def serve(app, **kwargs) -> ServerThread:
+    return ServerThread(app, **kwargs).start()
+
+
+def fake_razorpay_app(latency: float = 0.0) -> FastAPI:
+    """
+    Orders and payments API stand-in. app.state.latency and
+    app.state.error_rate (share of calls answered 503) can be changed while
+    it runs to inject faults. app.state.capture(order_id) plays the part of
+    the customer paying: it marks the order paid and adds a captured payment.
+    """
+    app = FastAPI()
+    app.state.orders = {}
+    app.state.payments = {}
+    app.state.latency = latency
+    app.state.error_rate = 0.0
+    ids = itertools.count(1)
+    payment_ids = itertools.count(1)
+
+    def capture(order_id: str, at: int | None = None) -> dict:
+        order = app.state.orders[order_id]
+        order.update(status="paid", amount_paid=order["amount"])
+        payment_id = f"pay_{next(payment_ids):014d}"
+        payment = {
+            "id": payment_id,
+            "entity": "payment",
+            "amount": order["amount"],
+            "currency": order["currency"],
+            "status": "captured",
+            "order_id": order_id,
+            "created_at": at or int(time.time()),
+        }
+        app.state.payments[payment_id] = payment
+        return payment
+
+    app.state.capture = capture
+
+    def page(items, start: int | None, end: int | None, count: int, skip: int) -> dict:
+        # newest first, like Razorpay
+        selected = sorted(
+            (i for i in items if (start is None or i["created_at"] >= start) and (end is None or i["created_at"] <= end)),
+            key=lambda i: (i["created_at"], i["id"]),
+            reverse=True,
+        )[skip:skip + min(count, 100)]
+        return {"entity": "collection", "count": len(selected), "items": selected}
+
+    async def fault() -> Response | None:
+        await asyncio.sleep(app.state.latency)
+        if app.state.error_rate and random.random() < app.state.error_rate:
+            return Response(
+                json.dumps({"error": {"code": "SERVER_ERROR", "description": "Injected failure"}}),
+                status_code=503,
+                media_type="application/json",
+            )
+        return None
+
+    @app.post("/v1/orders")
+    async def create(request: Request):
+        data = await request.json()
+        if failed := await fault():
+            return failed
+        order_id = f"order_{next(ids):014d}"
+        order = {
+            "id": order_id,
+            "entity": "order",
+            "amount": data["amount"],
+            "amount_paid": 0,
+            "currency": data.get("currency", "INR"),
+            "status": "created",
+            "notes": data.get("notes", {}),
+            "created_at": int(time.time()),
+        }
+        app.state.orders[order_id] = order
+        return order
+
+    @app.get("/v1/orders/{order_id}")
+    async def fetch(order_id: str):
+        if failed := await fault():
+            return failed
+        order = app.state.orders.get(order_id)
+        if order is None:
+            return Response(
+                json.dumps({"error": {"code": "BAD_REQUEST_ERROR", "description": "The id provided does not exist"}}),
+                status_code=400,
+                media_type="application/json",
+            )
+        return order
+
+    @app.get("/v1/orders")
+    async def list_orders(count: int = 10, skip: int = 0, from_: int | None = Query(default=None, alias="from"), to: int | None = None):
+        if failed := await fault():
+            return failed
+        return page(app.state.orders.values(), from_, to, count, skip)
+
+    @app.get("/v1/payments")
+    async def list_payments(count: int = 10, skip: int = 0, from_: int | None = Query(default=None, alias="from"), to: int | None = None):
+        if failed := await fault():
+            return failed
+        return page(app.state.payments.values(), from_, to, count, skip)
+
+    return app
+
+
+_OPS = {
+    "eq": lambda a, b: str(a) == b,
+    "neq": lambda a, b: str(a) != b,
+    "gt": lambda a, b: a is not None and _cmp(a, b) > 0,
+    "gte": lambda a, b: a is not None and _cmp(a, b) >= 0,
+    "lt": lambda a, b: a is not None and _cmp(a, b) < 0,
+    "lte": lambda a, b: a is not None and _cmp(a, b) <= 0,
+}
+
+
+def _cmp(a, b: str) -> int:
+    if isinstance(a, (int, float)):
+        b = float(b)
+    else:
+        a = str(a)
+    return (a > b) - (a < b)
+
+
+def fake_supabase_app(latency: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    app.state.tables = {}
+    ids = itertools.count(1)
+
+    def rows_matching(table: str, params) -> list[dict]:
+        rows = app.state.tables.get(table, [])
+        for column, expr in params.multi_items():
+            if column in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            op, _, value = expr.partition(".")
+            if op == "in":
+                wanted = set(value.strip("()").split(","))
+                rows = [r for r in rows if str(r.get(column)) in wanted]
+            elif op in _OPS:
+                rows = [r for r in rows if _OPS[op](r.get(column), value)]
+        order = params.get("order")
+        if order:
+            column, _, direction = order.partition(".")
+            rows = sorted(rows, key=lambda r: r.get(column) or 0, reverse=direction.startswith("desc"))
+        offset = int(params.get("offset", 0))
+        if "limit" in params:
+            rows = rows[offset:offset + int(params["limit"])]
+        else:
+            rows = rows[offset:]
+        return rows
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        await asyncio.sleep(latency)
+        payload = await request.json()
+        rows = payload if isinstance(payload, list) else [payload]
+        stored = []
+        for row in rows:
+            row = dict(row)
+            row.setdefault("id", next(ids))
+            row.setdefault("created_at", time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime()))
+            stored.append(row)
+        app.state.tables.setdefault(table, []).extend(stored)
+        return Response(json.dumps(stored), status_code=201, media_type="application/json")
+
+    @app.api_route("/rest/v1/{table}", methods=["GET", "HEAD"])
+    async def select(table: str, request: Request):
+        await asyncio.sleep(latency)
+        rows = rows_matching(table, request.query_params)
+        headers = {}
+        if "count=exact" in request.headers.get("prefer", ""):
+            unpaged = rows_matching(table, _without_paging(request.query_params))
+            headers["content-range"] = f"0-{max(len(rows) - 1, 0)}/{len(unpaged)}"
+        body = "" if request.method == "HEAD" else json.dumps(rows)
+        return Response(body, media_type="application/json", headers=headers)
+
+    return app
+
+
+def _without_paging(params: QueryParams) -> QueryParams:
+    return QueryParams([(k, v) for k, v in params.multi_items() if k not in ("limit", "offset")])
+
+
+def start_smtp_sink(latency: float = 0.0):
+    """
+    Start an aiosmtpd sink on a free port. Returns (controller, handler);
+    handler.count is the number of messages accepted. aiosmtpd is only
+    needed for benchmarks, so it is imported here.
+    """
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+
+    # aiosmtpd warns on every AUTH about its own internals
+    warnings.filterwarnings("ignore", message="Session.login_data")
+
+    class CountingHandler:
+        count = 0
+
+        async def handle_DATA(self, server, session, envelope):
+            await asyncio.sleep(latency)
+            self.count += 1
+            return "250 Message accepted"
+
+    handler = CountingHandler()
+    controller = Controller(
+        handler,
+        hostname="127.0.0.1",
+        port=free_port(),
+        # accept any login in plain text, like a dev relay
+        authenticator=lambda *args: AuthResult(success=True),
+        auth_require_tls=False,
+    )
+    controller.start()
+    return controller, handler
@@ -0,0 +1,217 @@
+"""
+Load test for the registration API against local stand-ins.
+
+Starts fake Razorpay and Supabase HTTP services and an SMTP sink (see
+fakes.py), runs `uvicorn main:app` against them in a subprocess, then drives
+a weighted mix of requests and prints p50/p95/p99 latency and requests per
+second for each endpoint.
+
+    python benchmarks/loadtest.py --duration 20 --concurrency 64 \\
+        --razorpay-latency 0.15 --supabase-latency 0.05 --smtp-latency 0.05
+
+The mix is set with --mix, e.g. "quote=40,validate=20,individual=15,group=5,free=5,verify=15".
+"verify" creates an order first (counted under create-order) and then
+verifies it with a valid signature, like the browser does after checkout.
+
+All load comes from one IP, so the per-IP rate limits are turned off
+(RATE_LIMITS=); pass --env RATE_LIMITS=... to load-test them instead.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import fake_razorpay_app, fake_supabase_app, free_port, serve, start_smtp_sink
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KEY_ID = "rzp_test_load"
+KEY_SECRET = "load-secret"
+
+DEFAULT_MIX = "quote=40,validate=20,individual=15,group=5,free=5,verify=15"
+
+_serial = itertools.count(1)
+
+
+def person() -> dict:
+    n = next(_serial)
+    return {"name": f"Load User {n}", "email": f"load{n}@example.com", "phone": 9000000000 + n}
+
+
+def signature(order_id: str, payment_id: str) -> str:
+    return hmac.new(KEY_SECRET.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, http: httpx.AsyncClient, label: str, path: str, body: dict) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            resp = await http.post(path, json=body)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+        self.latencies[label].append(time.perf_counter() - start)
+        if resp.status_code >= 400:
+            self.errors[label] += 1
+        return resp
+
+    def report(self, elapsed: float):
+        print(f"{'endpoint':<28}{'count':>8}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for label in sorted(self.latencies):
+            values = sorted(self.latencies[label])
+            pct = lambda p: values[min(int(len(values) * p), len(values) - 1)] * 1000
+            print(
+                f"{label:<28}{len(values):>8}{self.errors[label]:>6}{len(values) / elapsed:>9.1f}"
+                f"{pct(0.50):>10.1f}{pct(0.95):>10.1f}{pct(0.99):>10.1f}"
+            )
+        total = sum(len(v) for v in self.latencies.values())
+        print(f"{'total':<28}{total:>8}{sum(self.errors.values()):>6}{total / elapsed:>9.1f}")
+
+
+async def scenario(kind: str, http: httpx.AsyncClient, rec: Recorder):
+    if kind == "quote":
+        coupon = random.choice([None, "IPRISM2025", "FREEIPRISM2025", "BOGUS"])
+        await rec.call(http, "/quote", "/payments/quote", {"coupon": coupon})
+    elif kind == "validate":
+        coupon = random.choice(["IPRISM2025", "FREEIPRISM2025", "BOGUS"])
+        await rec.call(http, "/validate-coupon", "/payments/validate-coupon", {"coupon": coupon})
+    elif kind == "individual":
+        await rec.call(http, "/create-order (individual)", "/payments/create-order", person())
+    elif kind == "group":
+        members = [person() for _ in range(random.choice([3, 6, 12]))]
+        await rec.call(http, "/create-order (group)", "/payments/create-order", {"group_members": members})
+    elif kind == "free":
+        await rec.call(http, "/create-order (FREE)", "/payments/create-order", {"coupon": "FREEIPRISM2025", **person()})
+    elif kind == "verify":
+        resp = await rec.call(http, "/create-order (individual)", "/payments/create-order", person())
+        if resp is None or resp.status_code != 200:
+            return
+        order_id = resp.json()["order"]["id"]
+        payment_id = f"pay_{next(_serial):014d}"
+        await rec.call(http, "/verify-payment", "/payments/verify-payment", {
+            "razorpay_order_id": order_id,
+            "razorpay_payment_id": payment_id,
+            "razorpay_signature": signature(order_id, payment_id),
+        })
+
+
+async def drive(base_url: str, mix: dict[str, int], concurrency: int, duration: float) -> Recorder:
+    rec = Recorder()
+    kinds, weights = zip(*mix.items())
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as http:
+        async def user():
+            while time.perf_counter() < deadline:
+                await scenario(random.choices(kinds, weights)[0], http, rec)
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return rec
+
+
+def wait_until_up(url: str, proc: subprocess.Popen, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"API exited during startup with code {proc.returncode}")
+        try:
+            httpx.post(f"{url}/payments/quote", json={}, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit("API did not come up")
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for main:app")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--razorpay-latency", type=float, default=0.15)
+    parser.add_argument("--supabase-latency", type=float, default=0.05)
+    parser.add_argument("--smtp-latency", type=float, default=0.05)
+    parser.add_argument("--no-smtp", action="store_true", help="run without an SMTP sink (emails are skipped)")
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the API process")
+    args = parser.parse_args()
+
+    razorpay = serve(fake_razorpay_app(args.razorpay_latency))
+    supabase = serve(fake_supabase_app(args.supabase_latency))
+    env = {
+        **os.environ,
+        "RAZORPAY_API_BASE": f"{razorpay.url}/v1",
+        "RAZORPAY_KEY_ID": KEY_ID,
+        "RAZORPAY_SECRET": KEY_SECRET,
+        "SUPABASE_URL": supabase.url,
+        "SUPABASE_KEY": "load-test-key",
+        "TICKET_SECRET": "load-test-tickets",
+        "FREE_COUPON_LIMIT": "100000000",
+        "SMTP_USER": "",
+        "SMTP_PASS": "",
+        # one client IP would otherwise be rate-limited on quote/validate-coupon
+        "RATE_LIMITS": "",
+    }
+    smtp = None
+    if not args.no_smtp:
+        smtp, smtp_handler = start_smtp_sink(args.smtp_latency)
+        env.update(
+            SMTP_HOST="127.0.0.1",
+            SMTP_PORT=str(smtp.port),
+            SMTP_STARTTLS="False",
+            SMTP_USER="load@example.com",
+            SMTP_PASS="load",
+        )
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    port = free_port()
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_until_up(url, api)
+        start = time.perf_counter()
+        rec = asyncio.run(drive(url, parse_mix(args.mix), args.concurrency, args.duration))
+        rec.report(time.perf_counter() - start)
+        if smtp is not None:
+            print(f"emails accepted by sink: {smtp_handler.count}")
+    finally:
+        api.terminate()
+        api.wait(15)
+        if smtp is not None:
+            smtp.stop()
+        razorpay.stop()
+        supabase.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+What the shared outbound transport saves per call, against a local TLS
+stand-in for Razorpay / Supabase.
+
+Generates a throwaway self-signed certificate, serves a small JSON API
+over HTTPS with it, and times the same GET three ways:
+
+  fresh   - a new httpx client per call: DNS, TCP and a TLS handshake every
+            time (what happens when an SDK doesn't keep a session)
+  pooled  - one SharedTransport for all calls: keep-alive connections,
+            cached DNS, HTTP/2 when the server offers it
+  burst   - the pooled client under --concurrency parallel calls, to show
+            the pool holding a few warm connections rather than one per call
+
+--rtt adds a delaying TCP proxy in front of the server so the handshake
+round trips cost what they would over a real network (TLS 1.3 plus TCP
+is two round trips before the first request byte). The stand-in is
+uvicorn, which only speaks HTTP/1.1, so ALPN settles on HTTP/1.1 here.
+
+    python benchmarks/outbound_pool.py --requests 200 --rtt 0.02
+"""
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from fastapi import FastAPI
+
+from fakes import serve
+from http_transport import SharedTransport
+
+
+def self_signed_cert(directory: str) -> tuple[str, str]:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .add_extension(
+            x509.SubjectAlternativeName([x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]),
+            critical=False,
+        )
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def stand_in_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/orders/{order_id}")
+    async def order(order_id: str):
+        return {"id": order_id, "entity": "order", "status": "paid", "notes": {"name": "A", "email": "a@example.com"}}
+
+    return app
+
+
+async def delay_proxy(target_port: int, rtt: float) -> asyncio.AbstractServer:
+    """TCP proxy on 127.0.0.1 that holds every chunk for rtt / 2 each way."""
+
+    async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while data := await reader.read(65536):
+                await asyncio.sleep(rtt / 2)
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", target_port)
+        try:
+            await asyncio.gather(pipe(client_reader, server_writer), pipe(server_reader, client_writer))
+        except asyncio.CancelledError:
+            pass   # pooled connections still open when the run ends
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def report(name: str, times: list[float], extra: str = ""):
+    times = sorted(times)
+    p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+    print(
+        f"{name:<8} n={len(times):<5} mean {statistics.mean(times) * 1000:7.2f} ms"
+        f"  p50 {statistics.median(times) * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms  {extra}"
+    )
+
+
+async def run(args, url: str, verify: ssl.SSLContext):
+    fresh = []
+    for i in range(args.requests):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(verify=verify) as client:
+            (await client.get(f"{url}/v1/orders/order_{i}")).raise_for_status()
+        fresh.append(time.perf_counter() - start)
+    report("fresh", fresh, f"connections opened: {args.requests}")
+
+    transport = SharedTransport(verify=verify, http2=True, dns_ttl=300)
+    async with httpx.AsyncClient(transport=transport) as client:
+        pooled = []
+        version = ""
+        for i in range(args.requests):
+            start = time.perf_counter()
+            resp = await client.get(f"{url}/v1/orders/order_{i}")
+            resp.raise_for_status()
+            pooled.append(time.perf_counter() - start)
+            version = resp.http_version
+        stats = transport.stats()
+        report("pooled", pooled, f"connections opened: {stats['connects']}, DNS lookups: {stats['dns_lookups']}, {version}")
+
+        gate = asyncio.Semaphore(args.concurrency)
+        burst = []
+
+        async def one(i: int):
+            async with gate:
+                start = time.perf_counter()
+                (await client.get(f"{url}/v1/orders/order_{i}")).raise_for_status()
+                burst.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        after = transport.stats()
+        report("burst", burst, f"new connections: {after['connects'] - stats['connects']}, pooled now: {after['connections']}")
+
+    saved = statistics.median(fresh) - statistics.median(pooled)
+    print(f"\nsaved per call (p50): {saved * 1000:.2f} ms ({saved / statistics.median(fresh):.0%})")
+
+
+async def main_async(args):
+    directory = tempfile.mkdtemp()
+    cert, key = self_signed_cert(directory)
+    server = serve(stand_in_app(), ssl_certfile=cert, ssl_keyfile=key)
+    verify = ssl.create_default_context(cafile=cert)
+
+    proxy = None
+    port = server.port
+    if args.rtt > 0:
+        proxy = await delay_proxy(server.port, args.rtt)
+        port = proxy.sockets[0].getsockname()[1]
+    # by name, so the DNS cache has something to do
+    url = f"https://localhost:{port}"
+    print(f"TLS stand-in at {url} (rtt {args.rtt * 1000:.0f} ms), {args.requests} calls per mode\n")
+    try:
+        await run(args, url, verify)
+    finally:
+        if proxy is not None:
+            proxy.close()
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rtt", type=float, default=0.0, help="simulated network round trip, seconds")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Razorpay fault injection: timeouts, retries and the circuit breaker.
+
+Runs the app in-process against the fake Razorpay (over real HTTP) and
+walks it through three phases, driving POST /payments/create-order and
+POST /payments/quote side by side in each:
+
+  healthy  - Razorpay answers in --latency seconds
+  outage   - Razorpay takes --outage-latency seconds (longer than the
+             create timeout), so calls time out until the circuit opens
+             and checkout starts failing fast with 503
+  recovery - latency is back to normal; after the breaker's reset timeout
+             one probe call is let through and closes the circuit again
+
+For each phase it prints status counts and p50/p99 per endpoint, plus the
+breaker state from GET /health. /quote never touches Razorpay and should
+not slow down at any point.
+
+    python benchmarks/razorpay_resilience.py --requests 60 --outage-latency 3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+for key, value in {
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_KEY": "bench",
+    "RAZORPAY_KEY_ID": "rzp_bench",
+    "RAZORPAY_SECRET": "bench",
+    "TICKET_SECRET": "bench",
+    "RAZORPAY_CREATE_TIMEOUT_SECONDS": "0.5",
+    "RAZORPAY_FETCH_TIMEOUT_SECONDS": "0.3",
+    "RAZORPAY_BREAKER_THRESHOLD": "5",
+    "RAZORPAY_BREAKER_RESET_SECONDS": "2",
+    "RATE_LIMITS": "",
+}.items():
+    os.environ.setdefault(key, value)
+
+import httpx
+
+import clients
+import main
+from fakes import fake_razorpay_app, serve
+from razorpay_async import AsyncRazorpayClient
+
+
+async def phase(http: httpx.AsyncClient, name: str, requests: int, concurrency: int):
+    results: dict[str, list[tuple[int, float]]] = {"create-order": [], "quote": []}
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with gate:
+            label, path, body = (
+                ("create-order", "/payments/create-order", {"name": "R", "email": f"r{name}{i}@example.com", "phone": 8000000000 + i})
+                if i % 2 == 0 else
+                ("quote", "/payments/quote", {"coupon": "IPRISM2025"})
+            )
+            start = time.perf_counter()
+            resp = await http.post(path, json=body)
+            results[label].append((resp.status_code, time.perf_counter() - start))
+
+    await asyncio.gather(*(one(i) for i in range(requests * 2)))
+    health = (await http.get("/health")).json()["razorpay"]
+    print(f"\n{name}: circuit {health['state']} ({health['consecutive_failures']} consecutive failures)")
+    for label, samples in results.items():
+        ms = sorted(s * 1000 for _, s in samples)
+        statuses = Counter(status for status, _ in samples)
+        print(
+            f"  {label:>12}: p50 {statistics.median(ms):7.1f} ms  p99 {ms[min(len(ms) - 1, int(len(ms) * 0.99))]:7.1f} ms"
+            f"  statuses {dict(sorted(statuses.items()))}"
+        )
+
+
+async def run(args):
+    fake = fake_razorpay_app(latency=args.latency)
+    server = serve(fake)
+    clients.configure(razorpay=AsyncRazorpayClient(auth=("rzp_bench", "bench"), base_url=f"{server.url}/v1"))
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=30) as http:
+            await phase(http, "healthy", args.requests, args.concurrency)
+            fake.state.latency = args.outage_latency
+            await phase(http, "outage", args.requests, args.concurrency)
+            fake.state.latency = args.latency
+            await asyncio.sleep(clients.get_razorpay().breaker.reset_timeout)
+            # the half-open circuit lets one trial call through; the rest wait for its verdict
+            probe = await http.post("/payments/create-order", json={"name": "P", "email": "probe@example.com", "phone": 7000000000})
+            print(f"\nprobe after reset timeout: {probe.status_code}")
+            await phase(http, "recovery", args.requests, args.concurrency)
+    finally:
+        await clients.aclose()
+        server.stop()
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60, help="create-order calls per phase (plus as many quotes)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--outage-latency", type=float, default=3.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,144 @@
+"""
+Multi-process contention test for the shared state backends.
+
+Starts --processes worker processes (what `uvicorn --workers N` does) that
+all open the same backend and hammer it at once, then checks that nothing
+was lost or double-granted:
+
+  quota  - every process calls incr(limit=--limit) --ops times; exactly
+           min(limit, processes * ops) increments may succeed
+  claims - every process tries set_if_absent on the same --claims keys;
+           each key must be won by exactly one process
+  lock   - every process does --lock-ops read-increment-write cycles on a
+           plain key under lock(); the final value must equal the total
+  rate   - every process takes tokens from one bucket for --duration
+           seconds; no more than burst + rate * elapsed may be granted
+
+It prints throughput and p50/p99 per operation, and exits non-zero if any
+check fails. The memory backend is per process, so it is rejected here.
+
+    python benchmarks/shared_state_contention.py --processes 8
+    python benchmarks/shared_state_contention.py --url redis://localhost:6379/0
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_state import open_backend
+
+
+def worker(url: str, prefix: str, args: dict, barrier, results):
+    state = open_backend(url, prefix)
+    timings: dict[str, list[float]] = {"incr": [], "set_if_absent": [], "lock": [], "take_token": []}
+    out = {"granted": 0, "claims": 0, "tokens": 0}
+    barrier.wait()
+
+    for _ in range(args["ops"]):
+        start = time.perf_counter()
+        if state.incr("quota", 1, limit=args["limit"]) is not None:
+            out["granted"] += 1
+        timings["incr"].append(time.perf_counter() - start)
+
+    barrier.wait()
+    for i in range(args["claims"]):
+        start = time.perf_counter()
+        if state.set_if_absent(f"claim:{i}", str(os.getpid()), ttl=60):
+            out["claims"] += 1
+        timings["set_if_absent"].append(time.perf_counter() - start)
+
+    barrier.wait()
+    for _ in range(args["lock_ops"]):
+        start = time.perf_counter()
+        with state.lock("counter", ttl=5, wait=30):
+            value = int(state.get("counter") or 0)
+            state.set("counter", str(value + 1))
+        timings["lock"].append(time.perf_counter() - start)
+
+    barrier.wait()
+    deadline = time.monotonic() + args["duration"]
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        if state.take_token("bucket", args["rate"], args["burst"]) == 0:
+            out["tokens"] += 1
+        timings["take_token"].append(time.perf_counter() - start)
+
+    state.close()
+    out["timings"] = timings
+    results.put(out)
+
+
+def pct(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else (values or [0])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="STATE_URL to test (default: a fresh SQLite file)")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000, help="quota increments per process")
+    parser.add_argument("--limit", type=int, default=5000, help="quota limit")
+    parser.add_argument("--claims", type=int, default=1000, help="keys every process races to claim")
+    parser.add_argument("--lock-ops", type=int, default=200, help="locked read-increment-write cycles per process")
+    parser.add_argument("--rate", type=float, default=100.0, help="bucket refill per second")
+    parser.add_argument("--burst", type=float, default=50.0)
+    parser.add_argument("--duration", type=float, default=2.0, help="seconds of token taking")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'state.sqlite3')}"
+    if url.startswith("memory:"):
+        sys.exit("memory:// is per process; pass a sqlite:/// or redis:// URL")
+    prefix = f"bench:{uuid.uuid4().hex[:8]}:"
+    params = {k: getattr(args, k) for k in ("ops", "limit", "claims", "lock_ops", "rate", "burst", "duration")}
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(args.processes)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(url, prefix, params, barrier, results)) for _ in range(args.processes)]
+    started = time.monotonic()
+    for p in procs:
+        p.start()
+    outs = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    print(f"{url}  {args.processes} processes  ({time.monotonic() - started:.1f}s total)\n")
+
+    print(f"{'op':<14} {'calls':>8} {'calls/s':>10} {'p50 us':>9} {'p99 us':>9}")
+    for op in ("incr", "set_if_absent", "lock", "take_token"):
+        per_proc = [o["timings"][op] for o in outs]
+        calls = sum(len(t) for t in per_proc)
+        # processes ran the phase side by side, so wall time is the slowest one
+        wall = max(sum(t) for t in per_proc) or 1e-9
+        flat = [x for t in per_proc for x in t]
+        print(f"{op:<14} {calls:>8} {calls / wall:>10.0f} {pct(flat, 50) * 1e6:>9.0f} {pct(flat, 99) * 1e6:>9.0f}")
+
+    state = open_backend(url, prefix)
+    granted = sum(o["granted"] for o in outs)
+    claims = sum(o["claims"] for o in outs)
+    tokens = sum(o["tokens"] for o in outs)
+    expected_quota = min(args.limit, args.processes * args.ops)
+    max_tokens = args.burst + args.rate * args.duration * 1.05 + args.processes
+    checks = [
+        ("quota granted", granted, expected_quota, granted == expected_quota),
+        ("quota counter", int(state.get("quota") or 0), expected_quota, int(state.get("quota") or 0) == expected_quota),
+        ("claims won", claims, args.claims, claims == args.claims),
+        ("locked counter", int(state.get("counter") or 0), args.processes * args.lock_ops,
+         int(state.get("counter") or 0) == args.processes * args.lock_ops),
+        ("tokens granted", tokens, f"<= {max_tokens:.0f}", tokens <= max_tokens),
+    ]
+    state.close()
+
+    print()
+    for name, got, want, ok in checks:
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<16} {got:>8}  (expected {want})")
+    sys.exit(0 if all(ok for *_, ok in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Cold-start budget for the API.
+
+Measures, in fresh interpreter processes:
+  - import: `python -c "import main"`
+  - ready:  launching `uvicorn main:app` until GET /metrics answers
+
+and prints min/median/max over --runs. With --budget-ms the script exits
+non-zero when the median import time is over budget, so it can gate CI.
+--top N lists the slowest imports from `python -X importtime`.
+
+    python benchmarks/startup.py --runs 5 --budget-ms 700 --top 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Nothing listens on port 9, so any eager upstream call fails fast instead of hanging
+ENV = {
+    **os.environ,
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_KEY": "startup",
+    "RAZORPAY_KEY_ID": "rzp_startup",
+    "RAZORPAY_SECRET": "startup",
+    "TICKET_SECRET": "startup",
+    "RAZORPAY_API_BASE": "http://127.0.0.1:9/v1",
+}
+
+
+def time_import() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=ROOT, env=ENV, check=True)
+    return time.perf_counter() - start
+
+
+def time_ready() -> float:
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise SystemExit(f"uvicorn exited with code {proc.returncode}")
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=0.5)
+                return time.perf_counter() - start
+            except httpx.HTTPError:
+                time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def slowest_imports(n: int) -> list[tuple[int, str]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=ENV, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def summarize(name: str, samples: list[float]):
+    ms = [s * 1000 for s in samples]
+    print(f"{name:>7}: min {min(ms):7.1f} ms  median {statistics.median(ms):7.1f} ms  max {max(ms):7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=0)
+    args = parser.parse_args()
+
+    imports = [time_import() for _ in range(args.runs)]
+    ready = [time_ready() for _ in range(args.runs)]
+    summarize("import", imports)
+    summarize("ready", ready)
+
+    if args.top:
+        print("\nslowest imports (cumulative us):")
+        for us, name in slowest_imports(args.top):
+            print(f"{us:>10}  {name}")
+
+    if args.budget_ms is not None:
+        median_ms = statistics.median(imports) * 1000
+        if median_ms > args.budget_ms:
+            print(f"\n❌ import median {median_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+            sys.exit(1)
+        print(f"\n✅ import median {median_ms:.1f} ms is within the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config
+
+
+BLOCKING_WORKERS = int(config("BLOCKING_WORKERS", default="8"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+_slots: asyncio.Semaphore | None = None
+
+
+def _semaphore() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(BLOCKING_WORKERS)
+    return _slots
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a blocking call off the event loop on the shared, bounded pool.
+
+    At most BLOCKING_WORKERS calls run at once; further callers wait here
+    (without holding a thread) instead of piling up in the executor queue.
+    """
+    async with _semaphore():
+        loop = asyncio.get_running_loop()
+        # carry contextvars (e.g. the current endpoint for metrics) into the thread
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, functools.partial(ctx.run, fn, *args, **kwargs))
@@ -0,0 +1,227 @@
+import asyncio
+import hmac
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable
+
+from decouple import config
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+
+import metrics
+import tickets
+from clients import get_supabase
+from keyset import table_pages
+from metrics import timed
+from shared_state import StateBackend, get_state
+
+
+log = logging.getLogger(__name__)
+
+CHECKIN_BATCH_SIZE = int(config("CHECKIN_BATCH_SIZE", default="500"))
+CHECKIN_FLUSH_SECONDS = float(config("CHECKIN_FLUSH_SECONDS", default="2"))
+CHECKIN_RESYNC_SECONDS = float(config("CHECKIN_RESYNC_SECONDS", default="30"))
+CHECKIN_PAGE_SIZE = int(config("CHECKIN_PAGE_SIZE", default="1000"))
+# resyncs only read rows added since the last one; a full reload this often
+# picks up rows that committed out of id order
+CHECKIN_FULL_RESYNC_SECONDS = float(config("CHECKIN_FULL_RESYNC_SECONDS", default="600"))
+# how long a scan is remembered in the shared state backend; covers the event days
+CHECKIN_USED_TTL_SECONDS = float(config("CHECKIN_USED_TTL_SECONDS", default="259200"))
+
+
+class CheckinDesk:
+    """
+    Gate-side check-in, answered entirely from memory.
+
+    scan() verifies the ticket signature locally and looks the ticket id up
+    in a set of used tickets, so a scan never waits on the network. Accepted
+    scans are queued and written to Supabase in batches by a background
+    task; failed batches stay queued and are retried.
+
+    The used set is also topped up from Supabase every `resync_interval`
+    seconds, so tickets scanned at another worker's gate are refused here
+    too (after at most one flush + resync interval). A resync pages forward
+    from the last row id it saw; every `full_resync_interval` seconds it
+    reads the whole table again. With a shared `state` backend a scan also
+    claims the ticket id there, so the same ticket scanned at two gates at
+    once is accepted at only one of them. If the backend is unreachable the
+    gate keeps working from memory.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[list[dict]], Awaitable[None]],
+        loader: Callable[[int], AsyncIterator[tuple[int, list[str]]]],
+        batch_size: int = 500,
+        interval: float = 2.0,
+        resync_interval: float = 30.0,
+        full_resync_interval: float = 600.0,
+        state: StateBackend | None = None,
+        used_ttl: float = 259200.0,
+    ):
+        self.sink = sink
+        self.loader = loader
+        self.batch_size = batch_size
+        self.interval = interval
+        self.resync_interval = resync_interval
+        self.full_resync_interval = full_resync_interval
+        self.used_ttl = used_ttl
+        self._state = state if state is not None and state.shared else None
+        self._lock = threading.Lock()
+        self._used: set[str] = set()
+        self._queue: list[dict] = []
+        self._last_sync = 0.0
+        self._last_full_sync = 0.0
+        self._after_id = 0
+        self._task: asyncio.Task | None = None
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def scan(self, token: str, gate: str) -> tuple[str, dict | None]:
+        """Returns ("ok" | "used" | "invalid", ticket)."""
+        ticket = tickets.verify(token)
+        if ticket is None:
+            return "invalid", None
+        ticket_id = ticket["ticket_id"]
+        with self._lock:
+            if ticket_id in self._used:
+                return "used", ticket
+        if self._state is not None and not await self._claim(ticket_id, gate):
+            with self._lock:
+                self._used.add(ticket_id)
+            return "used", ticket
+        with self._lock:
+            if ticket_id in self._used:
+                return "used", ticket
+            self._used.add(ticket_id)
+            self._queue.append({
+                "ticket_id": ticket_id,
+                "email": ticket["email"],
+                "name": ticket["name"],
+                "gate": gate,
+                "checked_in_at": datetime.now(timezone.utc).isoformat(),
+            })
+        return "ok", ticket
+
+    async def _claim(self, ticket_id: str, gate: str) -> bool:
+        try:
+            return await self._state.aset_if_absent(f"checkin:{ticket_id}", gate, self.used_ttl)
+        except Exception as e:
+            log.warning("shared check-in claim failed, using local state", extra={"error": str(e)})
+            return True
+
+    async def flush_once(self) -> int:
+        with self._lock:
+            batch = self._queue[:self.batch_size]
+            del self._queue[:len(batch)]
+        if not batch:
+            return 0
+        try:
+            await self.sink(batch)
+        except Exception:
+            with self._lock:
+                self._queue[:0] = batch
+            raise
+        return len(batch)
+
+    async def sync(self) -> bool:
+        """Add the ticket ids recorded in Supabase since the last sync to the used set."""
+        now = time.monotonic()
+        full = not self._last_full_sync or now - self._last_full_sync >= self.full_resync_interval
+        try:
+            async for last_id, page in self.loader(0 if full else self._after_id):
+                with self._lock:
+                    self._used.update(page)
+                self._after_id = max(self._after_id, last_id)
+        except Exception as e:
+            log.warning("check-in sync failed", extra={"error": str(e)})
+            return False
+        self._last_sync = now
+        if full:
+            self._last_full_sync = now
+        return True
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            while await self.flush_once():
+                pass
+        except Exception as e:
+            log.warning("check-ins not synced at shutdown", extra={"pending": self.pending(), "error": str(e)})
+
+    async def _run(self):
+        while True:
+            if time.monotonic() - self._last_sync >= self.resync_interval:
+                await self.sync()
+            try:
+                while await self.flush_once():
+                    pass
+            except Exception as e:
+                log.error("check-in flush failed, will retry", extra={"pending": self.pending(), "error": str(e)})
+            await asyncio.sleep(self.interval)
+
+
+@timed("supabase.insert_checkins")
+async def insert_checkins(rows: list[dict]):
+    # another worker may have recorded the same ticket first; keep the earliest
+    await get_supabase().table("checkins").upsert(rows, on_conflict="ticket_id", ignore_duplicates=True).execute()
+
+
+async def recorded_ticket_ids(after_id: int = 0):
+    """(last row id, ticket ids) for each page of check-ins with an id above `after_id`."""
+    async for rows in table_pages("checkins", "id,ticket_id", CHECKIN_PAGE_SIZE, after_id):
+        yield rows[-1]["id"], [r["ticket_id"] for r in rows]
+
+
+desk = CheckinDesk(
+    insert_checkins,
+    recorded_ticket_ids,
+    batch_size=CHECKIN_BATCH_SIZE,
+    interval=CHECKIN_FLUSH_SECONDS,
+    resync_interval=CHECKIN_RESYNC_SECONDS,
+    full_resync_interval=CHECKIN_FULL_RESYNC_SECONDS,
+    state=get_state(),
+    used_ttl=CHECKIN_USED_TTL_SECONDS,
+)
+
+
+def require_gate(x_gate_token: str = Header(default="")):
+    """Gate scanners send X-Gate-Token, which must match GATE_TOKEN."""
+    expected = config("GATE_TOKEN", default="")
+    if not expected:
+        raise HTTPException(status_code=503, detail="Check-in is not configured")
+    if not hmac.compare_digest(x_gate_token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid gate token")
+
+
+router = APIRouter(dependencies=[Depends(require_gate)])
+
+
+class ScanRequest(BaseModel):
+    token: str
+    gate: str = "main"
+
+
+@router.post("/scan")
+async def scan_ticket(body: ScanRequest):
+    status, ticket = await desk.scan(body.token, body.gate)
+    metrics.checkins.inc(status)
+    if status == "invalid":
+        raise HTTPException(status_code=400, detail="Invalid ticket")
+    if status == "used":
+        raise HTTPException(status_code=409, detail={"message": "Ticket already used", "name": ticket["name"]})
+    return {"status": "checked_in", "name": ticket["name"], "tier": ticket["tier"], "email": ticket["email"]}
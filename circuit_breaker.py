@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} circuit is open; retry in {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker for one upstream.
+
+    closed:    calls go through; `failure_threshold` consecutive failures open it.
+    open:      calls fail at once with CircuitOpenError for `reset_timeout` seconds.
+    half_open: one trial call is let through; success closes the circuit,
+               failure opens it again for another `reset_timeout`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._last_error: str | None = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self) -> bool:
+        """
+        Raise CircuitOpenError if the call shouldn't be attempted. Returns
+        True if this call is the half-open trial; the caller must then end
+        it with record_success, record_failure or release_trial.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return False
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout or self._trial_running:
+                raise CircuitOpenError(self.name, max(self.reset_timeout - waited, 1))
+            self._state = self.HALF_OPEN
+            self._trial_running = True
+            return True
+
+    def release_trial(self):
+        """The trial ended without telling us anything (cancelled, or our own bug); let the next call try."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self._failures += 1
+            self._last_error = f"{type(error).__name__}: {error}"
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    log.warning("circuit opened", extra={"circuit": self.name, "failures": self._failures, "error": self._last_error})
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "last_error": self._last_error,
+                "retry_in_seconds": (
+                    round(max(self.reset_timeout - (time.monotonic() - self._opened_at), 0), 1)
+                    if state == self.OPEN else 0
+                ),
+            }
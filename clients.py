@@ -0,0 +1,133 @@
+import logging
+import threading
+from typing import TYPE_CHECKING
+
+import httpx
+from decouple import config
+
+from http_transport import SharedTransport, shared_transport
+from razorpay_async import AsyncRazorpayClient
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
+
+log = logging.getLogger(__name__)
+
+WARMUP_CLIENTS = config("WARMUP_CLIENTS", default=False, cast=bool)
+# same default the supabase package uses when it builds its own http client
+SUPABASE_TIMEOUT_SECONDS = float(config("SUPABASE_TIMEOUT_SECONDS", default="120"))
+
+_lock = threading.Lock()
+_transport: SharedTransport | None = None
+_supabase: "AsyncClient | None" = None
+_razorpay: AsyncRazorpayClient | None = None
+
+
+def razorpay_key_id() -> str:
+    return config("RAZORPAY_KEY_ID")
+
+
+def razorpay_key_secret() -> str:
+    return config("RAZORPAY_SECRET")
+
+
+def razorpay_webhook_secret() -> str:
+    return config("RAZORPAY_WEBHOOK_SECRET", default="")
+
+
+def get_transport() -> SharedTransport:
+    """
+    The connection pool every outbound client shares, so Razorpay and
+    Supabase calls reuse warm (TLS, HTTP/2) connections instead of each
+    SDK managing its own.
+    """
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = shared_transport()
+    return _transport
+
+
+def get_supabase() -> "AsyncClient":
+    """
+    Shared Supabase client, built on first use.
+
+    The supabase package alone takes a sizeable share of import time, so it
+    is only imported here; a worker that never touches the database (or
+    boots before its env is complete) doesn't pay for it.
+    """
+    global _supabase
+    if _supabase is None:
+        transport = get_transport()
+        with _lock:
+            if _supabase is None:
+                from supabase import AsyncClient, AsyncClientOptions
+                http = httpx.AsyncClient(transport=transport, timeout=SUPABASE_TIMEOUT_SECONDS)
+                _supabase = AsyncClient(
+                    config("SUPABASE_URL"), config("SUPABASE_KEY"),
+                    options=AsyncClientOptions(httpx_client=http),
+                )
+    return _supabase
+
+
+def get_razorpay() -> AsyncRazorpayClient:
+    """Shared Razorpay client, built on first use."""
+    global _razorpay
+    if _razorpay is None:
+        transport = get_transport()
+        with _lock:
+            if _razorpay is None:
+                _razorpay = AsyncRazorpayClient(auth=(razorpay_key_id(), razorpay_key_secret()), transport=transport)
+    return _razorpay
+
+
+def razorpay_configured() -> bool:
+    return bool(config("RAZORPAY_KEY_ID", default="") and config("RAZORPAY_SECRET", default=""))
+
+
+def peek_razorpay() -> AsyncRazorpayClient | None:
+    """The Razorpay client if it has been built; never builds it (for health checks)."""
+    return _razorpay
+
+
+def configure(supabase: "AsyncClient | None" = None, razorpay: AsyncRazorpayClient | None = None):
+    """Install pre-built clients (benchmarks point these at local fakes)."""
+    global _supabase, _razorpay
+    with _lock:
+        if supabase is not None:
+            _supabase = supabase
+        if razorpay is not None:
+            _razorpay = razorpay
+
+
+async def warmup():
+    """
+    Build both clients and open a connection to each up front, so the first
+    checkout after boot doesn't pay for imports, DNS and TLS. Failures are
+    only reported; the app still starts and retries lazily.
+    """
+    try:
+        await get_razorpay().ping()
+    except Exception as e:
+        log.warning("razorpay warmup failed", extra={"error": str(e)})
+    try:
+        await get_supabase().table("registrations").select("id").limit(1).execute()
+    except Exception as e:
+        log.warning("supabase warmup failed", extra={"error": str(e)})
+
+
+async def aclose():
+    global _supabase, _razorpay, _transport
+    with _lock:
+        supabase, razorpay, transport = _supabase, _razorpay, _transport
+        _supabase = _razorpay = _transport = None
+    # both clients close the shared transport too; closing it first makes
+    # the pool's shutdown explicit and their own closes no-ops
+    if transport is not None:
+        await transport.aclose()
+    if razorpay is not None:
+        await razorpay.aclose()
+    if supabase is not None:
+        await supabase.postgrest.aclose()
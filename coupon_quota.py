@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from shared_state import MemoryBackend, StateBackend
+
+log = logging.getLogger(__name__)
+
+
+class FreeCouponQuota:
+    """
+    Count of FREE registrations handed out, kept in the shared state
+    backend so every worker draws from the same quota.
+
+    Every FREE registration in flight holds a key under `hold_prefix`
+    (named by the caller, e.g. after the email) alongside the shared
+    count. reserve() sets the hold and atomically takes a slot (the
+    increment fails once the count reaches the limit); release() gives
+    both back if the write failed. commit() keeps the hold for as long
+    as the row may sit in the outbox, and delivered() drops it once the
+    row is in Supabase. A hold whose worker died expires after hold_ttl.
+
+    reconcile() runs on a timer, under a shared lock so only one worker
+    per interval queries Supabase, and sets the count to the remote count
+    plus the live holds. It reads the count, then the holds, then the
+    remote count, and only writes if the count hasn't moved meanwhile, so
+    a reservation racing it makes it retry rather than be lost. A row
+    delivered mid-read can be counted twice, which the next pass fixes;
+    it is never counted zero times. Leaked slots are therefore given back
+    within one interval of their hold expiring.
+
+    start() seeds the count in the background. Until that succeeds the
+    quota reports itself exhausted, so a Supabase outage at boot can never
+    over-issue free seats, nor hold up startup.
+
+    The backend calls are async (they can block on SQLite or Redis).
+    remaining() and available(), which pricing calls synchronously, read
+    the last count this worker saw: every reserve/release updates it and
+    the background task re-reads it every `refresh` seconds. They are
+    only a hint for quotes; reserve() is what actually guards the quota.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        counter: Callable[[], Awaitable[int]],
+        interval: float = 30.0,
+        state: StateBackend | None = None,
+        key: str = "free_quota:used",
+        refresh: float = 1.0,
+        hold_prefix: str = "free_quota:hold:",
+        hold_ttl: float = 120.0,
+        queued: Callable[[], Awaitable[list[str]]] | None = None,
+        queued_ttl: float = 7 * 86400,
+    ):
+        self.limit = limit
+        self.interval = interval
+        self.key = key
+        self.refresh = refresh
+        self.hold_prefix = hold_prefix
+        self.hold_ttl = hold_ttl
+        self.queued_ttl = queued_ttl
+        self._counter = counter
+        self._queued = queued
+        self._state = state or MemoryBackend()
+        self._used: int | None = None
+        self._task: asyncio.Task | None = None
+
+    def remaining(self) -> int:
+        if self._used is None:
+            return 0
+        return max(self.limit - self._used, 0)
+
+    def available(self) -> bool:
+        return self.remaining() > 0
+
+    async def load(self) -> int | None:
+        """Re-read the shared count into the local copy."""
+        value = await self._state.aget(self.key)
+        self._used = None if value is None else int(value)
+        return self._used
+
+    async def reserve(self, hold: str) -> bool:
+        """Atomically claim one free slot for `hold`. Returns False when the quota is used up."""
+        if await self.load() is None:
+            return False
+        # hold first: a reconcile that sees the hold but not the slot overcounts, never under
+        await self._state.aset(self.hold_prefix + hold, "1", ttl=self.hold_ttl)
+        used = await self._state.aincr(self.key, 1, limit=self.limit)
+        if used is None:
+            await self._state.adelete(self.hold_prefix + hold)
+            self._used = self.limit
+            return False
+        self._used = used
+        return True
+
+    async def commit(self, hold: str):
+        """The reserved registration was stored locally; hold the slot until it reaches Supabase."""
+        await self._state.aset(self.hold_prefix + hold, "1", ttl=self.queued_ttl)
+
+    async def release(self, hold: str):
+        """The reserved registration was not stored; give the slot back."""
+        # only the caller that removes the hold returns the slot, so an
+        # expired hold (already dropped by reconcile) isn't returned twice
+        if await self._state.adelete(self.hold_prefix + hold):
+            self._used = await self._state.aincr(self.key, -1)
+
+    async def delivered(self, holds: list[str]):
+        """These registrations are in Supabase; the remote count covers them now."""
+        for hold in holds:
+            await self._state.adelete(self.hold_prefix + hold)
+
+    async def reconcile(self) -> bool:
+        """Set the shared count to remote plus live holds. Returns False if the fetch failed or was skipped."""
+        token = await self._state.atry_lock(self.key, ttl=max(self.interval, 5))
+        if token is None:
+            await self.load()
+            return False   # another worker is reconciling right now
+        try:
+            for _ in range(3):
+                before = await self._state.aget(self.key)
+                held = await self._state.acount(self.hold_prefix)
+                remote = await self._counter()
+                used = remote + held
+                if await self._state.acompare_and_set(self.key, before, str(used)):
+                    if before is not None and int(before) != used:
+                        log.info("free coupon count corrected", extra={"was": int(before), "now": used, "held": held})
+                    self._used = used
+                    return True
+            await self.load()
+            log.warning("free coupon reconcile kept racing reservations; will retry next interval")
+            return False
+        except Exception as e:
+            log.warning("free coupon reconcile failed", extra={"error": str(e)})
+            return False
+        finally:
+            await self._state.aunlock(self.key, token)
+
+    async def seed(self) -> bool:
+        """Restore holds for rows still queued locally, then reconcile."""
+        if self._queued is not None:
+            try:
+                for hold in await self._queued():
+                    await self._state.aset(self.hold_prefix + hold, "1", ttl=self.queued_ttl)
+            except Exception as e:
+                log.warning("free coupon hold restore failed", extra={"error": str(e)})
+        return await self.reconcile()
+
+    # --- background reconciliation ---
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        # seeded here rather than awaited at startup, so a Supabase that hangs
+        # can't hold up boot; until then the quota reports itself exhausted
+        while not await self.seed() and self._used is None:
+            await asyncio.sleep(min(self.refresh, self.interval))
+        last_reconcile = time.monotonic()
+        while True:
+            await asyncio.sleep(min(self.refresh, self.interval))
+            try:
+                if time.monotonic() - last_reconcile >= self.interval:
+                    last_reconcile = time.monotonic()
+                    await self.reconcile()
+                else:
+                    await self.load()
+            except Exception as e:
+                log.warning("free coupon refresh failed", extra={"error": str(e)})
@@ -0,0 +1,97 @@
+import base64
+import html
+import os
+import re
+from email.header import Header
+from email.mime.nonmultipart import MIMENonMultipart
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+_FIELD = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class CompiledTemplate:
+    """
+    A template split once into its static text and the field slots between it.
+
+    render() only has to escape the per-attendee values and join them with
+    the cached static chunks; nothing is re-parsed or re-formatted per call.
+    Placeholders are written {{ field }} so CSS braces need no escaping.
+    """
+
+    def __init__(self, source: str, escape: bool = True):
+        pieces = _FIELD.split(source)
+        self.static = tuple(pieces[0::2])
+        self.fields = tuple(pieces[1::2])
+        self.escape = escape
+
+    def render(self, values: dict) -> str:
+        if self.escape:
+            filled = [html.escape(str(values[f])) for f in self.fields]
+        else:
+            filled = [str(values[f]) for f in self.fields]
+        out = [self.static[0]]
+        for value, static in zip(filled, self.static[1:]):
+            out.append(value)
+            out.append(static)
+        return "".join(out)
+
+    def render_batch(self, rows: list[dict]) -> list[str]:
+        return [self.render(values) for values in rows]
+
+
+def load(name: str, escape: bool | None = None) -> CompiledTemplate:
+    with open(os.path.join(TEMPLATE_DIR, name), encoding="utf-8") as f:
+        source = f.read()
+    if escape is None:
+        escape = name.endswith(".html")
+    return CompiledTemplate(source, escape=escape)
+
+
+# Compiled once at import; shared by every request.
+REGISTRATION_CONFIRMATION = load("registration_confirmation.html")
+ACKNOWLEDGEMENT = load("acknowledgement.txt")
+
+CONFIRMATION_SUBJECT = "🎉 IPRISM 2025 – Registration Confirmation"
+ACKNOWLEDGEMENT_SUBJECT = "Conference Registration Acknowledgement"
+
+# Pre-encoded so each message doesn't redo the RFC 2047 work for a constant
+_ENCODED_SUBJECTS = {
+    CONFIRMATION_SUBJECT: Header(CONFIRMATION_SUBJECT, "utf-8").encode(),
+    ACKNOWLEDGEMENT_SUBJECT: ACKNOWLEDGEMENT_SUBJECT,
+}
+
+
+def build_message(subject: str, sender: str, to: str, body: str, subtype: str = "html", bcc: str | None = None) -> MIMENonMultipart:
+    """
+    Same message MIMEText(body, subtype, "utf-8") builds, byte for byte, but
+    the body goes through base64.encodebytes (C) instead of the email
+    package's line-by-line Python base64 encoder, which was most of the
+    cost of building a confirmation.
+    """
+    msg = MIMENonMultipart("text", subtype, charset="utf-8")
+    msg["Content-Transfer-Encoding"] = "base64"
+    msg.set_payload(base64.encodebytes(body.encode("utf-8")).decode("ascii"))
+    msg["From"] = sender
+    msg["To"] = to
+    msg["Subject"] = _ENCODED_SUBJECTS.get(subject, subject)
+    if bcc:
+        msg["Bcc"] = bcc
+    return msg
+
+
+def render_confirmation(name: str, tier: str, location: str, conference_date: str, final_amount: str, ticket: str) -> str:
+    return REGISTRATION_CONFIRMATION.render({
+        "name": name,
+        "tier": tier,
+        "location": location,
+        "conference_date": conference_date,
+        "final_amount": final_amount,
+        "ticket": ticket,
+    })
+
+
+def render_confirmations(rows: list[dict]) -> list[str]:
+    """Batch version for a whole group; each row needs the render_confirmation fields."""
+    return REGISTRATION_CONFIRMATION.render_batch(rows)
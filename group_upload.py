@@ -0,0 +1,193 @@
+import codecs
+import csv
+import json
+import sqlite3
+import threading
+import time
+from typing import AsyncIterator
+
+from blocking import run_blocking
+
+
+MEMBER_FIELDS = ("name", "email", "phone", "college", "type")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS group_members (
+    batch TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    row TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (batch, line)
+);
+CREATE INDEX IF NOT EXISTS group_members_email ON group_members (batch, email);
+CREATE INDEX IF NOT EXISTS group_members_created ON group_members (created_at);
+"""
+
+
+class UploadError(ValueError):
+    """The upload as a whole can't be read (bad header, oversized line...)."""
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line: int) -> AsyncIterator[tuple[int, str]]:
+    """Split a byte stream into (line number, text) without holding more than one line."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line.rstrip("\r")
+        if len(buffer) > max_line:
+            raise UploadError(f"line {line_no + 1} is longer than {max_line} characters")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield line_no + 1, buffer.rstrip("\r")
+
+
+async def iter_csv(lines: AsyncIterator[tuple[int, str]]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    CSV with a header row naming the member fields; one record per line
+    (quoted fields can't span lines). Yields (line, record, error).
+    """
+    header = None
+    async for line_no, line in lines:
+        if not line.strip():
+            continue
+        try:
+            values = next(csv.reader([line]))
+        except csv.Error as e:
+            yield line_no, None, str(e)
+            continue
+        if header is None:
+            header = [h.strip().lower() for h in values]
+            missing = {"name", "email"} - set(header)
+            if missing:
+                raise UploadError(f"CSV header is missing {', '.join(sorted(missing))}")
+            continue
+        if len(values) != len(header):
+            yield line_no, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        yield line_no, dict(zip(header, values)), None
+
+
+async def iter_ndjson(lines: AsyncIterator[tuple[int, str]]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """One JSON object per line. Yields (line, record, error)."""
+    async for line_no, line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "expected a JSON object"
+            continue
+        yield line_no, record, None
+
+
+class GroupStaging:
+    """
+    SQLite staging area for uploaded group members.
+
+    Rows are written under an upload batch id while the file streams in,
+    moved to the Razorpay order id once the order exists, and read back a
+    chunk at a time when the payment is confirmed. Nothing here needs the
+    whole group in memory.
+    """
+
+    def __init__(self, path: str, ttl: float = 2 * 86400):
+        self.path = path
+        self.ttl = ttl
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    # --- storage (blocking; call through run_blocking from async code) ---
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _write(self, sql: str, params) -> int:
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                cur = db.executemany(sql, params) if isinstance(params, list) else db.execute(sql, params)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return cur.rowcount
+
+    def add_many(self, batch: str, members: list[tuple[int, dict]]):
+        now = time.time()
+        self._write(
+            "INSERT INTO group_members (batch, line, email, row, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(batch, line, m["email"].strip().lower(), json.dumps(m), now) for line, m in members],
+        )
+
+    def duplicates(self, batch: str, limit: int) -> list[tuple[int, str]]:
+        """(line, email) for every repeat of an email already seen earlier in the batch."""
+        with self._lock:
+            return self._db().execute(
+                "SELECT line, email FROM group_members g WHERE batch = ? AND EXISTS ("
+                " SELECT 1 FROM group_members e WHERE e.batch = g.batch AND e.email = g.email AND e.line < g.line"
+                ") ORDER BY line LIMIT ?",
+                (batch, limit),
+            ).fetchall()
+
+    def count_duplicates(self, batch: str) -> int:
+        with self._lock:
+            return self._db().execute(
+                "SELECT COUNT(*) - COUNT(DISTINCT email) FROM group_members WHERE batch = ?", (batch,)
+            ).fetchone()[0]
+
+    def rename(self, batch: str, new_batch: str):
+        self._write("UPDATE group_members SET batch = ? WHERE batch = ?", (new_batch, batch))
+
+    def chunk(self, batch: str, after_line: int, limit: int) -> list[tuple[int, dict]]:
+        with self._lock:
+            cur = self._db().execute(
+                "SELECT line, row FROM group_members WHERE batch = ? AND line > ? ORDER BY line LIMIT ?",
+                (batch, after_line, limit),
+            )
+            return [(line, json.loads(row)) for line, row in cur.fetchall()]
+
+    def count(self, batch: str) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM group_members WHERE batch = ?", (batch,)).fetchone()[0]
+
+    def discard(self, batch: str):
+        self._write("DELETE FROM group_members WHERE batch = ?", (batch,))
+
+    def prune(self) -> int:
+        """Drop uploads whose order was never paid."""
+        return self._write("DELETE FROM group_members WHERE created_at < ?", (time.time() - self.ttl,))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --- async API ---
+
+    async def add(self, batch: str, members: list[tuple[int, dict]]):
+        await run_blocking(self.add_many, batch, members)
+
+    async def iter_chunks(self, batch: str, size: int) -> AsyncIterator[list[tuple[int, dict]]]:
+        after = 0
+        while True:
+            rows = await run_blocking(self.chunk, batch, after, size)
+            if not rows:
+                return
+            yield rows
+            after = rows[-1][0]
@@ -0,0 +1,217 @@
+import asyncio
+import contextlib
+import importlib.util
+import ipaddress
+import logging
+import socket
+import ssl
+import time
+import typing
+
+import httpcore
+import httpx
+from decouple import config
+
+log = logging.getLogger(__name__)
+
+HTTP_POOL_MAX_CONNECTIONS = int(config("HTTP_POOL_MAX_CONNECTIONS", default="100"))
+HTTP_POOL_MAX_KEEPALIVE = int(config("HTTP_POOL_MAX_KEEPALIVE", default="20"))
+# kept below the ~60-75s idle timeout of most load balancers, so we close first
+HTTP_POOL_KEEPALIVE_SECONDS = float(config("HTTP_POOL_KEEPALIVE_SECONDS", default="50"))
+HTTP2_ENABLED = config("HTTP2_ENABLED", default=True, cast=bool)
+DNS_CACHE_SECONDS = float(config("DNS_CACHE_SECONDS", default="300"))
+
+
+class CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    httpcore network backend that resolves each host at most once per
+    `ttl` seconds instead of on every new connection. Connects go to the
+    cached addresses in turn; if none of them answers, the entry is
+    dropped so the next connect resolves again. TLS still verifies
+    against the original hostname (httpcore passes it to start_tls).
+    """
+
+    def __init__(self, ttl: float = 300.0, backend: httpcore.AsyncNetworkBackend | None = None):
+        self.ttl = ttl
+        self._backend = backend or httpcore.AnyIOBackend()
+        self._cache: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self.lookups = 0
+        self.connects = 0
+
+    async def resolve(self, host: str, port: int) -> list[str]:
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+        cached = self._cache.get((host, port))
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        self.lookups += 1
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._cache[(host, port)] = (time.monotonic() + self.ttl, addresses)
+        return addresses
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: typing.Iterable[httpcore.SOCKET_OPTION] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        self.connects += 1
+        error: Exception | None = None
+        for address in await self.resolve(host, port):
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address, socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        self._cache.pop((host, port), None)
+        raise error or httpcore.ConnectError(f"no addresses for {host}")
+
+    async def connect_unix_socket(
+        self,
+        path: str,
+        timeout: float | None = None,
+        socket_options: typing.Iterable[httpcore.SOCKET_OPTION] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    def __init__(self, request: httpx.Request, stream: typing.AsyncIterable[bytes]):
+        self._request = request
+        self._stream = stream
+
+    async def __aiter__(self) -> typing.AsyncIterator[bytes]:
+        with _mapped_errors(self._request):
+            async for chunk in self._stream:
+                yield chunk
+
+    async def aclose(self):
+        if hasattr(self._stream, "aclose"):
+            with _mapped_errors(self._request):
+                await self._stream.aclose()
+
+
+# httpcore error -> the httpx error callers (and the Razorpay retries) expect
+_ERRORS: dict[type[Exception], type[httpx.TransportError]] = {
+    httpcore.TimeoutException: httpx.TimeoutException,
+    httpcore.ConnectTimeout: httpx.ConnectTimeout,
+    httpcore.ReadTimeout: httpx.ReadTimeout,
+    httpcore.WriteTimeout: httpx.WriteTimeout,
+    httpcore.PoolTimeout: httpx.PoolTimeout,
+    httpcore.NetworkError: httpx.NetworkError,
+    httpcore.ConnectError: httpx.ConnectError,
+    httpcore.ReadError: httpx.ReadError,
+    httpcore.WriteError: httpx.WriteError,
+    httpcore.ProxyError: httpx.ProxyError,
+    httpcore.UnsupportedProtocol: httpx.UnsupportedProtocol,
+    httpcore.ProtocolError: httpx.ProtocolError,
+    httpcore.LocalProtocolError: httpx.LocalProtocolError,
+    httpcore.RemoteProtocolError: httpx.RemoteProtocolError,
+}
+
+
+@contextlib.contextmanager
+def _mapped_errors(request: httpx.Request):
+    try:
+        yield
+    except Exception as e:
+        for cls in type(e).__mro__:
+            if cls in _ERRORS:
+                raise _ERRORS[cls](str(e), request=request) from e
+        raise
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """
+    One connection pool for every outbound API (Razorpay, Supabase),
+    with keep-alive, HTTP/2 where the server offers it (and the h2 package
+    is installed), and cached DNS.
+
+    httpx has no option for a custom network backend, so this is an httpx
+    transport over an httpcore pool we build ourselves. aclose() closes
+    the pool, once; every client built on the transport closes it on its
+    own aclose(), so only close those clients at shutdown.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 50.0,
+        http2: bool = True,
+        dns_ttl: float = 300.0,
+        verify: ssl.SSLContext | bool = True,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            log.warning("h2 is not installed; outbound calls use HTTP/1.1")
+            http2 = False
+        self.network = CachingDNSBackend(dns_ttl)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(verify=verify),
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=self.network,
+        )
+        self._closed = False
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._closed:
+            raise RuntimeError("SharedTransport is closed")
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _mapped_errors(request):
+            response = await self._pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_ResponseStream(request, response.stream),
+            extensions=response.extensions,
+        )
+
+    def stats(self) -> dict:
+        connections = self._pool.connections
+        return {
+            "connections": len(connections),
+            "idle": sum(1 for c in connections if c.is_idle()),
+            "connects": self.network.connects,
+            "dns_lookups": self.network.lookups,
+        }
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        await self._pool.aclose()
+
+
+def shared_transport() -> SharedTransport:
+    return SharedTransport(
+        max_connections=HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive=HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_POOL_KEEPALIVE_SECONDS,
+        http2=HTTP2_ENABLED,
+        dns_ttl=DNS_CACHE_SECONDS,
+    )
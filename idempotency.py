@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException
+
+from shared_state import StateBackend
+from ttl_cache import TTLCache
+
+
+class IdempotencyStore:
+    """
+    Run a request's work at most once per key.
+
+    Completed results are kept for `ttl` seconds and replayed to any retry
+    with the same key. A duplicate that arrives while the first request is
+    still running waits for it and gets the same result. Failures are not
+    stored: waiters on a failed (or cancelled) request run the work
+    themselves, so a transient error can still be retried.
+
+    With a shared `state` backend the same holds across workers: a request
+    first claims the key there (for at most `claim_ttl` seconds), a
+    duplicate on another worker polls until the result is published, and
+    results are stored there as JSON so any worker can replay them.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 50_000, state: StateBackend | None = None, claim_ttl: float = 60.0):
+        self.ttl = ttl
+        self.claim_ttl = claim_ttl
+        self._state = state if state is not None and state.shared else None
+        self._done = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._bound = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def run(self, key: str | None, work: Callable[[], Awaitable], fingerprint: str | None = None):
+        if key is None:
+            return await work()
+
+        while True:
+            hit = self._done.get(key)
+            if hit is not None:
+                return self._replay(hit, fingerprint)
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            # Wait for the first request, then look again: either its result
+            # is stored now, or it failed and we take over.
+            await asyncio.shield(pending)
+
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[key] = pending
+        try:
+            return await self._run_once(key, work, fingerprint)
+        finally:
+            self._inflight.pop(key, None)
+            pending.set_result(None)
+
+    async def _run_once(self, key: str, work: Callable[[], Awaitable], fingerprint: str | None):
+        claim = None
+        if self._state is not None:
+            claim = await self._claim(key)
+            if claim is None:
+                # another worker finished it while we waited
+                return self._replay(self._done.get(key), fingerprint)
+        try:
+            result = await work()
+            if claim is not None:
+                await self._state.aset(f"idem:{key}", json.dumps([fingerprint, result], default=str), self.ttl)
+        finally:
+            if claim is not None:
+                await self._state.adelete(f"idem-claim:{key}", claim)
+        self._done.set(key, (fingerprint, result))
+        return result
+
+    async def bind(self, key: str, value: str):
+        """
+        Tie a client's Idempotency-Key to what it was first used for (e.g.
+        an order id), for routes keyed on something else. Raises 422 if the
+        key was already used for a different `value`.
+        """
+        bound = self._bound.get(key)
+        if bound is None and self._state is not None:
+            if not await self._state.aset_if_absent(f"idem-key:{key}", value, self.ttl):
+                bound = await self._state.aget(f"idem-key:{key}")
+        if bound is not None and bound != value:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        self._bound.set(key, value)
+
+    @staticmethod
+    def _replay(hit, fingerprint: str | None):
+        stored_fingerprint, result = hit
+        if fingerprint is not None and stored_fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        return result
+
+    async def _claim(self, key: str) -> str | None:
+        """
+        Claim the key in the shared backend. Returns the claim token, or None
+        if another worker's result turned up (it is copied into the local
+        cache). Waits while another worker holds the claim.
+        """
+        token = uuid.uuid4().hex
+        delay = 0.02
+        deadline = time.monotonic() + self.claim_ttl + 1
+        while True:
+            stored = await self._state.aget(f"idem:{key}")
+            if stored is not None:
+                self._done.set(key, tuple(json.loads(stored)))
+                return None
+            if await self._state.aset_if_absent(f"idem-claim:{key}", token, self.claim_ttl):
+                return token
+            if time.monotonic() >= deadline:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
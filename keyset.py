@@ -0,0 +1,46 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+
+from clients import get_supabase
+
+
+async def keyset_pages(
+    fetch: Callable[[int, int], Awaitable[list[dict]]],
+    page_size: int,
+    after_id: int = 0,
+    first: list[dict] | None = None,
+    prefetch: bool = False,
+) -> AsyncIterator[list[dict]]:
+    """
+    Page through rows by id: fetch(after_id, limit) returns up to `limit`
+    rows with id > after_id, in id order, and a short page is the last one.
+    Each page costs the same however deep into the table it is.
+
+    `first` is a page the caller already fetched (e.g. to fail cleanly
+    before streaming). With `prefetch`, the next page is requested before
+    the current one is handed out, so the caller's work overlaps the
+    round trip.
+    """
+    page = first if first is not None else await fetch(after_id, page_size)
+    while page:
+        next_page = None
+        if prefetch and len(page) == page_size:
+            next_page = asyncio.create_task(fetch(page[-1]["id"], page_size))
+        try:
+            yield page
+        except BaseException:
+            if next_page:
+                next_page.cancel()
+            raise
+        if len(page) < page_size:
+            return
+        page = await next_page if next_page else await fetch(page[-1]["id"], page_size)
+
+
+def table_pages(table: str, columns: str, page_size: int, after_id: int = 0) -> AsyncIterator[list[dict]]:
+    """keyset_pages over a whole Supabase table; `columns` must include id."""
+    async def fetch(after: int, limit: int) -> list[dict]:
+        res = await get_supabase().table(table).select(columns).gt("id", after).order("id").limit(limit).execute()
+        return res.data or []
+
+    return keyset_pages(fetch, page_size, after_id)
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import queue
+import random
+import smtplib
+import threading
+import time
+from email.message import Message
+
+from decouple import config
+
+from metrics import timed, record_error, mail_dropped
+
+
+log = logging.getLogger(__name__)
+
+SMTP_HOST = config("SMTP_HOST", default="smtp.gmail.com")
+SMTP_PORT = int(config("SMTP_PORT", default="587"))
+SMTP_USER = config("SMTP_USER", default="")
+SMTP_PASS = config("SMTP_PASS", default="")
+SMTP_STARTTLS = config("SMTP_STARTTLS", default=True, cast=bool)
+
+MAIL_WORKERS = int(config("MAIL_WORKERS", default="2"))
+MAIL_QUEUE_SIZE = int(config("MAIL_QUEUE_SIZE", default="1000"))
+MAIL_MAX_RETRIES = int(config("MAIL_MAX_RETRIES", default="3"))
+MAIL_BACKOFF_SECONDS = float(config("MAIL_BACKOFF_SECONDS", default="0.5"))
+MAIL_IDLE_SECONDS = float(config("MAIL_IDLE_SECONDS", default="60"))
+# how long asubmit() waits for room in a full queue before giving up on a message
+MAIL_SUBMIT_TIMEOUT_SECONDS = float(config("MAIL_SUBMIT_TIMEOUT_SECONDS", default="30"))
+
+_STOP = object()
+
+
+class EmailDispatcher:
+    """
+    Bounded queue + worker pool for outgoing mail.
+
+    Each worker keeps one authenticated SMTP session open and reuses it
+    for every message it sends. A broken session is dropped and rebuilt
+    on the next attempt; failed sends are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        user: str = SMTP_USER,
+        password: str = SMTP_PASS,
+        starttls: bool = SMTP_STARTTLS,
+        workers: int = MAIL_WORKERS,
+        queue_size: int = MAIL_QUEUE_SIZE,
+        max_retries: int = MAIL_MAX_RETRIES,
+        backoff: float = MAIL_BACKOFF_SECONDS,
+        idle_timeout: float = MAIL_IDLE_SECONDS,
+        submit_timeout: float = MAIL_SUBMIT_TIMEOUT_SECONDS,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.submit_timeout = submit_timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._threads: list[threading.Thread] = []
+        # submit() starts the workers on first use, possibly from several threads
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        with self._start_lock:
+            if self.running:
+                return
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"mailer-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for t in self._threads:
+                t.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Drain whatever is queued, then close every session."""
+        threads = self._threads
+        for _ in threads:
+            self._queue.put(_STOP)
+        for t in threads:
+            t.join(timeout)
+        with self._start_lock:
+            if self._threads is threads:
+                self._threads = []
+
+    def submit(self, msg: Message) -> bool:
+        """Queue a message without blocking. Returns False if the queue is full."""
+        if not self._threads:
+            self.start()
+        try:
+            self._queue.put_nowait(msg)
+            return True
+        except queue.Full:
+            self._drop(msg)
+            return False
+
+    async def asubmit(self, msg: Message) -> bool:
+        """
+        Queue a message, waiting up to `submit_timeout` seconds for room so
+        a big batch is held back instead of dropped. Returns False if the
+        queue stayed full.
+        """
+        if not self._threads:
+            self.start()
+        deadline = time.monotonic() + self.submit_timeout
+        delay = 0.005
+        while True:
+            try:
+                self._queue.put_nowait(msg)
+                return True
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    self._drop(msg)
+                    return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def _drop(self, msg: Message):
+        self._count(dropped=1)
+        mail_dropped.inc()
+        log.error("mail queue full, dropping email", extra={"to": msg["To"]})
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # --- worker side ---
+
+    def _count(self, sent: int = 0, failed: int = 0, dropped: int = 0):
+        with self._stats_lock:
+            self.sent += sent
+            self.failed += failed
+            self.dropped += dropped
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP | None):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @timed("smtp.send")
+    def _send(self, server: smtplib.SMTP | None, msg: Message) -> smtplib.SMTP | None:
+        """Send one message, reconnecting and backing off on failure."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if server is None:
+                    server = self._connect()
+                server.send_message(msg)
+                self._count(sent=1)
+                log.info("email sent", extra={"to": msg["To"], "sample": True})
+                return server
+            except smtplib.SMTPRecipientsRefused as e:
+                # Permanent for this message; the session itself is fine.
+                self._count(failed=1)
+                record_error("smtp.send")
+                log.error("email rejected", extra={"to": msg["To"], "error": str(e)})
+                return server
+            except Exception as e:
+                self._close(server)
+                server = None
+                if attempt == self.max_retries:
+                    self._count(failed=1)
+                    record_error("smtp.send")
+                    log.error("email failed", extra={"to": msg["To"], "attempts": attempt + 1, "error": str(e)})
+                    return None
+                delay = self.backoff * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+        return server
+
+    def _worker(self):
+        server = None
+        last_used = time.monotonic()
+        while True:
+            try:
+                msg = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                # Don't hold an idle connection open forever; servers drop them anyway.
+                self._close(server)
+                server = None
+                continue
+
+            if msg is _STOP:
+                self._close(server)
+                return
+
+            if server is not None and time.monotonic() - last_used > self.idle_timeout:
+                self._close(server)
+                server = None
+
+            server = self._send(server, msg)
+            last_used = time.monotonic()
+
+
+dispatcher = EmailDispatcher()
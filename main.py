@@ -1,9 +1,54 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from payments import router as payments_router
+from payments import router as payments_router, free_quota, webhook_pipeline, registration_outbox, registration_index, registration_stats, payment_reconciler
+from admin import router as admin_router
+from checkin import router as checkin_router, desk as checkin_desk
 from fastapi.middleware.cors import CORSMiddleware
+import metrics
+import app_logging
+from admission import AdmissionMiddleware
+from mailer import dispatcher
+from blocking import run_blocking
+import clients
+import shared_state
+import tickets
 
-app = FastAPI(title="Conference Registration API")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app_logging.configure()
+    # confirmation emails carry signed tickets; refuse to start rather than
+    # fail after a payment is already confirmed
+    tickets.ticket_secret()
+    dispatcher.start()
+    registration_outbox.start()
+    if clients.WARMUP_CLIENTS:
+        await clients.warmup()
+    free_quota.start()
+    registration_index.start()
+    registration_stats.start()
+    webhook_pipeline.start()
+    checkin_desk.start()
+    payment_reconciler.start()
+    yield
+    await payment_reconciler.stop()
+    await checkin_desk.stop()
+    await webhook_pipeline.stop()
+    await registration_outbox.stop()
+    await free_quota.stop()
+    await registration_index.stop()
+    await registration_stats.stop()
+    await clients.aclose()
+    shared_state.close()
+    # flush queued confirmation emails before the worker exits
+    await run_blocking(dispatcher.stop)
+    app_logging.shutdown()
+
+
+app = FastAPI(title="Conference Registration API", lifespan=lifespan)
+
+# added first so it sits inside CORS: 429/503 answers still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,5 +58,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(metrics.MetricsMiddleware)
+# outermost, so every log line of a request (and its 429/503) carries the id
+app.add_middleware(app_logging.RequestIdMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    metrics.mail_queue_pending.set(value=dispatcher.pending())
+    metrics.webhook_queue_pending.set(value=webhook_pipeline.pending())
+    metrics.outbox_pending.set(value=registration_outbox.pending())
+    metrics.checkin_sync_pending.set(value=checkin_desk.pending())
+    metrics.razorpay_circuit_state.set(value=CIRCUIT_STATES[razorpay_circuit()["state"]])
+    return metrics.metrics_response()
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2, "not_configured": 2}
+
+def razorpay_circuit() -> dict:
+    """
+    The Razorpay breaker's state, without building the client just to
+    read it: that needs the API keys, and monitoring must work without
+    them. A client that hasn't been built yet has a closed circuit.
+    """
+    client = clients.peek_razorpay()
+    if client is not None:
+        return client.breaker.snapshot()
+    if not clients.razorpay_configured():
+        return {"state": "not_configured"}
+    return {"state": "closed", "consecutive_failures": 0, "last_error": None, "retry_in_seconds": 0}
+
+@app.get("/health")
+def health():
+    """
+    Liveness plus upstream state. Always 200 while the process is up;
+    "degraded" means checkout is failing fast because Razorpay's circuit
+    is not closed, or Razorpay keys are not configured.
+    """
+    razorpay = razorpay_circuit()
+    return {
+        "status": "ok" if razorpay["state"] == "closed" else "degraded",
+        "razorpay": razorpay,
+        "free_quota_remaining": free_quota.remaining(),
+        "mail_queue_pending": dispatcher.pending(),
+        "mail_dropped": dispatcher.dropped,
+        "webhook_queue_pending": webhook_pipeline.pending(),
+    }
+
 # Register routes
 app.include_router(payments_router, prefix="/payments", tags=["Payments"])
+app.include_router(admin_router, prefix="/admin", tags=["Admin"])
+app.include_router(checkin_router, prefix="/checkin", tags=["Check-in"])
@@ -0,0 +1,222 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi import Response
+
+
+# Latency buckets in seconds, from cache hits up to a stuck upstream
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Path of the request being handled, so stage metrics can be split per endpoint
+current_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("current_endpoint", default="")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, *label_values: str, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets: tuple = BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values: str, value: float):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}")
+                cumulative += series[len(self.buckets)]
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: list = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+http_requests = register(Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "endpoint", "status"),
+))
+http_latency = register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "endpoint"),
+))
+stage_latency = register(Histogram(
+    "stage_duration_seconds", "Latency of one stage of request handling (upstream call or local step)", ("stage", "endpoint"),
+))
+stage_errors = register(Counter(
+    "stage_errors_total", "Stages that raised (or reported) an error", ("stage", "endpoint"),
+))
+admission_rejected = register(Counter(
+    "admission_rejected_total", "Requests turned away before reaching a route", ("reason", "endpoint"),
+))
+checkins = register(Counter(
+    "checkins_total", "Gate scans by result", ("result",),
+))
+checkin_sync_pending = register(Gauge(
+    "checkin_sync_pending", "Accepted check-ins not yet written to Supabase",
+))
+razorpay_circuit_state = register(Gauge(
+    "razorpay_circuit_state", "Razorpay circuit breaker: 0 closed, 1 half open, 2 open or not configured",
+))
+mail_dropped = register(Counter(
+    "mail_dropped_total", "Confirmation emails given up on because the mail queue stayed full",
+))
+mail_queue_pending = register(Gauge(
+    "mail_queue_pending", "Confirmation emails waiting for an SMTP worker",
+))
+webhook_queue_pending = register(Gauge(
+    "webhook_queue_pending", "Acknowledged webhook events waiting to be processed",
+))
+outbox_pending = register(Gauge(
+    "outbox_pending", "Registrations committed locally but not yet in Supabase",
+))
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as stage `name`; an exception counts as an error for the stage."""
+    endpoint = current_endpoint.get()
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(name, endpoint)
+        raise
+    finally:
+        stage_latency.observe(name, endpoint, value=time.perf_counter() - start)
+
+
+def record_error(name: str):
+    """For stages that swallow their own exceptions (e.g. store_registration)."""
+    stage_errors.inc(name, current_endpoint.get())
+
+
+def timed(name: str):
+    """Decorator form of stage(); works on plain and async functions."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware: per-endpoint request latency and status counts."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = current_endpoint.set(scope["path"])
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Only matched routes get their own label, so scanners probing
+            # random URLs can't blow up the series count
+            endpoint = scope["path"] if scope.get("route") is not None else "unmatched"
+            http_latency.observe(scope["method"], endpoint, value=time.perf_counter() - start)
+            http_requests.inc(scope["method"], endpoint, str(status))
+            current_endpoint.reset(token)
+
+
+def metrics_response() -> Response:
+    return Response(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
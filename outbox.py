@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from blocking import run_blocking
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registration_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedup_key TEXT NOT NULL UNIQUE,
+    order_id TEXT,
+    row TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS registration_outbox_pending
+    ON registration_outbox (next_attempt_at) WHERE sent_at IS NULL;
+CREATE INDEX IF NOT EXISTS registration_outbox_order
+    ON registration_outbox (order_id);
+"""
+
+
+class RegistrationOutbox:
+    """
+    Local write-behind queue for registrations, stored in SQLite (WAL mode).
+
+    add() commits rows locally and returns; that commit is what the request
+    path waits for. A background flusher sends pending rows to Supabase in
+    batches through `sink` (which returns one {"stored", "error"} result per
+    row) and retries failures with capped exponential backoff, so a Supabase
+    outage delays registrations instead of losing them.
+
+    Each row has a dedup_key; adding the same key twice is a no-op, so a
+    retried confirmation can't queue a second copy of the registration.
+    Sent rows are kept as a local ledger of what was confirmed.
+
+    Several workers on one host can share the file: due() leases the rows
+    it returns for `lease` seconds, so each row is sent by one flusher at a
+    time, and rows leased by a worker that died come back after the lease.
+    The lease is renewed while the sink runs, so a batch that takes longer
+    than `lease` (slow Supabase, long timeouts) isn't picked up and sent
+    again by another flusher.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sink: Callable[[list[dict]], Awaitable[list[dict]]],
+        batch_size: int = 200,
+        interval: float = 1.0,
+        max_backoff: float = 300.0,
+        synchronous: str = "FULL",
+        lease: float = 60.0,
+    ):
+        self.path = path
+        self.sink = sink
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.synchronous = synchronous
+        self.lease = lease
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    # --- storage (blocking; call through run_blocking from async code) ---
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def add_many(self, rows: list[dict], order_id: str | None = None, dedup_keys: list[str] | None = None) -> int:
+        """Commit rows in one local transaction. Returns how many were new."""
+        now = time.time()
+        keys = dedup_keys or [uuid.uuid4().hex for _ in rows]
+        with self._lock:
+            db = self._db()
+            before = db.total_changes
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "INSERT OR IGNORE INTO registration_outbox (dedup_key, order_id, row, created_at) VALUES (?, ?, ?, ?)",
+                    [(key, order_id, json.dumps(row), now) for key, row in zip(keys, rows)],
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return db.total_changes - before
+
+    def due(self, limit: int) -> list[tuple[int, int, dict]]:
+        """Lease up to `limit` rows that are due; mark() ends the lease."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = db.execute(
+                    "SELECT id, attempts, row FROM registration_outbox"
+                    " WHERE sent_at IS NULL AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                db.executemany(
+                    "UPDATE registration_outbox SET next_attempt_at = ? WHERE id = ?",
+                    [(now + self.lease, rid) for rid, _, _ in rows],
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return [(rid, attempts, json.loads(row)) for rid, attempts, row in rows]
+
+    def renew(self, ids: list[int]):
+        """Extend the lease on rows still being sent."""
+        until = time.time() + self.lease
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "UPDATE registration_outbox SET next_attempt_at = ? WHERE id = ? AND sent_at IS NULL",
+                    [(until, rid) for rid in ids],
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def mark(self, sent: list[int], failed: list[tuple[int, int, str]]):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany("UPDATE registration_outbox SET sent_at = ?, last_error = NULL WHERE id = ?", [(now, rid) for rid in sent])
+                db.executemany(
+                    "UPDATE registration_outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    [
+                        (attempts, now + min(self.max_backoff, 2 ** attempts), error, rid)
+                        for rid, attempts, error in failed
+                    ],
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM registration_outbox WHERE sent_at IS NULL").fetchone()[0]
+
+    def pending_emails(self, tier: str) -> list[str]:
+        """Emails of unsent rows for one tier (e.g. FREE, for the coupon quota holds)."""
+        with self._lock:
+            return [email for (email,) in self._db().execute(
+                "SELECT json_extract(row, '$.email') FROM registration_outbox WHERE sent_at IS NULL AND json_extract(row, '$.tier') = ?",
+                (tier,),
+            ).fetchall()]
+
+    def pending_contacts(self) -> list[tuple[str, str]]:
+        """(email, phone) of every unsent row."""
+        with self._lock:
+            return self._db().execute(
+                "SELECT json_extract(row, '$.email'), json_extract(row, '$.phone') FROM registration_outbox WHERE sent_at IS NULL"
+            ).fetchall()
+
+    def known_orders(self, order_ids: list[str]) -> set[str]:
+        """Which of these orders already have a registration in the outbox (sent or not)."""
+        if not order_ids:
+            return set()
+        with self._lock:
+            return {oid for (oid,) in self._db().execute(
+                f"SELECT DISTINCT order_id FROM registration_outbox WHERE order_id IN ({','.join('?' * len(order_ids))})",
+                order_ids,
+            ).fetchall()}
+
+    def pending_rows(self) -> list[dict]:
+        """Every unsent row."""
+        with self._lock:
+            return [json.loads(row) for (row,) in self._db().execute(
+                "SELECT row FROM registration_outbox WHERE sent_at IS NULL ORDER BY id"
+            ).fetchall()]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --- async API ---
+
+    async def add(self, rows: list[dict], order_id: str | None = None, dedup_keys: list[str] | None = None) -> int:
+        added = await run_blocking(self.add_many, rows, order_id, dedup_keys)
+        if self._wake is not None:
+            self._wake.set()
+        return added
+
+    async def flush_once(self) -> int:
+        """Send one batch of due rows. Returns how many were sent."""
+        batch = await run_blocking(self.due, self.batch_size)
+        if not batch:
+            return 0
+        renewer = asyncio.create_task(self._renew([rid for rid, _, _ in batch]))
+        try:
+            results = await self.sink([row for _, _, row in batch])
+        except Exception as e:
+            results = [{"stored": False, "error": str(e)} for _ in batch]
+        finally:
+            renewer.cancel()
+
+        sent = [rid for (rid, _, _), r in zip(batch, results) if r["stored"]]
+        failed = [(rid, attempts + 1, r["error"]) for (rid, attempts, _), r in zip(batch, results) if not r["stored"]]
+        await run_blocking(self.mark, sent, failed)
+        if failed:
+            log.warning("outbox rows failed to reach Supabase, will retry", extra={"failed": len(failed), "sent": len(sent)})
+        return len(sent)
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # one last attempt so a clean shutdown leaves as little behind as possible
+        try:
+            while await self.flush_once():
+                pass
+        except Exception as e:
+            log.warning("outbox final flush failed", extra={"error": str(e)})
+
+    async def _renew(self, ids: list[int]):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await run_blocking(self.renew, ids)
+            except Exception as e:
+                log.warning("outbox lease renewal failed", extra={"error": str(e)})
+
+    async def _run(self):
+        while True:
+            try:
+                sent = await self.flush_once()
+            except Exception as e:
+                log.error("outbox flush failed", extra={"error": str(e)})
+                sent = 0
+            if sent:
+                continue   # more may be waiting; keep draining
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
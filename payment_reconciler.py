@@ -0,0 +1,228 @@
+"""
+Backfill registrations for payments that were captured but never confirmed.
+
+Runs as a background job inside the app, or by hand for a window:
+
+    python payment_reconciler.py --from 2025-09-01 --to 2025-09-30T18:00
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable
+
+from blocking import run_blocking
+from razorpay_async import AsyncRazorpayClient
+from shared_state import StateBackend
+
+log = logging.getLogger(__name__)
+
+OUTCOMES = ("present", "backfilled", "unrecoverable")
+
+
+class PaymentReconciler:
+    """
+    Finds paid Razorpay orders that have no registration and backfills them.
+
+    run(start, end) streams two lists for the window from Razorpay, one
+    page at a time: orders (paid ones carry their notes inline), then
+    payments (captured ones catch orders created before the window but
+    paid inside it; their notes are fetched). Each page's order ids are
+    looked up in the outbox ledger with one query, so memory stays at one
+    page whatever the window. Orders the ledger doesn't know go to
+    `backfill`, which is idempotent per order, so seeing an order in both
+    lists (or in a rerun) is harmless.
+
+    Progress (window, list, offset and counts) goes to a checkpoint file
+    after every page, so a run cut short by a crash or a Razorpay outage
+    resumes where it stopped. The background job covers [last end,
+    now - settle] every `interval` seconds, leaving `settle` seconds for
+    verify-payment and the webhook to confirm payments first, and holds a
+    shared lock so only one worker runs it.
+    """
+
+    def __init__(
+        self,
+        razorpay: Callable[[], AsyncRazorpayClient],
+        known_orders: Callable[[list[str]], set[str]],
+        notes_for_order: Callable[[str], Awaitable[dict]],
+        backfill: Callable[[str, dict], Awaitable[str]],
+        ready: Callable[[], bool],
+        state: StateBackend,
+        checkpoint_path: str,
+        page_size: int = 100,
+        interval: float = 900.0,
+        settle: float = 900.0,
+        lookback: float = 86400.0,
+    ):
+        self.razorpay = razorpay
+        self.known_orders = known_orders
+        self.notes_for_order = notes_for_order
+        self.backfill = backfill
+        self.ready = ready
+        self.state = state
+        self.checkpoint_path = checkpoint_path
+        self.page_size = min(page_size, 100)   # Razorpay's maximum
+        self.interval = interval
+        self.settle = settle
+        self.lookback = lookback
+        self._task: asyncio.Task | None = None
+
+    # --- checkpoint (blocking; tiny) ---
+
+    def load_checkpoint(self) -> dict:
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_checkpoint(self, checkpoint: dict):
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    # --- one window ---
+
+    async def run(self, start: int, end: int) -> dict:
+        """Reconcile payments made between two unix timestamps. Returns the counts."""
+        checkpoint = await run_blocking(self.load_checkpoint)
+        progress = checkpoint.get("run")
+        if not progress or progress["window"] != [start, end]:
+            progress = {
+                "window": [start, end], "list": "orders", "skip": 0,
+                "counts": {"orders": 0, "payments": 0, **dict.fromkeys(OUTCOMES, 0)},
+            }
+        elif progress["skip"] or progress["list"] != "orders":
+            log.info("resuming payment reconcile", extra={"list": progress["list"], "skip": progress["skip"]})
+
+        client = self.razorpay()
+        while progress["list"] != "done":
+            source = client.order.all if progress["list"] == "orders" else client.payment.all
+            page = await source({"from": start, "to": end, "count": self.page_size, "skip": progress["skip"]})
+            items = page.get("items") or []
+            await self._check_page(progress, items)
+            progress["skip"] += len(items)
+            if len(items) < self.page_size:
+                progress["list"] = "payments" if progress["list"] == "orders" else "done"
+                progress["skip"] = 0
+            checkpoint["run"] = progress
+            await run_blocking(self.save_checkpoint, checkpoint)
+
+        checkpoint["run"] = None
+        checkpoint["last_end"] = max(checkpoint.get("last_end") or 0, end)
+        await run_blocking(self.save_checkpoint, checkpoint)
+        log.info("payment reconcile finished", extra={"window_start": start, "window_end": end, **progress["counts"]})
+        return progress["counts"]
+
+    async def _check_page(self, progress: dict, items: list[dict]):
+        counts = progress["counts"]
+        counts[progress["list"]] += len(items)
+        if progress["list"] == "orders":
+            paid = {o["id"]: o.get("notes") or {} for o in items if o.get("status") == "paid"}
+        else:
+            paid = {p["order_id"]: None for p in items if p.get("status") == "captured" and p.get("order_id")}
+        if not paid:
+            return
+
+        known = await run_blocking(self.known_orders, list(paid))
+        for order_id, notes in paid.items():
+            if order_id in known:
+                counts["present"] += 1
+                continue
+            if notes is None:
+                notes = await self.notes_for_order(order_id)
+            outcome = await self.backfill(order_id, notes)
+            counts[outcome] += 1
+            if outcome == "backfilled":
+                log.warning("backfilled registration for paid order", extra={"order_id": order_id})
+            elif outcome == "unrecoverable":
+                log.error("paid order has no registration and can't be backfilled", extra={"order_id": order_id})
+
+    # --- background job ---
+
+    async def run_due(self) -> dict | None:
+        """Finish an interrupted window, or cover the time since the last one. None if skipped."""
+        # the backfill checks the registration index; an empty one would let duplicates through
+        if not self.ready():
+            return None
+        token = await self.state.atry_lock("payment-reconcile", ttl=max(self.interval, 300))
+        if token is None:
+            return None
+        try:
+            checkpoint = await run_blocking(self.load_checkpoint)
+            if checkpoint.get("run"):
+                start, end = checkpoint["run"]["window"]
+            else:
+                end = int(time.time() - self.settle)
+                start = int(checkpoint.get("last_end") or end - self.lookback)
+            if end <= start:
+                return None
+            return await self.run(start, end)
+        finally:
+            await self.state.aunlock("payment-reconcile", token)
+
+    def start(self):
+        if self.interval <= 0 or (self._task and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_due()
+            except Exception as e:
+                # the checkpoint keeps the progress; the next round resumes
+                log.error("payment reconcile failed", extra={"error": str(e)})
+
+
+def parse_time(value: str) -> int:
+    from payments import IST
+
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=IST)
+    return int(moment.timestamp())
+
+
+async def main(start: int, end: int):
+    import app_logging
+    import clients
+    from mailer import dispatcher
+    from payments import payment_reconciler, registration_index, registration_outbox
+
+    app_logging.configure()
+    dispatcher.start()
+    registration_outbox.start()
+    try:
+        if not await registration_index.sync():
+            raise SystemExit("could not load the registration index; not reconciling")
+        counts = await payment_reconciler.run(start, end)
+        print(json.dumps(counts))
+    finally:
+        await registration_outbox.stop()
+        await clients.aclose()
+        await run_blocking(dispatcher.stop)
+        app_logging.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="start", required=True, help="ISO date or datetime (IST unless an offset is given)")
+    parser.add_argument("--to", dest="end", required=True)
+    args = parser.parse_args()
+    asyncio.run(main(parse_time(args.start), parse_time(args.end)))
@@ -1,35 +1,100 @@
-from datetime import datetime, date
+import hashlib
+import hmac
+import json
+import logging
+import uuid
+from datetime import datetime, date, timedelta
 from zoneinfo import ZoneInfo
 from decouple import config
-from fastapi import APIRouter, HTTPException, Body
-from pydantic import BaseModel
-import razorpay
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from supabase import create_client
+from email.message import Message
+from fastapi import APIRouter, HTTPException, Body, Header, Request, Response
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional
+from mailer import dispatcher, SMTP_USER, SMTP_PASS
+import email_templates
+import tickets
+from coupon_quota import FreeCouponQuota
+from clients import get_supabase, get_razorpay, razorpay_key_id, razorpay_key_secret, razorpay_webhook_secret
+from blocking import run_blocking
+from ttl_cache import TTLCache, DayCache
+from idempotency import IdempotencyStore
+from shared_state import get_state
+from pricing import PricingEngine, PRICING_RULES, normalize
+from metrics import timed, record_error
+from razorpay_async import RazorpayUnavailable
+from webhooks import WebhookPipeline
+from outbox import RegistrationOutbox
+from registration_index import RegistrationIndex
+from registration_stats import RegistrationStats
+from payment_reconciler import PaymentReconciler
+from keyset import table_pages
+from group_upload import GroupStaging, UploadError, iter_lines, iter_csv, iter_ndjson, MEMBER_FIELDS
+
+
+log = logging.getLogger(__name__)
+
+# Supabase / Razorpay clients are built on first use, see clients.py
+router = APIRouter()
 
+QUOTE_BATCH_MAX = int(config("QUOTE_BATCH_MAX", default="500"))
+REGISTRATION_CHUNK_SIZE = int(config("REGISTRATION_CHUNK_SIZE", default="200"))
 
-SUPABASE_URL = config("SUPABASE_URL")
-SUPABASE_KEY = config("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-router = APIRouter()
+OUTBOX_PATH = config("OUTBOX_PATH", default="outbox.sqlite3")
+OUTBOX_FLUSH_SECONDS = float(config("OUTBOX_FLUSH_SECONDS", default="1"))
+OUTBOX_SYNCHRONOUS = config("OUTBOX_SYNCHRONOUS", default="FULL")
+# renewed while a batch is in flight; only a dead worker's rows wait out the full lease
+OUTBOX_LEASE_SECONDS = float(config("OUTBOX_LEASE_SECONDS", default="60"))
+
+GROUP_STAGING_PATH = config("GROUP_STAGING_PATH", default="group_staging.sqlite3")
+GROUP_UPLOAD_MAX_MEMBERS = int(config("GROUP_UPLOAD_MAX_MEMBERS", default="5000"))
+GROUP_UPLOAD_MAX_ERRORS = int(config("GROUP_UPLOAD_MAX_ERRORS", default="100"))
+GROUP_UPLOAD_MAX_LINE = int(config("GROUP_UPLOAD_MAX_LINE", default="4096"))
+
+# uploaded group members, held until the order is paid
+group_staging = GroupStaging(GROUP_STAGING_PATH)
+
+ORDER_NOTES_TTL_SECONDS = float(config("ORDER_NOTES_TTL_SECONDS", default="900"))
+
+# notes of orders created by this worker, so verify-payment can usually skip client.order.fetch
+order_notes = TTLCache(ttl=ORDER_NOTES_TTL_SECONDS)
+
+# upper bound for Cache-Control on quotes; never past IST midnight, when tiers can change
+QUOTE_CACHE_MAX_AGE = int(config("QUOTE_CACHE_MAX_AGE", default="3600"))
+
+IDEMPOTENCY_TTL_SECONDS = float(config("IDEMPOTENCY_TTL_SECONDS", default="3600"))
+
+# completed create-order / verify-payment responses, replayed to retries (on any worker
+# when STATE_URL points at a shared backend)
+idempotency = IdempotencyStore(ttl=IDEMPOTENCY_TTL_SECONDS, state=get_state())
+
+WEBHOOK_EVENTS = {"payment.captured", "order.paid"}
+WEBHOOK_WORKERS = int(config("WEBHOOK_WORKERS", default="2"))
+# acked events are committed here before the 200, and retried until they are this old
+WEBHOOK_INBOX_PATH = config("WEBHOOK_INBOX_PATH", default="webhook_inbox.sqlite3")
+WEBHOOK_GIVE_UP_SECONDS = float(config("WEBHOOK_GIVE_UP_SECONDS", default="86400"))
 
-KEY_ID = config("RAZORPAY_KEY_ID")
-KEY_SECRET = config("RAZORPAY_SECRET")
-client = razorpay.Client(auth=(KEY_ID, KEY_SECRET))
+# Razorpay redelivers on timeouts; event ids we've already queued are kept in the
+# shared state backend under "webhook-event:<id>" for IDEMPOTENCY_TTL_SECONDS
 
-EARLY_END = date(2025, 9, 9)   # inclusive
-REGULAR_END = date(2025, 12, 11)  # inclusive
+REGISTRATION_INDEX_SYNC_SECONDS = float(config("REGISTRATION_INDEX_SYNC_SECONDS", default="300"))
+REGISTRATION_INDEX_PAGE_SIZE = int(config("REGISTRATION_INDEX_PAGE_SIZE", default="1000"))
+STATS_RECONCILE_SECONDS = float(config("STATS_RECONCILE_SECONDS", default="300"))
 
-SMTP_HOST = config("SMTP_HOST", default="smtp.gmail.com")
-SMTP_PORT = int(config("SMTP_PORT", default="587"))
-SMTP_USER = config("SMTP_USER", default="")
-SMTP_PASS = config("SMTP_PASS", default="")
+# backfill of captured payments that never reached verify-payment or the webhook;
+# RECONCILE_INTERVAL_SECONDS=0 turns the background job off
+RECONCILE_INTERVAL_SECONDS = float(config("RECONCILE_INTERVAL_SECONDS", default="900"))
+RECONCILE_SETTLE_SECONDS = float(config("RECONCILE_SETTLE_SECONDS", default="900"))
+RECONCILE_LOOKBACK_SECONDS = float(config("RECONCILE_LOOKBACK_SECONDS", default="86400"))
+RECONCILE_CHECKPOINT_PATH = config("RECONCILE_CHECKPOINT_PATH", default="reconcile_checkpoint.json")
+
+FREE_COUPON_LIMIT = int(config("FREE_COUPON_LIMIT", default="1000"))
+FREE_QUOTA_RECONCILE_SECONDS = float(config("FREE_QUOTA_RECONCILE_SECONDS", default="30"))
 
 class CouponRequest(BaseModel):
     coupon: str | None = None
+    # optional; when given, an already registered email / phone is reported
+    email: str | None = None
+    phone: int | None = None
 
 class CreateOrderRequest(BaseModel):
     coupon: str | None = None
@@ -43,6 +108,7 @@ class CreateOrderRequest(BaseModel):
 class GroupMember(BaseModel):
     name: str
     email: str
+    phone: int | None = None
     college: str | None = None
     type: str | None = None
 
@@ -55,208 +121,416 @@ class CreateOrderRequest(BaseModel):
     type: str | None = None
     group_members: list[GroupMember] | None = None
    
-def group_discount_price(size: int) -> int:
-    if 5 <= size <= 10:
-        return 400   # 60% discount
-    if size > 10:
-        return 300   # 70% discount
-    return 1000      # no group discount
+class QuoteItem(BaseModel):
+    coupon: str | None = None
+    group_size: int = Field(default=1, ge=1)
+    on_date: date | None = Field(default=None, alias="date")
+
+class BatchQuoteRequest(BaseModel):
+    items: list[QuoteItem] = Field(max_length=QUOTE_BATCH_MAX)
+
+# keep cutoffs in India time
+IST = ZoneInfo("Asia/Kolkata")
 
 def today_ist() -> date:
-    # keep cutoffs in India time
-    return datetime.now(ZoneInfo("Asia/Kolkata")).date()
+    return datetime.now(IST).date()
+
+def seconds_until_ist_midnight() -> int:
+    now = datetime.now(IST)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), IST)
+    return max(int((midnight - now).total_seconds()), 0)
 
 def current_tier_and_price(d: date | None = None) -> tuple[str, int]:
-    d = d or today_ist()
-    if d <= EARLY_END:
-        return ("Early Bird", 1000)
-    if d <= REGULAR_END:
-        return ("Regular", 1000)
-    return ("Late/Onsite", 1000)
+    return pricing_engine.tier(d or today_ist())
+
+def verify_payment_signature(order_id: str, payment_id: str, signature: str) -> bool:
+    """Checkout signature check: HMAC-SHA256 of "order_id|payment_id" with our key secret."""
+    secret = razorpay_key_secret()
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def verify_webhook_signature(body: bytes, signature: str) -> bool:
+    """Webhook signature check: HMAC-SHA256 of the raw body with the webhook secret."""
+    secret = razorpay_webhook_secret()
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+@timed("supabase.free_coupon_count")
+async def free_coupon_used_count() -> int:
+    """Count how many people already registered with FREE coupon.
+
+    Only rows already in Supabase; FREE registrations still in flight or
+    waiting in the outbox are counted by the quota's holds.
+
+    Raises on failure so the quota keeps its last known value instead of
+    treating an outage as zero usage.
+    """
+    res = await get_supabase().table("registrations").select("id", count="exact").eq("tier", "FREE").execute()
+    return res.count or 0
 
-def normalize(code: str | None) -> str:
-    return (code or "").strip().upper()
+def free_hold_id(email: str | None) -> str:
+    """Quota hold for one FREE registration; same key as its outbox dedup_key."""
+    return f"free:{(email or '').strip().lower()}"
 
+async def queued_free_holds() -> list[str]:
+    """Holds for FREE rows still in the outbox, restored at startup."""
+    return [free_hold_id(email) for email in await run_blocking(registration_outbox.pending_emails, "FREE")]
 
-def free_coupon_used_count() -> int:
-    """Count how many people already registered with FREE coupon."""
-    try:
-        res = supabase.table("registrations").select("id", count="exact").eq("tier", "FREE").execute()
-        return res.count or 0
-    except Exception as e:
-        print(f"⚠️ Failed to fetch free coupon usage: {e}")
-        return 0
+
+free_quota = FreeCouponQuota(
+    limit=FREE_COUPON_LIMIT,
+    counter=free_coupon_used_count,
+    interval=FREE_QUOTA_RECONCILE_SECONDS,
+    state=get_state(),
+    queued=queued_free_holds,
+)
+
+# Tiers, coupons and group bands all come from pricing.PRICING_RULES
+pricing_engine = PricingEngine(PRICING_RULES, quotas={"free": free_quota.available})
 
 def validate_coupon(code: str | None) -> str | None:
     """
     Returns type of coupon:
     - "FREE" for free coupon
     - "DISCOUNT" for 50% discount coupon
-    - None if invalid
+    - None if invalid (or free quota exhausted)
     """
-    code = normalize(code)
-    if code == "FREEIPRISM2025":
-        if free_coupon_used_count() >=1000:   # ✅ limit check
-            return None
-        return "FREE"
-    if code == "IPRISM2025":
-        return "DISCOUNT"
-    return None
+    return pricing_engine.coupon_type(code)
 
 
 def apply_coupon(base: int, coupon: str | None) -> tuple[int, int, str]:
     """
     Returns: (discount, final_amount, coupon_type)
     """
-    if not coupon:
-        return (0, base, "NONE")
-
-    code = normalize(coupon)
+    return pricing_engine.apply_coupon(base, coupon)
 
-    if code == "FREEIPRISM2025":
-        if free_coupon_used_count() >=1000:   #  prevent overuse
-            return (0, base, "NONE")
-        return (base, 0, "FREE")
-
-    if code == "IPRISM2025":
-        discount = base // 2
-        return (discount, base - discount, "DISCOUNT")
+def group_discount_price(size: int) -> int:
+    _, base = current_tier_and_price()
+    return pricing_engine.group_price(size, base)
 
-    # Invalid coupon
-    return (0, base, "NONE")
+@timed("email.enqueue")
+async def send_ack_email(to_email: str, name: str, tier: str, location: str, conference_date: str, final_amount: str) -> bool:
+    """Queue one confirmation. Returns False if it could not be queued."""
+    if not SMTP_USER or not SMTP_PASS:
+        log.warning("SMTP not configured, skipping email")
+        return True
 
-def group_discount_price(count: int) -> int:
-    base = 1000
-    if count >= 10:   # 10 or more
-        return 300    # 70% off
-    if count >= 5:    # 5 to 9
-        return 400    # 60% off
-    return base
+    # the registration is already stored; a broken email must not fail the request
+    try:
+        body = email_templates.render_confirmation(
+            name=name,
+            tier=tier,
+            location=location,
+            conference_date=conference_date,
+            final_amount=final_amount,
+            ticket=tickets.issue(to_email, name, tier, conference_date),
+        )
+        return await dispatcher.asubmit(confirmation_message(to_email, body))
+    except Exception as e:
+        record_error("email.enqueue")
+        log.error("failed to queue confirmation email", extra={"to": to_email, "error": str(e)})
+        return False
+
+def confirmation_message(to_email: str, body: str) -> Message:
+    return email_templates.build_message(
+        subject=email_templates.CONFIRMATION_SUBJECT,
+        sender=SMTP_USER,
+        to=to_email,
+        body=body,
+        bcc="sgpsmm@sgprs.com",
+    )
 
-def send_ack_email(to_email: str, name: str, tier: str, location: str, conference_date: str, final_amount: str):
-    if not SMTP_USER or not SMTP_PASS:
-        print("⚠️ SMTP not configured, skipping email.")
-        return
+def build_confirmations(rows: list[dict]) -> list[Message]:
+    """Confirmation messages for registration rows (as built by registration_row)."""
+    bodies = email_templates.render_confirmations([
+        {
+            "name": row["name"],
+            "tier": row["tier"],
+            "location": row["location"],
+            "conference_date": row["conference_date"],
+            "final_amount": row["amount_paid"],
+            "ticket": tickets.issue(row["email"], row["name"], row["tier"], row["conference_date"]),
+        }
+        for row in rows
+    ])
+    return [confirmation_message(row["email"], body) for row, body in zip(rows, bodies)]
 
-    subject = "🎉 IPRISM 2025 – Registration Confirmation"
-
-    body = f"""
-    <html>
-      <body style="font-family: Arial, sans-serif; color: #333; line-height: 1.6; padding:20px;">
-
-        <!-- Header with logo -->
-        <div style="display:flex; justify-content: space-between; align-items:center; margin-bottom:20px;">
-          <div>
-            <h1 style="color:#2E86C1; margin:0; font-size:22px;">IPSA 2025</h1>
-          </div>
-          <div>
-            <img src="https://saigangapanakeia.in/Images/logo.png" 
-                 alt="Sai Ganga Panakeia Ltd" 
-                 style="height:50px;"/>
-          </div>
-        </div>
-
-        <h2 style="color:#2E86C1;">Hello {name},</h2>
-
-        <p><b>Thank you for registering for the Conference </b> (Two Traditions,
-        One Science : The PSA Paradigm.)</p>
-
-        <h3 style="color:#117A65;">Your Registration Details:</h3>
-        <table style="border-collapse: collapse; width: 100%; margin-bottom:20px;">
-          <tr>
-            <td style="border:1px solid #ddd; padding:8px;"><b>Tier</b></td>
-            <td style="border:1px solid #ddd; padding:8px;">{tier}</td>
-          </tr>
-          <tr>
-            <td style="border:1px solid #ddd; padding:8px;"><b>Amount Paid</b></td>
-            <td style="border:1px solid #ddd; padding:8px;">₹{final_amount}</td>
-          </tr>
-          <tr>
-            <td style="border:1px solid #ddd; padding:8px;"><b>Location</b></td>
-            <td style="border:1px solid #ddd; padding:8px;">{location}</td>
-          </tr>
-          <tr>
-            <td style="border:1px solid #ddd; padding:8px;"><b>Conference Date</b></td>
-            <td style="border:1px solid #ddd; padding:8px;">{conference_date}</td>
-          </tr>
-        </table>
-
-        <p>
-          Healthcare is changing fast — and India is leading the way. 
-          The Conference 
-          is not just another event, but a 
-          <span style="color:#D35400;"><b>movement where tradition meets technology</b></span> and ideas turn into action.
-          Uniting <b>Ayurveda, Allopathy, Naturopathy, Nutrition</b> and <b>Digital Health</b>, 
-          IPSA 2025 provides a unique platform for <b>doctors, students, researchers, entrepreneurs</b> 
-          and <b>policymakers</b> to collaborate, learn, and shape the future of integrative healthcare.
-        </p>
-
-        <p style="margin-top:20px;">We look forward to welcoming you to the Conference.</p>
-
-        <p style="margin-top:30px; font-weight:bold; color:#2E4053;">Warm regards, <br>
-        Sai Ganga Panakeia Ltd</p>
-
-        <hr style="margin-top:40px;"/>
-        <p style="font-size:12px; color:#7F8C8D;">
-          📍 Location: {location} | 📅 Date: {conference_date} <br>
-          For any queries, contact us at <a href="mailto:ipsaevent@sgprs.com">ipsaevent@sgprs.com</a>
-        </p>
-      </body>
-    </html>
+@timed("email.enqueue_batch")
+async def send_ack_emails(rows: list[dict]) -> int:
     """
+    Queue a confirmation for each registration row. Building a big group's
+    messages is real CPU work, so it runs off the event loop; a full mail
+    queue then holds the batch back instead of dropping it. Returns how
+    many could not be queued.
+    """
+    if not rows:
+        return 0
+    if not SMTP_USER or not SMTP_PASS:
+        log.warning("SMTP not configured, skipping email")
+        return 0
 
-    msg = MIMEMultipart("alternative")
-    msg["From"] = SMTP_USER
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    msg["Bcc"] = "sgpsmm@sgprs.com"
-
-    msg.attach(MIMEText(body, "html"))
+    try:
+        messages = await run_blocking(build_confirmations, rows)
+    except Exception as e:
+        record_error("email.enqueue_batch")
+        log.error("failed to queue confirmation emails", extra={"rows": len(rows), "error": str(e)})
+        return len(rows)
+    not_queued = 0
+    for msg in messages:
+        if not await dispatcher.asubmit(msg):
+            not_queued += 1
+    if not_queued:
+        record_error("email.enqueue_batch")
+        log.error("confirmation emails not queued", extra={"rows": not_queued, "queued": len(rows) - not_queued})
+    return not_queued
+
+def registration_row(name: str, email: str, phone: int | None, tier: str, amount: str, location: str, conference_date: str, college: str | None, type_: str | None = None) -> dict:
+    return {
+        "name": name,
+        "email": email,
+        "phone": phone,
+        "tier": tier,
+        "amount_paid": amount,
+        "location": location,
+        "conference_date": conference_date,
+        "college" : college,
+        "type": type_,
+    }
 
+@timed("outbox.store_registration")
+async def store_registration(name: str, email: str, phone:int, tier: str, amount: str, location: str, conference_date: str, college:str,type_: str | None = None, order_id: str | None = None, dedup_key: str | None = None):
+    """
+    Commit a registration to the local outbox; the flusher delivers it to
+    Supabase. Returns False only if the local commit itself failed.
+    """
     try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
-            print(f"✅ Email sent to {to_email}")
+        data = registration_row(name, email, phone, tier, amount, location, conference_date, college, type_)
+        added = await registration_outbox.add([data], order_id=order_id, dedup_keys=[dedup_key] if dedup_key else None)
+        await registration_index.add(email, phone)
+        if added:
+            registration_stats.add(data)
+        log.info("registration stored", extra={"email": email, "tier": tier, "order_id": order_id, "sample": True})
+        return True
     except Exception as e:
-        print(f"❌ Failed to send email: {e}")
+        record_error("outbox.store_registration")
+        log.error("failed to store registration", extra={"email": email, "order_id": order_id, "error": str(e)})
+        return False
 
-def store_registration(name: str, email: str, phone:int, tier: str, amount: str, location: str, conference_date: str, college:str,type_: str | None = None):
+@timed("outbox.store_registrations_bulk")
+async def store_registrations_bulk(rows: list[dict], order_id: str | None = None, dedup_keys: list[str] | None = None) -> list[dict]:
+    """
+    Commit many registration rows (built with registration_row) to the
+    outbox in one local transaction. Returns one result per input row, in
+    order: {"email": ..., "stored": bool, "error": str | None}
+    """
     try:
-        data = {
-            "name": name,
-            "email": email,
-            "phone": phone,
-            "tier": tier,
-            "amount_paid": amount,
-            "location": location,
-            "conference_date": conference_date,
-            "college" : college,
-            "type": type_,
-        }
-        supabase.table("registrations").insert(data).execute()
-        print(f"✅ Stored registration in Supabase for {email}")
+        added = await registration_outbox.add(rows, order_id=order_id, dedup_keys=dedup_keys)
+        await registration_index.add_many([(r["email"], r["phone"]) for r in rows])
+        # a retried batch adds nothing; a partly new one (rare) is left to reconcile
+        if added == len(rows):
+            registration_stats.add_many(rows)
+        log.info("registrations stored", extra={"rows": len(rows), "order_id": order_id})
+        return [{"email": r["email"], "stored": True, "error": None} for r in rows]
     except Exception as e:
-        print(f"❌ Failed to store registration: {e}")
+        record_error("outbox.store_registrations_bulk")
+        log.error("failed to store registrations", extra={"rows": len(rows), "order_id": order_id, "error": str(e)})
+        return [{"email": r["email"], "stored": False, "error": str(e)} for r in rows]
 
-@router.post("/quote")
-def quote(body: CouponRequest):
-    tier, base = current_tier_and_price()
-    discount, final_amt, ctype = apply_coupon(base, body.coupon)
-    return {
+def rejected_rows(e: Exception) -> bool:
+    """
+    True if Supabase refused the data (a 4xx: bad value, constraint), so
+    other rows of the same chunk may go through on their own. Timeouts,
+    connection errors and 5xx are about Supabase, not the rows.
+    """
+    from postgrest.exceptions import APIError   # loaded with the client, not at import time
+
+    if not isinstance(e, APIError):
+        return False
+    code = str(e.code or "")
+    if code.isdigit() and len(code) == 3:
+        return code.startswith("4")   # no JSON body; postgrest puts the HTTP status here
+    # SQLSTATE data exceptions / integrity violations, PostgREST request errors
+    return code[:2] in ("22", "23") or code.startswith("PGRST1")
+
+
+@timed("supabase.insert_registrations")
+async def insert_registrations(rows: list[dict], chunk_size: int = REGISTRATION_CHUNK_SIZE) -> list[dict]:
+    """
+    Insert registration rows into Supabase in as few calls as possible.
+    This is the outbox flusher's sink; request handlers go through
+    store_registration / store_registrations_bulk instead.
+
+    Rows are sent `chunk_size` at a time. A multi-row insert is all-or-nothing,
+    so if Supabase rejects a chunk's data its rows are retried one by one to
+    find out which ones are actually bad. If Supabase itself is failing
+    (timeout, connection error, 5xx) the call stops there and every row not
+    yet stored is failed, for the outbox to retry with backoff. Returns one
+    result per input row, in order: {"email": ..., "stored": bool, "error": str | None}
+    """
+    results = []
+
+    async def delivered(stored: list[dict]):
+        # FREE rows are in the remote count now; drop their quota holds
+        holds = [free_hold_id(r["email"]) for r in stored if r.get("tier") == "FREE"]
+        if holds:
+            try:
+                await free_quota.delivered(holds)
+            except Exception as e:
+                log.warning("could not drop free quota holds", extra={"rows": len(holds), "error": str(e)})
+
+    def fail_rest(error: str):
+        results.extend({"email": r["email"], "stored": False, "error": error} for r in rows[len(results):])
+        return results
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            await get_supabase().table("registrations").insert(chunk).execute()
+            results.extend({"email": r["email"], "stored": True, "error": None} for r in chunk)
+            log.info("registrations inserted", extra={"rows": len(chunk), "sample": True})
+            await delivered(chunk)
+            continue
+        except Exception as e:
+            if not rejected_rows(e):
+                record_error("supabase.insert_registrations")
+                log.error("bulk insert failed, leaving the batch for retry", extra={"rows": len(rows) - len(results), "error": str(e)})
+                return fail_rest(str(e))
+            log.warning("bulk insert rejected, retrying row by row", extra={"rows": len(chunk), "error": str(e)})
+
+        for row in chunk:
+            try:
+                await get_supabase().table("registrations").insert(row).execute()
+                results.append({"email": row["email"], "stored": True, "error": None})
+                await delivered([row])
+            except Exception as e:
+                record_error("supabase.insert_registrations")
+                if not rejected_rows(e):
+                    log.error("insert failed, leaving the batch for retry", extra={"rows": len(rows) - len(results), "error": str(e)})
+                    return fail_rest(str(e))
+                log.error("failed to insert registration", extra={"email": row["email"], "error": str(e)})
+                results.append({"email": row["email"], "stored": False, "error": str(e)})
+    return results
+
+registration_outbox = RegistrationOutbox(
+    OUTBOX_PATH,
+    sink=insert_registrations,
+    batch_size=REGISTRATION_CHUNK_SIZE,
+    interval=OUTBOX_FLUSH_SECONDS,
+    synchronous=OUTBOX_SYNCHRONOUS,
+    lease=OUTBOX_LEASE_SECONDS,
+)
+
+async def registered_contacts():
+    """(email, phone) pages for the registration index: outbox backlog first, then Supabase by id."""
+    yield await run_blocking(registration_outbox.pending_contacts)
+    async for rows in table_pages("registrations", "id,email,phone", REGISTRATION_INDEX_PAGE_SIZE):
+        yield [(r.get("email"), r.get("phone")) for r in rows]
+
+STATS_COLUMNS = "id,tier,type,college,amount_paid"
+
+async def registration_stat_rows():
+    """Rows for the registration stats: outbox backlog first, then Supabase by id."""
+    yield await run_blocking(registration_outbox.pending_rows)
+    async for rows in table_pages("registrations", STATS_COLUMNS, REGISTRATION_INDEX_PAGE_SIZE):
+        yield rows
+
+registration_stats = RegistrationStats(registration_stat_rows, interval=STATS_RECONCILE_SECONDS)
+
+registration_index = RegistrationIndex(registered_contacts, interval=REGISTRATION_INDEX_SYNC_SECONDS, state=get_state())
+
+async def reject_duplicate(email: str | None, phone: int | None):
+    conflict = await registration_index.conflict(email, phone)
+    if conflict:
+        raise HTTPException(status_code=409, detail=f"This {conflict} is already registered")
+
+# rendered /quote bodies and ETags by coupon, for the current IST day
+quote_cache = DayCache()
+
+def render_quote(today: date, coupon: str | None) -> tuple[bytes, str]:
+    tier, base = current_tier_and_price(today)
+    discount, final_amt, ctype = apply_coupon(base, coupon)
+    body = json.dumps({
         "tier": tier,
         "base_rupees": base,
         "discount_rupees": discount,
         "final_rupees": final_amt,
         "coupon_type": ctype,
         "coupon_valid": ctype != "NONE"
+    }, separators=(",", ":")).encode()
+    return body, '"' + hashlib.sha256(body).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def quote_response(coupon: str | None, if_none_match: str | None) -> Response:
+    """
+    A quote only depends on the coupon and the IST date, so the rendered
+    body is cached per (coupon, day) and served with an ETag and a
+    Cache-Control that runs out at IST midnight at the latest. FREE quotes
+    depend on the remaining quota and are never cached.
+    """
+    today = today_ist()
+    key = pricing_engine.cache_key(coupon)
+    cached = quote_cache.get(today, key) if key is not None else None
+    if cached is None:
+        cached = render_quote(today, coupon)
+        if key is not None:
+            quote_cache.set(today, key, cached)
+    body, etag = cached
+
+    headers = {"ETag": etag}
+    if key is None:
+        headers["Cache-Control"] = "no-store"
+    else:
+        headers["Cache-Control"] = f"public, max-age={min(QUOTE_CACHE_MAX_AGE, seconds_until_ist_midnight())}"
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+@router.post("/quote")
+async def quote(body: CouponRequest, if_none_match: str | None = Header(default=None)):
+    return quote_response(body.coupon, if_none_match)
+
+@router.get("/quote")
+async def quote_get(coupon: str | None = None, if_none_match: str | None = Header(default=None)):
+    """Same as POST /quote, but cacheable by browsers and the CDN."""
+    return quote_response(coupon, if_none_match)
+
+@router.post("/quote/batch")
+async def quote_batch(body: BatchQuoteRequest):
+    """Price many (coupon, group size, date) combinations for the pricing grid."""
+    today = today_ist()
+    return {
+        "quotes": [
+            {"coupon": normalize(item.coupon), **pricing_engine.quote(item.on_date or today, item.coupon, item.group_size)}
+            for item in body.items
+        ]
     }
 
 @router.post("/validate-coupon")
-def validate(body: CouponRequest):
+async def validate(body: CouponRequest):
     tier, base = current_tier_and_price()
     discount, final_amt, ctype = apply_coupon(base, body.coupon)
+    conflict = await registration_index.conflict(body.email, body.phone)
+    if conflict:
+        return {
+            "valid": False,
+            "tier": tier,
+            "base_rupees": base,
+            "discount_rupees": 0,
+            "final_rupees": base,
+            "coupon_type": ctype,
+            "already_registered": conflict,
+            "message": f"This {conflict} is already registered",
+        }
     return {
         "valid": ctype != "NONE",
         "tier": tier,
@@ -271,8 +545,23 @@ def validate(body: CouponRequest):
         )
     }
 
+def razorpay_http_error(e: Exception) -> HTTPException:
+    """503 (with Retry-After) when Razorpay is down or its circuit is open, else 400 as before."""
+    if isinstance(e, RazorpayUnavailable):
+        headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else None
+        return HTTPException(status_code=503, detail="Payment gateway unavailable, please retry shortly", headers=headers)
+    return HTTPException(status_code=400, detail=str(e))
+
+def request_fingerprint(body: BaseModel) -> str:
+    return hashlib.sha256(body.model_dump_json().encode()).hexdigest()
+
 @router.post("/create-order")
-def create_order(body: CreateOrderRequest):
+async def create_order(body: CreateOrderRequest, idempotency_key: str | None = Header(default=None)):
+    # Without a key every call is a new order, as before
+    key = f"create-order:{idempotency_key}" if idempotency_key else None
+    return await idempotency.run(key, lambda: _create_order(body), fingerprint=request_fingerprint(body))
+
+async def _create_order(body: CreateOrderRequest):
     tier, base = current_tier_and_price()
     discount, final_amt_rupees, ctype = apply_coupon(base, body.coupon)
 
@@ -281,7 +570,17 @@ def create_order(body: CreateOrderRequest):
 
     # --- FREE coupon path ---
     if ctype == "FREE":
-        store_registration(
+        # registers right away, so claim the email / phone before anyone else can
+        conflict = await registration_index.claim(body.email, body.phone)
+        if conflict:
+            raise HTTPException(status_code=409, detail=f"This {conflict} is already registered")
+        # apply_coupon only peeked at the quota; claim the seat for real here
+        hold = free_hold_id(body.email)
+        if not await free_quota.reserve(hold):
+            await registration_index.discard(body.email, body.phone)
+            raise HTTPException(status_code=409, detail="Free coupon quota exhausted")
+
+        stored = await store_registration(
             name=body.name,
             email=body.email,
             phone=body.phone,
@@ -291,9 +590,15 @@ def create_order(body: CreateOrderRequest):
             conference_date=FIXED_CONFERENCE_DATE,
             college=body.college,
             type_=body.type,  # capture if provided
+            dedup_key=hold,
         )
+        if not stored:
+            await free_quota.release(hold)
+            await registration_index.discard(body.email, body.phone)
+            raise HTTPException(status_code=502, detail="Could not store registration, please retry")
+        await free_quota.commit(hold)
 
-        send_ack_email(
+        await send_ack_email(
             to_email=body.email,
             name=body.name,
             tier="FREE",
@@ -309,13 +614,20 @@ def create_order(body: CreateOrderRequest):
         }
     # --- GROUP path ---
     if body.group_members and len(body.group_members) >= 2:
+        taken = [
+            {"email": m.email, "already_registered": conflict}
+            for m in body.group_members
+            if (conflict := await registration_index.conflict(m.email, m.phone))
+        ]
+        if taken:
+            raise HTTPException(status_code=409, detail={"message": "Some members are already registered", "members": taken})
         size = len(body.group_members)
         price_per_head = group_discount_price(size)
         total_rupees = price_per_head * size
 
         amount_paise = total_rupees * 100
         try:
-            order = client.order.create({
+            order = await get_razorpay().order.create({
                 "amount": amount_paise,
                 "currency": "INR",
                 "payment_capture": 1,
@@ -328,8 +640,9 @@ def create_order(body: CreateOrderRequest):
                     "phones": ",".join(str(m.phone) for m in body.group_members)
                 }
             })
+            order_notes.set(order["id"], order.get("notes", {}))
             return {
-                "key": KEY_ID,
+                "key": razorpay_key_id(),
                 "order": order,
                 "amount": amount_paise,
                 "display": {
@@ -340,11 +653,12 @@ def create_order(body: CreateOrderRequest):
                 }
             }
         except Exception as e:
-            raise HTTPException(status_code=400, detail=str(e))
+            raise razorpay_http_error(e)
 
+    await reject_duplicate(body.email, body.phone)
     amount_paise = final_amt_rupees * 100
     try:
-        order = client.order.create({
+        order = await get_razorpay().order.create({
                 "amount": amount_paise,
                 "currency": "INR",
                 "payment_capture": 1,
@@ -363,8 +677,9 @@ def create_order(body: CreateOrderRequest):
                     "conference_date": FIXED_CONFERENCE_DATE,
                 }
         })
+        order_notes.set(order["id"], order.get("notes", {}))
         return {
-            "key": KEY_ID,
+            "key": razorpay_key_id(),
             "order": order,
             "amount": amount_paise,
             "display": {
@@ -375,7 +690,131 @@ def create_order(body: CreateOrderRequest):
             }
         }
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise razorpay_http_error(e)
+
+@router.post("/group-upload")
+async def group_upload(request: Request):
+    """
+    Register a whole group from a CSV (text/csv, header row required) or
+    NDJSON (application/x-ndjson) upload with one member per line.
+
+    The body is parsed and validated line by line and the members are
+    staged in SQLite as they arrive, so memory doesn't grow with the group.
+    Any bad line rejects the upload with 422 and the line numbers; a clean
+    upload gets one Razorpay order for the whole group.
+    """
+    FIXED_LOCATION = "T-HUB"
+    FIXED_CONFERENCE_DATE = "2025-10-26"
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        parse = iter_csv
+    elif content_type in ("application/x-ndjson", "application/jsonl", "application/json-seq"):
+        parse = iter_ndjson
+    else:
+        raise HTTPException(status_code=415, detail="Upload text/csv or application/x-ndjson")
+
+    batch = f"upload:{uuid.uuid4().hex}"
+    size = 0
+    errors = []
+    error_count = 0
+    pending: list[tuple[int, dict]] = []
+
+    def error(line: int, message: str):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < GROUP_UPLOAD_MAX_ERRORS:
+            errors.append({"line": line, "error": message})
+
+    try:
+        await run_blocking(group_staging.prune)
+        async for line, record, problem in parse(iter_lines(request.stream(), GROUP_UPLOAD_MAX_LINE)):
+            if problem:
+                error(line, problem)
+                continue
+            # blank CSV cells mean "not given"
+            record = {k: (v if v != "" else None) for k, v in record.items() if k in MEMBER_FIELDS}
+            try:
+                member = GroupMember(**record)
+            except ValidationError as e:
+                error(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+                continue
+            if not member.name.strip() or "@" not in member.email:
+                error(line, "name and a valid email are required")
+                continue
+            if conflict := await registration_index.conflict(member.email, member.phone):
+                error(line, f"{conflict} is already registered")
+                continue
+            size += 1
+            if size > GROUP_UPLOAD_MAX_MEMBERS:
+                raise UploadError(f"a group can have at most {GROUP_UPLOAD_MAX_MEMBERS} members")
+            if not error_count:   # once the upload is rejected there's no point staging more
+                pending.append((line, member.model_dump()))
+                if len(pending) >= REGISTRATION_CHUNK_SIZE:
+                    await group_staging.add(batch, pending)
+                    pending = []
+        if pending and not error_count:
+            await group_staging.add(batch, pending)
+
+        if not error_count:
+            duplicates = await run_blocking(group_staging.count_duplicates, batch)
+            if duplicates:
+                error_count += duplicates
+                for line, email in await run_blocking(group_staging.duplicates, batch, GROUP_UPLOAD_MAX_ERRORS):
+                    errors.append({"line": line, "error": f"duplicate email {email}"})
+    except UploadError as e:
+        await run_blocking(group_staging.discard, batch)
+        raise HTTPException(status_code=422, detail=str(e))
+    except BaseException:
+        await run_blocking(group_staging.discard, batch)
+        raise
+
+    if error_count or size < pricing_engine.group_min_size:
+        await run_blocking(group_staging.discard, batch)
+        if not error_count:
+            raise HTTPException(status_code=422, detail=f"A group needs at least {pricing_engine.group_min_size} members")
+        raise HTTPException(status_code=422, detail={
+            "message": f"{error_count} invalid lines; nothing was registered",
+            "error_count": error_count,
+            "errors": errors,
+        })
+
+    _, base = current_tier_and_price()
+    price_per_head = group_discount_price(size)
+    total_rupees = price_per_head * size
+    amount_paise = total_rupees * 100
+    try:
+        order = await get_razorpay().order.create({
+            "amount": amount_paise,
+            "currency": "INR",
+            "payment_capture": 1,
+            "notes": {
+                "tier": f"Group ({size})",
+                "price_per_head": str(price_per_head),
+                "group_size": str(size),
+                "staged_members": str(size),
+                "location": FIXED_LOCATION,
+                "conference_date": FIXED_CONFERENCE_DATE,
+            }
+        })
+    except Exception as e:
+        await run_blocking(group_staging.discard, batch)
+        raise razorpay_http_error(e)
+
+    await run_blocking(group_staging.rename, batch, order["id"])
+    order_notes.set(order["id"], order.get("notes", {}))
+    return {
+        "key": razorpay_key_id(),
+        "order": order,
+        "amount": amount_paise,
+        "group_size": size,
+        "display": {
+            "tier": f"Group ({size})",
+            "base_rupees": base,
+            "discount_rupees": (base - price_per_head),
+            "final_rupees": total_rupees,
+        }
+    }
 
 class VerifyPayload(BaseModel):
     razorpay_order_id: str
@@ -384,84 +823,300 @@ class VerifyPayload(BaseModel):
     group_members: list[GroupMember] | None = None
 
 @router.post("/verify-payment")
-def verify_payment(payload: VerifyPayload):
+async def verify_payment(payload: VerifyPayload, idempotency_key: str | None = Header(default=None)):
+    # Reject forged callbacks before making any outbound call
+    if not verify_payment_signature(payload.razorpay_order_id, payload.razorpay_payment_id, payload.razorpay_signature):
+        raise HTTPException(status_code=400, detail="Verification failed: invalid payment signature")
+
+    # An order is only ever confirmed once, so the order id is the key; a
+    # fresh Idempotency-Key must not run the confirmation again
+    if idempotency_key:
+        await idempotency.bind(f"verify-payment:{idempotency_key}", payload.razorpay_order_id)
+    key = f"verify-payment:{payload.razorpay_order_id}"
+    return await idempotency.run(key, lambda: _verify_payment(payload), fingerprint=request_fingerprint(payload))
+
+async def _verify_payment(payload: VerifyPayload):
     FIXED_LOCATION = "T-HUB"
     FIXED_CONFERENCE_DATE = "2025-09-21"
 
+    group_results = []
+    emails_not_queued = 0
     try:
-        # Fetch the Razorpay order
-        order = client.order.fetch(payload.razorpay_order_id)
-        notes = order.get("notes", {})
+        notes = await notes_for_order(payload.razorpay_order_id)
 
         # --- 1. Handle group members if provided ---
         if payload.group_members:
-            size = len(payload.group_members)
-            price_per_head = group_discount_price(size)
-
-            for member in payload.group_members:
-                # Store registration
-                store_registration(
+            check_group_members(payload.group_members, notes)
+            rows = [
+                registration_row(
                     name=member.name,
                     email=member.email,
                     phone=member.phone,
-                    tier=f"Group ({size})",
-                    amount=str(price_per_head),
+                    tier=notes["tier"],
+                    amount=notes["price_per_head"],
                     location=FIXED_LOCATION,
                     conference_date=FIXED_CONFERENCE_DATE,
                     college=member.college or "N/A",
                     type_=member.type or "N/A",
                 )
-                # Send acknowledgment email
-                send_ack_email(
-                    to_email=member.email,
-                    name=member.name,
-                    tier=f"Group ({size})",
-                    location=FIXED_LOCATION,
-                    conference_date=FIXED_CONFERENCE_DATE,
-                    final_amount=str(price_per_head),
-                )
+                for member in payload.group_members
+            ]
+            group_results = await store_registrations_bulk(
+                rows,
+                order_id=payload.razorpay_order_id,
+                dedup_keys=[f"{payload.razorpay_order_id}:{row['email'].strip().lower()}" for row in rows],
+            )
 
-        # --- 2. Handle individual registration (or fallback for group with notes) ---
-        if notes.get("name") and notes.get("email"):
-            # Log for debugging
-            print("💡 Storing individual registration:", notes)
+            emails_not_queued = await send_ack_emails([
+                row for row, result in zip(rows, group_results) if result["stored"]
+            ])
 
-            store_registration(
-                name=notes.get("name"),
-                email=notes.get("email"),
-                phone=notes.get("phone"),
-                tier=notes.get("tier"),
-                amount=notes.get("final_rupees"),
-                location=notes.get("location"),
-                conference_date=notes.get("conference_date"),
-                college=notes.get("college"),
-                type_=notes.get("type"),
-            )
+        # --- 2. Handle a group uploaded through /group-upload ---
+        staged = await confirm_staged_group(payload.razorpay_order_id, notes)
+        if staged is not None:
+            return {
+                "status": "success",
+                "order_id": payload.razorpay_order_id,
+                "notes": notes,
+                "group_size": staged["group_size"],
+                "group_failed": staged["group_failed"],
+                "emails_not_queued": staged["emails_not_queued"],
+            }
 
-            send_ack_email(
-                to_email=notes.get("email"),
-                name=notes.get("name"),
-                tier=notes.get("tier"),
-                location=notes.get("location"),
-                conference_date=notes.get("conference_date"),
-                final_amount=notes.get("final_rupees"),
-            )
+        # --- 3. Handle individual registration (or fallback for group with notes) ---
+        await confirm_individual(payload.razorpay_order_id, notes)
 
         return {
             "status": "success",
             "order_id": payload.razorpay_order_id,
             "notes": notes,
-            "group_size": len(payload.group_members) if payload.group_members else 0
+            "group_size": len(payload.group_members) if payload.group_members else 0,
+            "group_failed": [r for r in group_results if not r["stored"]],
+            "emails_not_queued": emails_not_queued,
         }
 
+    except HTTPException:
+        raise
+    except RazorpayUnavailable as e:
+        raise razorpay_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Verification failed: {e}")
 
+def check_group_members(members: list[GroupMember], notes: dict):
+    """
+    The signature only proves the order was paid; the members come from
+    the client. Hold them to what the order was created (and priced) for.
+    """
+    if not notes.get("group_size") or not notes.get("price_per_head"):
+        raise HTTPException(status_code=400, detail="Verification failed: this order is not a group order")
+    if len(members) != int(notes["group_size"]):
+        raise HTTPException(status_code=400, detail=f"Verification failed: the order was paid for {notes['group_size']} members, not {len(members)}")
+    if sorted(str(m.phone) for m in members) != sorted(str(notes.get("phones") or "").split(",")):
+        raise HTTPException(status_code=400, detail="Verification failed: members don't match the order")
+
+async def notes_for_order(order_id: str) -> dict:
+    # Notes captured in create_order; only ask Razorpay if this worker didn't create the order
+    notes = order_notes.get(order_id)
+    if notes is None:
+        order = await get_razorpay().order.fetch(order_id)
+        notes = order.get("notes") or {}   # Razorpay sends [] for "no notes"
+        order_notes.set(order_id, notes)
+    return notes
+
+async def confirm_staged_group(order_id: str, notes: dict) -> dict | None:
+    """
+    Store and email the members staged by /group-upload for this order,
+    a chunk at a time. Like confirm_individual, keyed on the order id so
+    verify-payment and the webhook only do it once. Returns None if the
+    order isn't a staged group.
+    """
+    if not notes.get("staged_members"):
+        return None
+    return await idempotency.run(f"confirm-group:{order_id}", lambda: _confirm_staged_group(order_id, notes))
+
+async def _confirm_staged_group(order_id: str, notes: dict) -> dict:
+    # staging is a per-host file and is pruned after two days; if the members
+    # aren't all here, registering some and calling it done would lose the rest
+    expected = int(notes["staged_members"])
+    staged = await run_blocking(group_staging.count, order_id)
+    if staged != expected:
+        log.error("staged group incomplete", extra={"order_id": order_id, "staged": staged, "expected": expected})
+        raise HTTPException(status_code=503, detail=f"Only {staged} of the group's {expected} members are staged on this server")
+
+    failed = emails_not_queued = 0
+    async for chunk in group_staging.iter_chunks(order_id, REGISTRATION_CHUNK_SIZE):
+        rows = [
+            registration_row(
+                name=member["name"],
+                email=member["email"],
+                phone=member.get("phone"),
+                tier=notes.get("tier"),
+                amount=notes.get("price_per_head"),
+                location=notes.get("location"),
+                conference_date=notes.get("conference_date"),
+                college=member.get("college") or "N/A",
+                type_=member.get("type") or "N/A",
+            )
+            for _, member in chunk
+        ]
+        results = await store_registrations_bulk(
+            rows,
+            order_id=order_id,
+            dedup_keys=[f"{order_id}:{row['email'].strip().lower()}" for row in rows],
+        )
+        emails_not_queued += await send_ack_emails([row for row, result in zip(rows, results) if result["stored"]])
+        failed += sum(1 for r in results if not r["stored"])
+
+    if failed:
+        # keep the staged rows; a retry re-adds them and the outbox drops the ones it already has
+        raise RuntimeError(f"could not store {failed} of the group's registrations")
+    await run_blocking(group_staging.discard, order_id)
+    return {"group_size": expected, "group_failed": [], "emails_not_queued": emails_not_queued}
+
+async def confirm_individual(order_id: str, notes: dict) -> bool:
+    """
+    Store and email the individual registration carried in an order's notes.
+
+    Both /verify-payment and the webhook pipeline end up here for the same
+    order, so the work is keyed on the order id and done only once.
+    Returns False if the notes don't describe an individual registration.
+    """
+    if not (notes.get("name") and notes.get("email")):
+        return False
+    return await idempotency.run(f"confirm:{order_id}", lambda: _confirm_individual(order_id, notes))
+
+async def _confirm_individual(order_id: str, notes: dict) -> bool:
+    log.info("confirming individual registration", extra={"order_id": order_id, "tier": notes.get("tier"), "email": notes.get("email")})
+
+    stored = await store_registration(
+        name=notes.get("name"),
+        email=notes.get("email"),
+        phone=notes.get("phone"),
+        tier=notes.get("tier"),
+        amount=notes.get("final_rupees"),
+        location=notes.get("location"),
+        conference_date=notes.get("conference_date"),
+        college=notes.get("college"),
+        type_=notes.get("type"),
+        order_id=order_id,
+        dedup_key=f"{order_id}:individual",
+    )
+    if not stored:
+        # don't let the idempotency layer remember this as done
+        raise RuntimeError("could not store registration")
+
+    await send_ack_email(
+        to_email=notes.get("email"),
+        name=notes.get("name"),
+        tier=notes.get("tier"),
+        location=notes.get("location"),
+        conference_date=notes.get("conference_date"),
+        final_amount=notes.get("final_rupees"),
+    )
+    return True
+
+
+async def backfill_order(order_id: str, notes: dict) -> str:
+    """
+    Make sure a paid order that isn't in the outbox ledger has its
+    registration, through the same confirm path verify-payment uses.
+    Returns "present" (registered elsewhere), "backfilled", or
+    "unrecoverable" when the notes don't carry enough to register anyone.
+    """
+    if notes.get("staged_members"):
+        if await run_blocking(group_staging.count, order_id) != int(notes["staged_members"]):
+            return "unrecoverable"   # staging expired or is on another host; members only existed there
+        await confirm_staged_group(order_id, notes)
+        return "backfilled"
+    if notes.get("name") and notes.get("email"):
+        if await registration_index.conflict(notes["email"]):
+            return "present"
+        await confirm_individual(order_id, notes)
+        return "backfilled"
+    # group orders from create-order only carry phones; members came with verify-payment
+    phones = [p for p in str(notes.get("phones") or "").split(",") if p]
+    if phones and all([await registration_index.conflict(phone=p) for p in phones]):
+        return "present"
+    return "unrecoverable"
+
+async def handle_payment_event(event: dict):
+    """Webhook pipeline handler for payment.captured / order.paid."""
+    payload = event.get("payload", {})
+    order = payload.get("order", {}).get("entity") or {}
+    payment = payload.get("payment", {}).get("entity") or {}
+    order_id = order.get("id") or payment.get("order_id")
+    if not order_id:
+        return
+
+    notes = order.get("notes") or await notes_for_order(order_id)
+    if await confirm_staged_group(order_id, notes) is None:
+        await confirm_individual(order_id, notes)
+
+
+payment_reconciler = PaymentReconciler(
+    get_razorpay,
+    registration_outbox.known_orders,
+    notes_for_order,
+    backfill_order,
+    ready=registration_index.ready,
+    state=get_state(),
+    checkpoint_path=RECONCILE_CHECKPOINT_PATH,
+    interval=RECONCILE_INTERVAL_SECONDS,
+    settle=RECONCILE_SETTLE_SECONDS,
+    lookback=RECONCILE_LOOKBACK_SECONDS,
+)
+
+async def webhook_given_up(event_id: str, event: dict):
+    """Forget the event id, so Razorpay's next redelivery is processed instead of dropped as a duplicate."""
+    await get_state().adelete(f"webhook-event:{event_id}")
+
+webhook_pipeline = WebhookPipeline(
+    WEBHOOK_INBOX_PATH,
+    handle_payment_event,
+    workers=WEBHOOK_WORKERS,
+    give_up_after=WEBHOOK_GIVE_UP_SECONDS,
+    on_give_up=webhook_given_up,
+    synchronous=OUTBOX_SYNCHRONOUS,
+)
+
+@router.post("/webhook")
+async def razorpay_webhook(
+    request: Request,
+    x_razorpay_signature: str = Header(default=""),
+    x_razorpay_event_id: str | None = Header(default=None),
+):
+    """
+    Razorpay webhook. Only verifies and commits the event to the local
+    inbox; registrations and emails are handled by webhook_pipeline so
+    Razorpay gets its 200 right away.
+    """
+    body = await request.body()
+    if not verify_webhook_signature(body, x_razorpay_signature):
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
+
+    event = json.loads(body)
+    if event.get("event") not in WEBHOOK_EVENTS:
+        return {"status": "ignored"}
+    seen_key = f"webhook-event:{x_razorpay_event_id}" if x_razorpay_event_id else None
+    # claimed before queueing, so a redelivery racing in on another worker is dropped
+    if seen_key and not await get_state().aset_if_absent(seen_key, "1", IDEMPOTENCY_TTL_SECONDS):
+        return {"status": "duplicate"}
+
+    try:
+        await webhook_pipeline.submit(event, x_razorpay_event_id)
+    except Exception as e:
+        if seen_key:
+            await get_state().adelete(seen_key)
+        log.error("could not store webhook event", extra={"event": event.get("event"), "error": str(e)})
+        # Not acked, so Razorpay will redeliver later
+        raise HTTPException(status_code=503, detail="Could not store webhook event")
+    return {"status": "queued"}
+
 
 ###
 @router.post("/test-registration")
-def test_registration():
-    store_registration(
+async def test_registration():
+    await store_registration(
         name="Dummy User",
         email="dummy@example.com",
         tier="Business",
@@ -486,7 +1141,7 @@ class TestGroupRequest(BaseModel):
     group_members: List[TestGroupMember]
 
 @router.post("/payments/test-group-registration")
-def test_group_registration(req: TestGroupRequest):
+async def test_group_registration(req: TestGroupRequest):
     FIXED_LOCATION = "T-HUB"
     FIXED_CONFERENCE_DATE = "2025-09-21"
 
@@ -496,18 +1151,11 @@ def test_group_registration(req: TestGroupRequest):
 
     price_per_head = group_discount_price(size)
 
-    for member in req.group_members:
-        send_ack_email(
-            to_email=member.email,
-            name=member.fullName,
-            tier=f"Group-Test ({size})",
-            location=FIXED_LOCATION,
-            conference_date=FIXED_CONFERENCE_DATE,
-            final_amount=str(price_per_head),
-        )
-        store_registration(
+    rows = [
+        registration_row(
             name=member.fullName,
             email=member.email,
+            phone=member.phone,
             tier=f"Group-Test ({size})",
             amount=str(price_per_head),
             location=FIXED_LOCATION,
@@ -515,12 +1163,20 @@ def test_group_registration(req: TestGroupRequest):
             college=member.college or "N/A",
             type_=member.type or "N/A",
         )
+        for member in req.group_members
+    ]
+    results = await store_registrations_bulk(rows)
+
+    await send_ack_emails([
+        row for row, result in zip(rows, results) if result["stored"]
+    ])
 
     return {
         "status": "success",
         "test_mode": True,
         "group_size": size,
         "price_per_head": price_per_head,
+        "results": results,
         "message": f"✅ Test completed, emails sent and registrations stored for {size} members."
     }
 
@@ -536,7 +1192,7 @@ class TestPaidRequest(BaseModel):
     amount: int = 1000  # default paid amount
 
 @router.post("/test-paid-registration")
-def test_paid_registration(body: TestPaidRequest = Body(...)):
+async def test_paid_registration(body: TestPaidRequest = Body(...)):
     FIXED_LOCATION = "T-HUB"
     FIXED_CONFERENCE_DATE = "2025-09-21"
 
@@ -544,7 +1200,7 @@ def test_paid_registration(body: TestPaidRequest = Body(...)):
     final_amount = str(body.amount)
 
     # Store registration in Supabase (simulate post-payment)
-    store_registration(
+    await store_registration(
         name=body.name,
         email=body.email,
         phone=body.phone,
@@ -557,7 +1213,7 @@ def test_paid_registration(body: TestPaidRequest = Body(...)):
     )
 
     # Send acknowledgment email (optional)
-    send_ack_email(
+    await send_ack_email(
         to_email=body.email,
         name=body.name,
         tier=tier,
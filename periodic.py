@@ -0,0 +1,36 @@
+import abc
+import asyncio
+
+
+class PeriodicTask(abc.ABC):
+    """
+    Base for objects that redo one piece of work every `interval` seconds
+    in a background task. The first run happens in the task too, so a slow
+    one doesn't hold up startup. tick() handles its own errors.
+    """
+
+    interval: float
+    _task: asyncio.Task | None = None
+
+    @abc.abstractmethod
+    async def tick(self):
+        ...
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.tick()
+            await asyncio.sleep(self.interval)
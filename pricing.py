@@ -0,0 +1,138 @@
+from bisect import bisect_left
+from datetime import date
+from typing import Callable
+
+
+# --- Rule table -------------------------------------------------------------
+# Everything that decides a price lives here. Edit the table, not the code.
+
+PRICING_RULES = {
+    # Tiers by registration date (IST), each valid up to and including `until`.
+    # The last tier has no end date.
+    "tiers": [
+        {"name": "Early Bird", "until": date(2025, 9, 9), "price": 1000},
+        {"name": "Regular", "until": date(2025, 12, 11), "price": 1000},
+        {"name": "Late/Onsite", "until": None, "price": 1000},
+    ],
+    # Coupon codes (matched after normalize()). `quota` names a limit that
+    # must have room left for the coupon to apply.
+    "coupons": {
+        "FREEIPRISM2025": {"type": "FREE", "percent_off": 100, "quota": "free"},
+        "IPRISM2025": {"type": "DISCOUNT", "percent_off": 50},
+    },
+    # Per-head group price by group size; the largest matching band wins.
+    # Smaller groups pay the tier price.
+    "group_bands": [
+        {"min_size": 5, "price_per_head": 400},    # 60% off
+        {"min_size": 10, "price_per_head": 300},   # 70% off
+    ],
+    # Group pricing only applies from this many members.
+    "group_min_size": 2,
+}
+
+
+def normalize(code: str | None) -> str:
+    return (code or "").strip().upper()
+
+
+class PricingEngine:
+    """
+    PRICING_RULES compiled into lookup structures once at startup:
+    tier end dates into a sorted list for bisect, coupons into a dict,
+    and group bands sorted by size.
+
+    `quotas` maps a coupon's quota name to a zero-argument check that says
+    whether that quota still has room (e.g. the FREE coupon limit).
+    """
+
+    def __init__(self, rules: dict, quotas: dict[str, Callable[[], bool]] | None = None):
+        tiers = rules["tiers"]
+        if not tiers or tiers[-1]["until"] is not None:
+            raise ValueError("last pricing tier must be open-ended")
+        self._tier_ends = [t["until"] for t in tiers[:-1]]
+        self._tiers = [(t["name"], t["price"]) for t in tiers]
+
+        self._coupons = {
+            normalize(code): (rule["type"], rule["percent_off"], rule.get("quota"))
+            for code, rule in rules["coupons"].items()
+        }
+
+        bands = sorted(rules["group_bands"], key=lambda b: b["min_size"], reverse=True)
+        self._bands = [(b["min_size"], b["price_per_head"]) for b in bands]
+        self.group_min_size = rules["group_min_size"]
+        self._quotas = quotas or {}
+
+    def tier(self, d: date) -> tuple[str, int]:
+        return self._tiers[bisect_left(self._tier_ends, d)]
+
+    def coupon_type(self, code: str | None) -> str | None:
+        """"FREE" / "DISCOUNT" for a usable coupon, None if unknown or out of quota."""
+        rule = self._coupons.get(normalize(code))
+        if rule is None:
+            return None
+        ctype, _, quota = rule
+        if quota is not None and not self._quotas[quota]():
+            return None
+        return ctype
+
+    def cache_key(self, code: str | None) -> str | None:
+        """
+        Key under which prices for this coupon can be cached: the
+        normalized code, "" for no or unknown coupon (they all price the
+        same), or None if the result depends on a quota and can't be cached.
+        """
+        rule = self._coupons.get(normalize(code))
+        if rule is None:
+            return ""
+        return None if rule[2] is not None else normalize(code)
+
+    def apply_coupon(self, base: int, coupon: str | None) -> tuple[int, int, str]:
+        """Returns: (discount, final_amount, coupon_type)"""
+        rule = self._coupons.get(normalize(coupon)) if coupon else None
+        if rule is None:
+            return (0, base, "NONE")
+        ctype, percent_off, quota = rule
+        if quota is not None and not self._quotas[quota]():
+            return (0, base, "NONE")
+        discount = base * percent_off // 100
+        return (discount, base - discount, ctype)
+
+    def group_price(self, size: int, base: int) -> int:
+        for min_size, price in self._bands:
+            if size >= min_size:
+                return price
+        return base
+
+    def quote(self, d: date, coupon: str | None = None, group_size: int = 1) -> dict:
+        """
+        Price one checkout the way create_order does: a usable FREE coupon
+        wins, then group pricing, then the coupon on the tier price.
+        """
+        tier, base = self.tier(d)
+        discount, final_amt, ctype = self.apply_coupon(base, coupon)
+
+        if ctype != "FREE" and group_size >= self.group_min_size:
+            per_head = self.group_price(group_size, base)
+            return {
+                "date": d.isoformat(),
+                "tier": f"Group ({group_size})",
+                "group_size": group_size,
+                "base_rupees": base,
+                "discount_rupees": base - per_head,
+                "final_rupees": per_head,
+                "total_rupees": per_head * group_size,
+                "coupon_type": "NONE",
+                "coupon_valid": False,
+            }
+
+        return {
+            "date": d.isoformat(),
+            "tier": tier,
+            "group_size": 1,
+            "base_rupees": base,
+            "discount_rupees": discount,
+            "final_rupees": final_amt,
+            "total_rupees": final_amt,
+            "coupon_type": ctype,
+            "coupon_valid": ctype != "NONE",
+        }
@@ -0,0 +1,163 @@
+import asyncio
+import random
+
+import httpx
+from decouple import config
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from metrics import timed, record_error
+
+
+RAZORPAY_API_BASE = config("RAZORPAY_API_BASE", default="https://api.razorpay.com/v1")
+RAZORPAY_TIMEOUT_SECONDS = float(config("RAZORPAY_TIMEOUT_SECONDS", default="10"))
+# per-call budgets; fetch is retried, so each attempt gets less
+RAZORPAY_CREATE_TIMEOUT_SECONDS = float(config("RAZORPAY_CREATE_TIMEOUT_SECONDS", default="8"))
+RAZORPAY_FETCH_TIMEOUT_SECONDS = float(config("RAZORPAY_FETCH_TIMEOUT_SECONDS", default="3"))
+RAZORPAY_RETRIES = int(config("RAZORPAY_RETRIES", default="2"))
+RAZORPAY_BACKOFF_SECONDS = float(config("RAZORPAY_BACKOFF_SECONDS", default="0.2"))
+RAZORPAY_BREAKER_THRESHOLD = int(config("RAZORPAY_BREAKER_THRESHOLD", default="5"))
+RAZORPAY_BREAKER_RESET_SECONDS = float(config("RAZORPAY_BREAKER_RESET_SECONDS", default="30"))
+
+
+class RazorpayError(Exception):
+    def __init__(self, status_code: int, description: str):
+        self.status_code = status_code
+        self.description = description
+        super().__init__(description)
+
+
+class RazorpayUnavailable(RazorpayError):
+    """Razorpay timed out, couldn't be reached, kept failing, or the circuit is open."""
+
+    def __init__(self, description: str, retry_after: float | None = None):
+        self.retry_after = retry_after
+        super().__init__(503, description)
+
+
+class _Orders:
+    def __init__(self, owner: "AsyncRazorpayClient"):
+        self._owner = owner
+
+    @timed("razorpay.order.create")
+    async def create(self, data: dict) -> dict:
+        # Not idempotent: only retried if the request never reached Razorpay
+        return await self._owner.request(
+            "POST", "/orders", json=data, timeout=RAZORPAY_CREATE_TIMEOUT_SECONDS, idempotent=False,
+        )
+
+    @timed("razorpay.order.fetch")
+    async def fetch(self, order_id: str) -> dict:
+        return await self._owner.request("GET", f"/orders/{order_id}", timeout=RAZORPAY_FETCH_TIMEOUT_SECONDS)
+
+    @timed("razorpay.order.all")
+    async def all(self, params: dict) -> dict:
+        """One page of orders: from / to (unix seconds), count (max 100), skip."""
+        return await self._owner.request("GET", "/orders", params=params, timeout=RAZORPAY_FETCH_TIMEOUT_SECONDS)
+
+
+class _Payments:
+    def __init__(self, owner: "AsyncRazorpayClient"):
+        self._owner = owner
+
+    @timed("razorpay.payment.all")
+    async def all(self, params: dict) -> dict:
+        """One page of payments, with the same paging parameters as orders."""
+        return await self._owner.request("GET", "/payments", params=params, timeout=RAZORPAY_FETCH_TIMEOUT_SECONDS)
+
+
+class AsyncRazorpayClient:
+    """
+    Minimal async stand-in for razorpay.Client, covering only the calls this
+    service makes. Mirrors the SDK's shape (client.order.create / .fetch /
+    .all, client.payment.all) so call sites read the same, but goes over a
+    shared httpx.AsyncClient so a slow Razorpay doesn't pin a worker thread.
+
+    Every call has its own timeout. Idempotent calls are retried with
+    jittered exponential backoff on timeouts, connection errors, 429 and
+    5xx. All calls go through a circuit breaker: after repeated upstream
+    failures they fail at once with RazorpayUnavailable instead of each
+    waiting out its timeout.
+    """
+
+    def __init__(
+        self,
+        auth: tuple[str, str],
+        base_url: str = RAZORPAY_API_BASE,
+        timeout: float = RAZORPAY_TIMEOUT_SECONDS,
+        transport: httpx.AsyncBaseTransport | None = None,
+        retries: int = RAZORPAY_RETRIES,
+        backoff: float = RAZORPAY_BACKOFF_SECONDS,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            auth=auth,
+            timeout=timeout,
+            transport=transport,
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker(
+            "razorpay",
+            failure_threshold=RAZORPAY_BREAKER_THRESHOLD,
+            reset_timeout=RAZORPAY_BREAKER_RESET_SECONDS,
+        )
+        self.order = _Orders(self)
+        self.payment = _Payments(self)
+
+    async def request(self, method: str, path: str, timeout: float | None = None, idempotent: bool | None = None, **kwargs) -> dict:
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD")
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        attempts = 1 + self.retries
+        for attempt in range(1, attempts + 1):
+            try:
+                trial = self.breaker.before_call()
+            except CircuitOpenError as e:
+                raise RazorpayUnavailable(str(e), retry_after=e.retry_after) from e
+            try:
+                resp = await self._http.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                self.breaker.record_failure(e)
+                # a connect failure means nothing was sent, so even a POST is safe to repeat
+                retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if not retryable or attempt == attempts:
+                    record_error("razorpay.unavailable")
+                    raise RazorpayUnavailable(f"Razorpay unreachable: {type(e).__name__}") from e
+            except BaseException:
+                # cancelled (client gone, wait_for) or not Razorpay's fault;
+                # a trial left marked as running would keep the circuit half open for good
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            else:
+                if resp.status_code >= 500 or resp.status_code == 429:
+                    error = RazorpayError(resp.status_code, self._description(resp))
+                    self.breaker.record_failure(error)
+                    if not idempotent or attempt == attempts:
+                        record_error("razorpay.unavailable")
+                        raise RazorpayUnavailable(f"Razorpay error {resp.status_code}: {error.description}")
+                else:
+                    # 4xx is our mistake, not an outage
+                    self.breaker.record_success()
+                    if resp.status_code >= 400:
+                        raise RazorpayError(resp.status_code, self._description(resp))
+                    return resp.json()
+            # full jitter: anywhere between 0 and the exponential cap
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def _description(resp: httpx.Response) -> str:
+        try:
+            return resp.json()["error"]["description"]
+        except Exception:
+            return resp.text or resp.reason_phrase
+
+    async def ping(self):
+        """Open (and pool) a connection to the API; the response itself is ignored."""
+        await self._http.head("/")
+
+    async def aclose(self):
+        await self._http.aclose()
@@ -0,0 +1,198 @@
+import logging
+import threading
+from typing import AsyncIterator, Callable
+
+from blocking import run_blocking
+from periodic import PeriodicTask
+from shared_state import StateBackend
+
+log = logging.getLogger(__name__)
+
+
+def normalize_email(email: str | None) -> str:
+    return (email or "").strip().lower()
+
+
+def normalize_phone(phone: int | str | None) -> str:
+    """Digits only, last 10, so "+91 90000 00000" and 9000000000 match."""
+    digits = "".join(ch for ch in str(phone or "") if ch.isdigit())
+    return digits[-10:]
+
+
+class RegistrationIndex(PeriodicTask):
+    """
+    In-memory set of emails and phones that already have a registration.
+
+    Loaded from Supabase in the background at startup, updated on every store_registration,
+    and rebuilt on a timer so registrations made by other workers show up.
+    Lookups are plain set membership, so checkout can refuse a duplicate
+    without a database round trip.
+
+    Until the first successful load the index doesn't know anything and
+    lets everyone through; a Supabase outage at boot must not block
+    checkout.
+
+    With a shared `state` backend, claims and adds are also written there
+    (kept for two sync intervals, by which time every worker has reloaded
+    them from Supabase), so two workers can't both take the same email or
+    phone in between syncs. Those calls can block (a busy SQLite file, a
+    slow Redis), so they run on the blocking pool and the methods that
+    make them are async.
+    """
+
+    def __init__(self, loader: Callable[[], AsyncIterator[list[tuple]]], interval: float = 300.0, state: StateBackend | None = None):
+        self.interval = interval
+        self._state = state if state is not None and state.shared else None
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._emails: set[str] = set()
+        self._phones: set[str] = set()
+        # entries added while a sync is running, so the swap doesn't drop them
+        self._recent: list[tuple[str, str]] | None = None
+        self._loaded = False
+
+    def ready(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._emails)
+
+    async def conflict(self, email: str | None = None, phone: int | str | None = None) -> str | None:
+        """Which of email / phone is already registered ("email", "phone"), or None."""
+        email, phone = normalize_email(email), normalize_phone(phone)
+        with self._lock:
+            conflict = self._conflict(email, phone)
+        if conflict is None and self._state is not None:
+            try:
+                conflict = await run_blocking(self._shared_conflict, email, phone)
+            except Exception as e:
+                log.warning("shared registration lookup failed", extra={"error": str(e)})
+        return conflict
+
+    def _conflict(self, email: str, phone: str) -> str | None:
+        if email and email in self._emails:
+            return "email"
+        if phone and phone in self._phones:
+            return "phone"
+        return None
+
+    def _shared_conflict(self, email: str, phone: str) -> str | None:
+        if email and self._state.get(f"contact:email:{email}") is not None:
+            return "email"
+        if phone and self._state.get(f"contact:phone:{phone}") is not None:
+            return "phone"
+        return None
+
+    async def claim(self, email: str | None, phone: int | str | None) -> str | None:
+        """Atomically check and add. Returns the conflict, or None if the claim was taken."""
+        email, phone = normalize_email(email), normalize_phone(phone)
+        with self._lock:
+            conflict = self._conflict(email, phone)
+            if conflict is not None:
+                return conflict
+            self._add(email, phone)
+        if self._state is not None:
+            conflict = await run_blocking(self._shared_claim, email, phone)
+            if conflict is not None:
+                with self._lock:
+                    self._remove(email, phone)
+        return conflict
+
+    def _shared_claim(self, email: str, phone: str) -> str | None:
+        ttl = self.interval * 2
+        try:
+            if email and not self._state.set_if_absent(f"contact:email:{email}", "1", ttl):
+                return "email"
+            if phone and not self._state.set_if_absent(f"contact:phone:{phone}", "1", ttl):
+                if email:
+                    self._state.delete(f"contact:email:{email}")
+                return "phone"
+        except Exception as e:
+            log.warning("shared registration claim failed", extra={"error": str(e)})
+        return None
+
+    async def add(self, email: str | None, phone: int | str | None):
+        await self.add_many([(email, phone)])
+
+    async def add_many(self, contacts: list[tuple[str | None, int | str | None]]):
+        """add() for a whole batch, with one trip to the shared backend."""
+        contacts = [(normalize_email(email), normalize_phone(phone)) for email, phone in contacts]
+        with self._lock:
+            for email, phone in contacts:
+                self._add(email, phone)
+        if self._state is not None:
+            try:
+                await run_blocking(self._shared_add, contacts)
+            except Exception as e:
+                log.warning("shared registration add failed", extra={"error": str(e)})
+
+    def _shared_add(self, contacts: list[tuple[str, str]]):
+        for email, phone in contacts:
+            for kind, value in (("email", email), ("phone", phone)):
+                if value:
+                    self._state.set(f"contact:{kind}:{value}", "1", self.interval * 2)
+
+    def _add(self, email: str, phone: str):
+        if email:
+            self._emails.add(email)
+        if phone:
+            self._phones.add(phone)
+        if self._recent is not None:
+            self._recent.append((email, phone))
+
+    async def discard(self, email: str | None, phone: int | str | None):
+        """Undo a claim whose registration was not stored."""
+        email, phone = normalize_email(email), normalize_phone(phone)
+        with self._lock:
+            self._remove(email, phone)
+        if self._state is not None:
+            try:
+                await run_blocking(self._shared_discard, email, phone)
+            except Exception as e:
+                log.warning("shared registration discard failed", extra={"error": str(e)})
+
+    def _shared_discard(self, email: str, phone: str):
+        for kind, value in (("email", email), ("phone", phone)):
+            if value:
+                self._state.delete(f"contact:{kind}:{value}")
+
+    def _remove(self, email: str, phone: str):
+        self._emails.discard(email)
+        self._phones.discard(phone)
+        if self._recent is not None and (email, phone) in self._recent:
+            self._recent.remove((email, phone))
+
+    async def sync(self) -> bool:
+        """Rebuild from the loader and swap it in. Returns False if loading failed."""
+        emails: set[str] = set()
+        phones: set[str] = set()
+        with self._lock:
+            self._recent = []
+        try:
+            async for page in self._loader():
+                for email, phone in page:
+                    if email := normalize_email(email):
+                        emails.add(email)
+                    if phone := normalize_phone(phone):
+                        phones.add(phone)
+        except Exception as e:
+            with self._lock:
+                self._recent = None
+            log.warning("registration index sync failed", extra={"error": str(e)})
+            return False
+        with self._lock:
+            for email, phone in self._recent:
+                if email:
+                    emails.add(email)
+                if phone:
+                    phones.add(phone)
+            self._emails, self._phones = emails, phones
+            self._recent = None
+            self._loaded = True
+        log.info("registration index synced", extra={"email_count": len(emails), "phone_count": len(phones)})
+        return True
+
+    # --- background resync ---
+
+    async def tick(self):
+        await self.sync()
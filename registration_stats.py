@@ -0,0 +1,94 @@
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Callable
+
+from periodic import PeriodicTask
+
+log = logging.getLogger(__name__)
+
+
+def amount_paise(amount) -> int:
+    """amount_paid is stored as rupees ("1999.00", 500, ...); count it in paise so sums stay exact."""
+    try:
+        return int(Decimal(str(amount)) * 100)
+    except (InvalidOperation, ValueError):
+        return 0
+
+
+class RegistrationStats(PeriodicTask):
+    """
+    Running totals of registrations: count, revenue, and counts by tier,
+    type and college.
+
+    add() is called for every stored registration, so reading the totals
+    is a dict copy however big the table is. reconcile() rebuilds them from
+    the loader (outbox backlog, then Supabase) on a timer, which picks up
+    registrations made by other workers and corrects any drift. Rows that
+    are in flight while a reconcile runs can be counted once too often or
+    too few until the next one.
+    """
+
+    def __init__(self, loader: Callable[[], AsyncIterator[list[dict]]], interval: float = 300.0):
+        self.interval = interval
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._counts = self._empty()
+        self._reconciled_at: datetime | None = None
+
+    @staticmethod
+    def _empty() -> dict:
+        return {"total": 0, "revenue_paise": 0, "tier": Counter(), "type": Counter(), "college": Counter()}
+
+    @staticmethod
+    def _count(counts: dict, row: dict):
+        counts["total"] += 1
+        counts["revenue_paise"] += amount_paise(row.get("amount_paid"))
+        for field in ("tier", "type", "college"):
+            counts[field][row.get(field) or "unknown"] += 1
+
+    def add(self, row: dict):
+        with self._lock:
+            self._count(self._counts, row)
+
+    def add_many(self, rows: list[dict]):
+        with self._lock:
+            for row in rows:
+                self._count(self._counts, row)
+
+    def snapshot(self, top_colleges: int | None = None) -> dict:
+        with self._lock:
+            counts = self._counts
+            return {
+                "total": counts["total"],
+                "revenue_rupees": counts["revenue_paise"] / 100,
+                "by_tier": dict(counts["tier"].most_common()),
+                "by_type": dict(counts["type"].most_common()),
+                "by_college": dict(counts["college"].most_common(top_colleges)),
+                "college_count": len(counts["college"]),
+                "reconciled_at": self._reconciled_at.isoformat() if self._reconciled_at else None,
+            }
+
+    async def reconcile(self) -> bool:
+        """Recount from the loader and swap the result in. Returns False if loading failed."""
+        counts = self._empty()
+        try:
+            async for page in self._loader():
+                for row in page:
+                    self._count(counts, row)
+        except Exception as e:
+            log.warning("registration stats reconcile failed", extra={"error": str(e)})
+            return False
+        with self._lock:
+            drift = counts["total"] - self._counts["total"]
+            self._counts = counts
+            self._reconciled_at = datetime.now(timezone.utc)
+        log.info("registration stats reconciled", extra={"rows": counts["total"], "drift": drift})
+        return True
+
+    # --- background reconciliation ---
+
+    async def tick(self):
+        await self.reconcile()
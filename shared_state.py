@@ -0,0 +1,528 @@
+import abc
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from decouple import config
+
+from blocking import run_blocking
+
+
+# memory://                        one process (the default)
+# sqlite:////var/lib/reg/state.db  every worker on one host
+# redis://host:6379/0              every worker on every host (Redis, Valkey, KeyDB, ...)
+STATE_URL = config("STATE_URL", default="memory://")
+STATE_KEY_PREFIX = config("STATE_KEY_PREFIX", default="reg:")
+STATE_TIMEOUT_SECONDS = float(config("STATE_TIMEOUT_SECONDS", default="2"))
+
+
+class StateBackend(abc.ABC):
+    """
+    Small key/value store for state that every worker has to agree on:
+    atomic counters, keys that expire, first-writer-wins claims and locks.
+
+    Each operation has a synchronous form (for scripts and threads) and an
+    async one, prefixed with `a`, for the event loop. A SQLite call can
+    wait on another process's write lock and a Redis call on the network,
+    so for those backends the async forms run on the blocking pool; the
+    in-process backend is only a dict and is called directly.
+
+    `shared` is False only for the in-process backend, whose state other
+    workers can't see; callers use it to skip work that only matters when
+    several workers share a backend.
+    """
+
+    shared = True
+    blocking = True
+
+    @abc.abstractmethod
+    def get(self, key: str) -> str | None:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: str, ttl: float | None = None):
+        ...
+
+    @abc.abstractmethod
+    def set_if_absent(self, key: str, value: str, ttl: float | None = None) -> bool:
+        """Set the key only if it doesn't exist (or has expired). Returns True if it was set."""
+
+    @abc.abstractmethod
+    def delete(self, key: str, value: str | None = None) -> bool:
+        """Delete the key; with `value`, only if it still holds that value."""
+
+    @abc.abstractmethod
+    def incr(self, key: str, amount: int = 1, limit: int | None = None) -> int | None:
+        """
+        Add `amount` to an integer key (missing counts as 0) and return the
+        new value. If the result would go over `limit`, nothing changes and
+        None is returned.
+        """
+
+    @abc.abstractmethod
+    def compare_and_set(self, key: str, expected: str | None, value: str) -> bool:
+        """
+        Set the key (with no expiry) only if it still holds `expected`
+        (None: only if it doesn't exist). Returns True if it was set.
+        """
+
+    @abc.abstractmethod
+    def count(self, prefix: str) -> int:
+        """How many live keys start with `prefix`. Meant for small key families."""
+
+    @abc.abstractmethod
+    def take_token(self, key: str, rate: float, burst: float) -> float:
+        """
+        Token bucket: take one token from the bucket at `key`, which refills
+        at `rate` per second up to `burst`. Returns 0 if a token was taken,
+        otherwise the seconds until one will be available.
+        """
+
+    def close(self):
+        pass
+
+    # --- async forms ---
+
+    async def _call(self, fn, *args):
+        if self.blocking:
+            return await run_blocking(fn, *args)
+        return fn(*args)
+
+    async def aget(self, key: str) -> str | None:
+        return await self._call(self.get, key)
+
+    async def aset(self, key: str, value: str, ttl: float | None = None):
+        await self._call(self.set, key, value, ttl)
+
+    async def aset_if_absent(self, key: str, value: str, ttl: float | None = None) -> bool:
+        return await self._call(self.set_if_absent, key, value, ttl)
+
+    async def adelete(self, key: str, value: str | None = None) -> bool:
+        return await self._call(self.delete, key, value)
+
+    async def aincr(self, key: str, amount: int = 1, limit: int | None = None) -> int | None:
+        return await self._call(self.incr, key, amount, limit)
+
+    async def acompare_and_set(self, key: str, expected: str | None, value: str) -> bool:
+        return await self._call(self.compare_and_set, key, expected, value)
+
+    async def acount(self, prefix: str) -> int:
+        return await self._call(self.count, prefix)
+
+    async def atake_token(self, key: str, rate: float, burst: float) -> float:
+        return await self._call(self.take_token, key, rate, burst)
+
+    async def atry_lock(self, name: str, ttl: float) -> str | None:
+        return await self._call(self.try_lock, name, ttl)
+
+    async def aunlock(self, name: str, token: str):
+        await self._call(self.unlock, name, token)
+
+    # --- locks, built on set_if_absent ---
+
+    def try_lock(self, name: str, ttl: float) -> str | None:
+        """Take the lock if it is free. Returns a token for unlock(), or None."""
+        token = uuid.uuid4().hex
+        return token if self.set_if_absent(f"lock:{name}", token, ttl) else None
+
+    def unlock(self, name: str, token: str):
+        self.delete(f"lock:{name}", token)
+
+    @contextmanager
+    def lock(self, name: str, ttl: float = 10.0, wait: float = 10.0):
+        """
+        Blocking lock. `ttl` bounds how long a crashed holder can keep it;
+        TimeoutError is raised if it can't be taken within `wait` seconds.
+        """
+        deadline = time.monotonic() + wait
+        delay = 0.001
+        while (token := self.try_lock(name, ttl)) is None:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"lock {name!r} is busy")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        try:
+            yield
+        finally:
+            self.unlock(name, token)
+
+
+class MemoryBackend(StateBackend):
+    """Plain dict behind a lock. Only correct with a single worker process."""
+
+    shared = False
+    blocking = False
+
+    def __init__(self, prefix: str = "", sweep_every: int = 10_000):
+        self.prefix = prefix
+        self.sweep_every = sweep_every
+        self._data: dict[str, tuple[object, float | None]] = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _get(self, key: str, now: float):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= now:
+            del self._data[key]
+            return None
+        return value
+
+    def _put(self, key: str, value, ttl: float | None, now: float):
+        self._data[key] = (value, now + ttl if ttl else None)
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            for k in [k for k, (_, exp) in self._data.items() if exp is not None and exp <= now]:
+                del self._data[k]
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            value = self._get(self.prefix + key, time.monotonic())
+            return None if value is None else str(value)
+
+    def set(self, key: str, value: str, ttl: float | None = None):
+        with self._lock:
+            self._put(self.prefix + key, value, ttl, time.monotonic())
+
+    def set_if_absent(self, key: str, value: str, ttl: float | None = None) -> bool:
+        key, now = self.prefix + key, time.monotonic()
+        with self._lock:
+            if self._get(key, now) is not None:
+                return False
+            self._put(key, value, ttl, now)
+            return True
+
+    def delete(self, key: str, value: str | None = None) -> bool:
+        key = self.prefix + key
+        with self._lock:
+            current = self._get(key, time.monotonic())
+            if current is None or (value is not None and current != value):
+                return False
+            del self._data[key]
+            return True
+
+    def incr(self, key: str, amount: int = 1, limit: int | None = None) -> int | None:
+        key, now = self.prefix + key, time.monotonic()
+        with self._lock:
+            new = int(self._get(key, now) or 0) + amount
+            item = self._data.get(key)
+            if limit is not None and new > limit:
+                return None
+            self._data[key] = (str(new), item[1] if item else None)
+            return new
+
+    def compare_and_set(self, key: str, expected: str | None, value: str) -> bool:
+        key, now = self.prefix + key, time.monotonic()
+        with self._lock:
+            current = self._get(key, now)
+            if (None if current is None else str(current)) != expected:
+                return False
+            self._put(key, value, None, now)
+            return True
+
+    def count(self, prefix: str) -> int:
+        prefix, now = self.prefix + prefix, time.monotonic()
+        with self._lock:
+            return sum(
+                1 for k, (_, exp) in self._data.items()
+                if k.startswith(prefix) and (exp is None or exp > now)
+            )
+
+    def take_token(self, key: str, rate: float, burst: float) -> float:
+        key, now = self.prefix + key, time.monotonic()
+        with self._lock:
+            tokens, last = self._get(key, now) or (burst, now)
+            tokens, wait = _take(tokens, last, now, rate, burst)
+            self._put(key, (tokens, now), burst / rate + 1, now)
+            return wait
+
+
+def _take(tokens: float, last: float, now: float, rate: float, burst: float) -> tuple[float, float]:
+    tokens = min(burst, tokens + max(now - last, 0) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteBackend(StateBackend):
+    """
+    One SQLite file (WAL mode) shared by every worker on the host.
+
+    Read-modify-write calls run inside BEGIN IMMEDIATE, which takes the
+    database write lock up front, so two processes can never interleave
+    between the read and the write. Expiry uses wall-clock time, which all
+    processes agree on; expired rows are ignored on read and swept out
+    every `sweep_every` writes.
+    """
+
+    def __init__(self, path: str, prefix: str = "", timeout: float = 2.0, sweep_every: int = 10_000):
+        self.path = path
+        self.prefix = prefix
+        self.timeout = timeout
+        self.sweep_every = sweep_every
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # a lost write here is rebuilt by reconciliation; don't pay for an fsync per call
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SQLITE_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _write(self):
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                self._writes += 1
+                if self._writes % self.sweep_every == 0:
+                    db.execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _read(db: sqlite3.Connection, key: str) -> str | None:
+        row = db.execute(
+            "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _put(db: sqlite3.Connection, key: str, value: str, ttl: float | None):
+        db.execute(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            return self._read(self._db(), self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: float | None = None):
+        with self._write() as db:
+            self._put(db, self.prefix + key, value, ttl)
+
+    def set_if_absent(self, key: str, value: str, ttl: float | None = None) -> bool:
+        key = self.prefix + key
+        with self._write() as db:
+            if self._read(db, key) is not None:
+                return False
+            self._put(db, key, value, ttl)
+            return True
+
+    def delete(self, key: str, value: str | None = None) -> bool:
+        key = self.prefix + key
+        with self._write() as db:
+            # an expired row doesn't count as deleted
+            current = self._read(db, key)
+            if current is None or (value is not None and current != value):
+                return False
+            db.execute("DELETE FROM shared_state WHERE key = ?", (key,))
+            return True
+
+    def incr(self, key: str, amount: int = 1, limit: int | None = None) -> int | None:
+        key = self.prefix + key
+        with self._write() as db:
+            row = db.execute(
+                "SELECT value, expires_at FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+            new = int(row[0] if row else 0) + amount
+            if limit is not None and new > limit:
+                return None
+            db.execute(
+                "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, str(new), row[1] if row else None),
+            )
+            return new
+
+    def compare_and_set(self, key: str, expected: str | None, value: str) -> bool:
+        key = self.prefix + key
+        with self._write() as db:
+            if self._read(db, key) != expected:
+                return False
+            self._put(db, key, value, None)
+            return True
+
+    def count(self, prefix: str) -> int:
+        prefix = self.prefix + prefix
+        # a primary-key range: every string that starts with prefix sorts in [prefix, upper)
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self._lock:
+            return self._db().execute(
+                "SELECT COUNT(*) FROM shared_state WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+                (prefix, upper, time.time()),
+            ).fetchone()[0]
+
+    def take_token(self, key: str, rate: float, burst: float) -> float:
+        key = self.prefix + key
+        with self._write() as db:
+            now = time.time()
+            current = self._read(db, key)
+            tokens, last = json.loads(current) if current else (burst, now)
+            tokens, wait = _take(tokens, last, now, rate, burst)
+            self._put(db, key, json.dumps([tokens, now]), burst / rate + 1)
+            return wait
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Each script runs atomically on the server. Bucket timestamps come from the
+# server clock (TIME) so app hosts with skewed clocks still agree.
+_INCR = """
+local v = tonumber(redis.call('GET', KEYS[1]) or '0') + tonumber(ARGV[1])
+if ARGV[2] ~= '' and v > tonumber(ARGV[2]) then return false end
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl > 0 then redis.call('SET', KEYS[1], v, 'PX', ttl) else redis.call('SET', KEYS[1], v) end
+return v
+"""
+_COMPARE_AND_SET = """
+local v = redis.call('GET', KEYS[1])
+if (ARGV[1] == '1' and v ~= false) or (ARGV[1] == '0' and v ~= ARGV[2]) then return 0 end
+redis.call('SET', KEYS[1], ARGV[3])
+return 1
+"""
+_DELETE_IF = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+_TAKE_TOKEN = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+local tokens = tonumber(state[1]) or burst
+local last = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - last, 0) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'last', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst / rate + 1) * 1000))
+return tostring(wait)
+"""
+
+
+class RedisBackend(StateBackend):
+    """
+    Any server that speaks the Redis protocol and runs Lua scripts (Redis,
+    Valkey, KeyDB, Dragonfly). Shared across hosts.
+
+    Needs the `redis` package, which is only imported when this backend is
+    configured.
+    """
+
+    def __init__(self, url: str, prefix: str = "", timeout: float = 2.0):
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(
+            url, decode_responses=True, socket_timeout=timeout, socket_connect_timeout=timeout,
+        )
+        self._incr = self._redis.register_script(_INCR)
+        self._compare_and_set = self._redis.register_script(_COMPARE_AND_SET)
+        self._delete_if = self._redis.register_script(_DELETE_IF)
+        self._take_token = self._redis.register_script(_TAKE_TOKEN)
+
+    @staticmethod
+    def _px(ttl: float | None) -> int | None:
+        return max(int(ttl * 1000), 1) if ttl else None
+
+    def get(self, key: str) -> str | None:
+        return self._redis.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: float | None = None):
+        self._redis.set(self.prefix + key, value, px=self._px(ttl))
+
+    def set_if_absent(self, key: str, value: str, ttl: float | None = None) -> bool:
+        return bool(self._redis.set(self.prefix + key, value, px=self._px(ttl), nx=True))
+
+    def delete(self, key: str, value: str | None = None) -> bool:
+        if value is None:
+            return bool(self._redis.delete(self.prefix + key))
+        return bool(self._delete_if(keys=[self.prefix + key], args=[value]))
+
+    def incr(self, key: str, amount: int = 1, limit: int | None = None) -> int | None:
+        result = self._incr(keys=[self.prefix + key], args=[amount, "" if limit is None else limit])
+        return None if result is None else int(result)
+
+    def compare_and_set(self, key: str, expected: str | None, value: str) -> bool:
+        absent = "1" if expected is None else "0"
+        return bool(self._compare_and_set(keys=[self.prefix + key], args=[absent, expected or "", value]))
+
+    def count(self, prefix: str) -> int:
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", self.prefix + prefix) + "*"
+        return sum(1 for _ in self._redis.scan_iter(match=pattern, count=1000))
+
+    def take_token(self, key: str, rate: float, burst: float) -> float:
+        return float(self._take_token(keys=[self.prefix + key], args=[rate, burst]))
+
+    def close(self):
+        self._redis.close()
+
+
+def open_backend(url: str, prefix: str = "", timeout: float = 2.0) -> StateBackend:
+    if url.startswith("memory:"):
+        return MemoryBackend(prefix)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url.removeprefix("sqlite:///"), prefix, timeout)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url, prefix, timeout)
+    raise ValueError(f"Unsupported STATE_URL: {url!r}")
+
+
+_lock = threading.Lock()
+_backend: StateBackend | None = None
+
+
+def get_state() -> StateBackend:
+    """The configured backend (STATE_URL), opened on first use."""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = open_backend(STATE_URL, STATE_KEY_PREFIX, STATE_TIMEOUT_SECONDS)
+    return _backend
+
+
+def configure(backend: StateBackend):
+    """Install a backend directly (benchmarks)."""
+    global _backend
+    with _lock:
+        _backend = backend
+
+
+def close():
+    global _backend
+    with _lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
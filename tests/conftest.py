@@ -0,0 +1,60 @@
+import os
+import sys
+
+import httpx
+import pytest
+
+# the app is a set of top-level modules, run from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# the local stand-ins for Razorpay, Supabase and SMTP live with the benchmarks
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+RAZORPAY_SECRET = "test-key-secret"
+WEBHOOK_SECRET = "test-webhook-secret"
+
+
+async def no_sink(rows):
+    raise AssertionError("nothing should reach Supabase here")
+
+
+@pytest.fixture
+def stores(monkeypatch, tmp_path):
+    """Fresh staging and outbox files for payments, instead of the ones in the working directory."""
+    import payments
+    from group_upload import GroupStaging
+    from outbox import RegistrationOutbox
+
+    staging = GroupStaging(str(tmp_path / "staging.sqlite3"))
+    outbox = RegistrationOutbox(str(tmp_path / "outbox.sqlite3"), sink=no_sink)
+    monkeypatch.setattr(payments, "group_staging", staging)
+    monkeypatch.setattr(payments, "registration_outbox", outbox)
+    yield staging, outbox
+    staging.close()
+    outbox.close()
+
+
+@pytest.fixture
+def razorpay(monkeypatch):
+    """The app's Razorpay client pointed at the fake from benchmarks/fakes.py; returns the fake app."""
+    import clients
+    import payments
+    from fakes import fake_razorpay_app
+    from idempotency import IdempotencyStore
+    from razorpay_async import AsyncRazorpayClient
+    from ttl_cache import TTLCache
+
+    monkeypatch.setenv("RAZORPAY_KEY_ID", "rzp_test")
+    monkeypatch.setenv("RAZORPAY_SECRET", RAZORPAY_SECRET)
+    monkeypatch.setenv("RAZORPAY_WEBHOOK_SECRET", WEBHOOK_SECRET)
+    app = fake_razorpay_app()
+    client = AsyncRazorpayClient(
+        auth=("rzp_test", RAZORPAY_SECRET),
+        base_url="http://razorpay.test/v1",
+        transport=httpx.ASGITransport(app=app),
+    )
+    monkeypatch.setattr(clients, "_razorpay", client)
+    # every fake starts its order ids at 1; don't replay another test's orders
+    monkeypatch.setattr(payments, "order_notes", TTLCache(ttl=60))
+    monkeypatch.setattr(payments, "idempotency", IdempotencyStore(ttl=60))
+    return app
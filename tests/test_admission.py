@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from admission import AdmissionMiddleware, TokenBucketLimiter, parse_rate_limits
+from shared_state import MemoryBackend
+
+PATH = "/payments/validate-coupon"
+
+
+def slow_app(latency: float, slots: int) -> FastAPI:
+    """A route whose only work is a query on a `slots`-wide database."""
+    app = FastAPI()
+    db = asyncio.Semaphore(slots)
+
+    @app.post(PATH)
+    async def validate_coupon():
+        async with db:
+            await asyncio.sleep(latency)
+        return {"valid": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def guarded(app, limits=None, max_inflight=20):
+    return AdmissionMiddleware(
+        app,
+        limits={} if limits is None else limits,
+        max_inflight=max_inflight,
+        max_inflight_limited=max_inflight,
+        state=MemoryBackend(),
+    )
+
+
+def p99(samples: list[float]) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+async def open_loop(app, rps: float, duration: float, clients: int, path: str = PATH) -> dict[int, list[float]]:
+    """A new request every 1/rps seconds whether or not earlier ones finished; latencies by status."""
+    by_status: dict[int, list[float]] = {}
+    sessions = [
+        httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(f"10.0.0.{i}", 1234)), base_url="http://test")
+        for i in range(clients)
+    ]
+
+    async def one(i: int):
+        start = time.perf_counter()
+        resp = await sessions[i % clients].post(path)
+        by_status.setdefault(resp.status_code, []).append(time.perf_counter() - start)
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(rps * duration)):
+        delay = start + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    for s in sessions:
+        await s.aclose()
+    return by_status
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("/a=1/5, /b=2,") == {"/a": (1.0, 5.0), "/b": (2.0, 2.0)}
+    assert parse_rate_limits("") == {}
+
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+    assert [limiter.acquire("ip") for _ in range(3)] == [0, 0, 0]
+    wait = limiter.acquire("ip")
+    assert 0 < wait <= 0.5
+    assert limiter.acquire("other") == 0
+
+
+def test_rate_limited_client_gets_fast_429():
+    app = guarded(slow_app(latency=0.05, slots=10), limits={PATH: (1, 5)})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            async def one():
+                start = time.perf_counter()
+                resp = await client.post(PATH)
+                return resp, time.perf_counter() - start
+            return await asyncio.gather(*(one() for _ in range(20)))
+
+    results = asyncio.run(run())
+    limited = [(r, t) for r, t in results if r.status_code == 429]
+    assert sum(r.status_code == 200 for r, _ in results) == 5
+    assert len(limited) == 15
+    assert all(int(r.headers["retry-after"]) >= 1 for r, _ in limited)
+    # turned away without touching the route
+    assert max(t for _, t in limited) < 0.05
+
+
+def test_latency_stays_bounded_under_overload():
+    # capacity is 5 / 0.02 = 250 rps; offer four times that
+    latency, slots = 0.02, 5
+    app = guarded(slow_app(latency, slots), max_inflight=10)
+    by_status = asyncio.run(open_loop(app, rps=1000, duration=1.0, clients=50))
+
+    assert by_status.get(503), "overload should be shed"
+    assert set(by_status) <= {200, 503}
+    # at most max_inflight / slots rounds of queueing, whatever the offered load
+    assert p99(by_status[200]) < 10 * latency
+    assert p99(by_status[503]) < 0.05
+
+
+def test_exempt_paths_are_never_limited():
+    app = guarded(slow_app(0, 1), limits={"/health": (0.001, 1)}, max_inflight=0)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return [(await client.get("/health")).status_code for _ in range(3)]
+
+    assert asyncio.run(run()) == [200, 200, 200]
+
+
+class SlowSharedState:
+    """A shared backend whose token bucket takes `delay` seconds to answer."""
+
+    shared = True
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def atake_token(self, key: str, rate: float, burst: float) -> float:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return 0.0
+
+
+def test_inflight_cap_is_checked_before_a_slow_limiter():
+    state = SlowSharedState(delay=0.2)
+    app = AdmissionMiddleware(
+        slow_app(0, 10), limits={PATH: (100, 100)}, max_inflight=20, max_inflight_limited=3, state=state,
+    )
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            async def one():
+                start = time.perf_counter()
+                resp = await client.post(PATH)
+                return resp.status_code, time.perf_counter() - start
+            return await asyncio.gather(*(one() for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert sorted(status for status, _ in results) == [200] * 3 + [503] * 7
+    # shed without waiting on the backend
+    assert state.calls == 3
+    assert max(t for status, t in results if status == 503) < 0.1
+    assert app.inflight == app.inflight_limited == 0
@@ -0,0 +1,41 @@
+import json
+import logging
+
+from app_logging import JsonFormatter
+
+
+def record(msg: str, exc_info=None, **extra) -> logging.LogRecord:
+    rec = logging.makeLogRecord({"name": "t", "levelname": "ERROR", "msg": msg, "exc_info": exc_info})
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_pii_fields_and_message_are_masked():
+    out = json.loads(JsonFormatter().format(record("sent to jane@example.com", email="jane@example.com", phone="9876543210")))
+    assert out["msg"] == "sent to j***@example.com"
+    assert out["email"] == "j***@example.com"
+    assert out["phone"] == "******3210"
+
+
+def test_free_text_fields_are_masked():
+    error = 'duplicate key value violates unique constraint: Key (email)=(jane@example.com), phone 9876543210'
+    out = json.loads(JsonFormatter().format(record("failed to insert registration", error=error, rows=3)))
+    assert "jane@example.com" not in out["error"]
+    assert "j***@example.com" in out["error"]
+    assert "9876543210" not in out["error"]
+    assert out["rows"] == 3
+
+
+def test_tracebacks_are_masked():
+    try:
+        raise ValueError("bad address jane@example.com")
+    except ValueError:
+        import sys
+        rec = record("boom", exc_info=sys.exc_info())
+    out = json.loads(JsonFormatter().format(rec))
+    assert "jane@example.com" not in out["exc"]
+
+
+def test_redaction_can_be_turned_off():
+    out = json.loads(JsonFormatter(redact=False).format(record("x", error="jane@example.com")))
+    assert out["error"] == "jane@example.com"
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+import tickets
+from checkin import CheckinDesk
+
+
+class Recorded:
+    """Stand-in for the checkins table; pages of two rows, like recorded_ticket_ids."""
+
+    def __init__(self):
+        self.rows: list[tuple[int, str]] = []
+        self.reads: list[int] = []
+
+    async def sink(self, batch: list[dict]):
+        for row in batch:
+            self.rows.append((len(self.rows) + 1, row["ticket_id"]))
+
+    async def loader(self, after_id: int = 0):
+        self.reads.append(after_id)
+        rows = [r for r in self.rows if r[0] > after_id]
+        for i in range(0, len(rows), 2):
+            page = rows[i:i + 2]
+            yield page[-1][0], [ticket_id for _, ticket_id in page]
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setenv("TICKET_SECRET", "test-secret")
+
+
+def ticket(i: int) -> str:
+    return tickets.issue(f"a{i}@x.com", f"A{i}", "Early Bird", "2025-10-04")
+
+
+def test_resync_pages_forward_from_the_last_row():
+    table = Recorded()
+    other_gate = CheckinDesk(table.sink, table.loader)
+    desk = CheckinDesk(table.sink, table.loader, full_resync_interval=3600)
+
+    async def main():
+        for i in range(3):
+            await other_gate.scan(ticket(i), "east")
+        await other_gate.flush_once()
+        assert await desk.sync()
+        await other_gate.scan(ticket(3), "east")
+        await other_gate.flush_once()
+        assert await desk.sync()
+        return await desk.scan(ticket(3), "west")
+
+    status, _ = asyncio.run(main())
+    assert status == "used"
+    # the first sync reads everything, the second only what came after row 3
+    assert table.reads == [0, 3]
+
+
+def test_full_resync_reads_everything_again():
+    table = Recorded()
+    desk = CheckinDesk(table.sink, table.loader, full_resync_interval=0)
+
+    async def main():
+        await desk.scan(ticket(0), "east")
+        await desk.flush_once()
+        await desk.sync()
+        await desk.sync()
+
+    asyncio.run(main())
+    assert table.reads == [0, 0]
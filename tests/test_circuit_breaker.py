@@ -0,0 +1,94 @@
+import asyncio
+
+import httpx
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from razorpay_async import AsyncRazorpayClient, RazorpayUnavailable
+
+RESET = 0.05
+
+
+def client_with(handler) -> AsyncRazorpayClient:
+    return AsyncRazorpayClient(
+        auth=("rzp_test", "secret"),
+        base_url="http://razorpay.test/v1",
+        transport=httpx.MockTransport(handler),
+        retries=0,
+        breaker=CircuitBreaker("razorpay", failure_threshold=1, reset_timeout=RESET),
+    )
+
+
+class Upstream:
+    """Answers per `mode`: ok, fail (503), hang or raise."""
+
+    def __init__(self):
+        self.mode = "ok"
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.mode == "hang":
+            await asyncio.sleep(3600)
+        if self.mode == "raise":
+            raise ValueError("not a transport error")
+        if self.mode == "fail":
+            return httpx.Response(503, json={"error": {"description": "down"}})
+        return httpx.Response(200, json={"id": "order_1"})
+
+
+async def open_then_half_open(client: AsyncRazorpayClient, upstream: Upstream):
+    upstream.mode = "fail"
+    with pytest.raises(RazorpayUnavailable):
+        await client.order.fetch("order_1")
+    assert client.breaker.state == "open"
+    await asyncio.sleep(RESET * 1.5)
+    assert client.breaker.state == "half_open"
+
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker("x", failure_threshold=2, reset_timeout=RESET)
+    breaker.record_failure(RuntimeError("a"))
+    assert breaker.before_call() is False
+    breaker.record_failure(RuntimeError("b"))
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    asyncio.run(asyncio.sleep(RESET * 1.5))
+    assert breaker.before_call() is True
+    # only one trial at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_cancelled_trial_does_not_wedge_the_circuit():
+    upstream = Upstream()
+    client = client_with(upstream)
+
+    async def run():
+        await open_then_half_open(client, upstream)
+        upstream.mode = "hang"
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.order.fetch("order_1"), 0.05)
+        # the next call gets to be the trial, and closes the circuit
+        upstream.mode = "ok"
+        assert await client.order.fetch("order_1") == {"id": "order_1"}
+        assert client.breaker.state == "closed"
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_unexpected_error_in_trial_does_not_wedge_the_circuit():
+    upstream = Upstream()
+    client = client_with(upstream)
+
+    async def run():
+        await open_then_half_open(client, upstream)
+        upstream.mode = "raise"
+        with pytest.raises(ValueError):
+            await client.order.fetch("order_1")
+        upstream.mode = "ok"
+        assert await client.order.fetch("order_1") == {"id": "order_1"}
+        await client.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+
+from coupon_quota import FreeCouponQuota
+from shared_state import MemoryBackend, SQLiteBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def state(request, tmp_path):
+    backend = MemoryBackend() if request.param == "memory" else SQLiteBackend(str(tmp_path / "state.sqlite3"))
+    yield backend
+    backend.close()
+
+
+class Remote:
+    """Stand-in for the Supabase FREE count."""
+
+    def __init__(self, count: int = 0):
+        self.count = count
+        self.before_return = None
+
+    async def __call__(self) -> int:
+        if self.before_return is not None:
+            hook, self.before_return = self.before_return, None
+            await hook()
+        return self.count
+
+
+def quota(state, remote: Remote, limit: int = 3, **kwargs) -> FreeCouponQuota:
+    return FreeCouponQuota(limit=limit, counter=remote, state=state, **kwargs)
+
+
+def test_unseeded_quota_is_exhausted(state):
+    q = quota(state, Remote())
+    assert not q.available()
+    assert not asyncio.run(q.reserve("free:a@x.com"))
+
+
+def test_reserve_never_goes_past_the_limit(state):
+    async def main():
+        q = quota(state, Remote(1))
+        await q.seed()
+        results = await asyncio.gather(*(q.reserve(f"free:{i}@x.com") for i in range(5)))
+        return q, results
+
+    q, results = asyncio.run(main())
+    assert sum(results) == 2
+    assert state.get(q.key) == "3"
+    # the holds of the refused reservations were dropped again
+    assert state.count(q.hold_prefix) == 2
+
+
+def test_leaked_hold_expires_and_reconcile_gives_the_slot_back(state):
+    async def main():
+        remote = Remote(0)
+        q = quota(state, remote, limit=2, hold_ttl=0.05)
+        await q.seed()
+        assert await q.reserve("free:crashed@x.com")   # worker dies: no commit, no release
+        assert await q.reserve("free:slow@x.com")
+        await q.commit("free:slow@x.com")              # queued in the outbox, not yet sent
+        assert not await q.reserve("free:late@x.com")
+        await asyncio.sleep(0.1)
+        assert await q.reconcile()
+        return q
+
+    q = asyncio.run(main())
+    assert state.get(q.key) == "1"
+    assert q.remaining() == 1
+
+
+def test_release_after_expiry_does_not_return_the_slot_twice(state):
+    async def main():
+        q = quota(state, Remote(0), hold_ttl=0.05)
+        await q.seed()
+        await q.reserve("free:a@x.com")
+        await asyncio.sleep(0.1)
+        await q.reconcile()        # the expired hold is no longer counted
+        await q.release("free:a@x.com")
+        return q
+
+    q = asyncio.run(main())
+    assert state.get(q.key) == "0"
+
+
+def test_delivered_rows_are_counted_by_the_remote(state):
+    async def main():
+        remote = Remote(0)
+        q = quota(state, remote)
+        await q.seed()
+        await q.reserve("free:a@x.com")
+        await q.commit("free:a@x.com")
+        remote.count = 1
+        await q.delivered(["free:a@x.com"])
+        await q.reconcile()
+        return q
+
+    q = asyncio.run(main())
+    assert state.get(q.key) == "1"
+    assert state.count(q.hold_prefix) == 0
+
+
+def test_reconcile_retries_when_a_reservation_races_it(state):
+    async def main():
+        remote = Remote(0)
+        q = quota(state, remote)
+        await q.seed()
+
+        async def reserve_meanwhile():
+            assert await q.reserve("free:racer@x.com")
+
+        remote.before_return = reserve_meanwhile
+        assert await q.reconcile()
+        return q
+
+    q = asyncio.run(main())
+    # a blind write of the first read (remote 0 + 0 holds) would have lost the racer
+    assert state.get(q.key) == "1"
+
+
+def test_seed_restores_holds_for_queued_rows(state):
+    async def queued():
+        return ["free:a@x.com", "free:b@x.com"]
+
+    q = quota(state, Remote(1), queued=queued)
+    assert asyncio.run(q.seed())
+    assert state.get(q.key) == "3"
+    assert not q.available()
+
+
+def test_failed_fetch_keeps_the_count(state):
+    async def down():
+        raise ConnectionError("supabase down")
+
+    async def main():
+        q = quota(state, Remote(2))
+        await q.seed()
+        q._counter = down
+        return q, await q.reconcile()
+
+    q, ok = asyncio.run(main())
+    assert not ok
+    assert state.get(q.key) == "2"
+
+
+def test_start_seeds_in_the_background(state):
+    supabase_answers = None
+
+    async def hanging_remote() -> int:
+        await supabase_answers.wait()
+        return 1
+
+    async def main():
+        nonlocal supabase_answers
+        supabase_answers = asyncio.Event()
+        q = FreeCouponQuota(limit=3, counter=hanging_remote, state=state, refresh=0.01)
+        q.start()   # returns at once, though Supabase doesn't answer
+        await asyncio.sleep(0.05)
+        assert not q.available()
+        supabase_answers.set()
+        for _ in range(100):
+            if q.available():
+                break
+            await asyncio.sleep(0.01)
+        await q.stop()
+        return q
+
+    q = asyncio.run(main())
+    assert q.remaining() == 2
@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+import pytest
+
+import clients
+
+
+@pytest.fixture
+def no_razorpay_keys(monkeypatch):
+    monkeypatch.delenv("RAZORPAY_KEY_ID", raising=False)
+    monkeypatch.delenv("RAZORPAY_SECRET", raising=False)
+    monkeypatch.setattr(clients, "_razorpay", None)
+
+
+def get(path: str) -> httpx.Response:
+    import main
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+
+    return asyncio.run(run())
+
+
+def test_health_without_razorpay_keys(no_razorpay_keys):
+    resp = get("/health")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "degraded"
+    assert resp.json()["razorpay"] == {"state": "not_configured"}
+    assert clients.peek_razorpay() is None
+
+
+def test_metrics_without_razorpay_keys(no_razorpay_keys):
+    resp = get("/metrics")
+    assert resp.status_code == 200
+    assert "razorpay_circuit_state 2" in resp.text
@@ -0,0 +1,66 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+from http_transport import SharedTransport
+
+
+async def keepalive_server() -> asyncio.AbstractServer:
+    """HTTP/1.1 on 127.0.0.1 that answers every request with a small body, keeping the connection."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nContent-Type: text/plain\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_calls_share_one_connection_and_aclose_closes_the_pool():
+    async def main():
+        server = await keepalive_server()
+        url = f"http://localhost:{server.sockets[0].getsockname()[1]}/"
+        transport = SharedTransport(http2=False)
+        try:
+            a = httpx.AsyncClient(transport=transport)
+            b = httpx.AsyncClient(transport=transport)
+            for client in (a, b, a):
+                resp = await client.get(url)
+                assert resp.status_code == 200 and resp.text == "ok"
+            before = transport.stats()
+            await transport.aclose()
+            await transport.aclose()      # idempotent
+            await a.aclose()              # clients closing afterwards is harmless
+            await b.aclose()
+            with pytest.raises(RuntimeError):
+                await transport.handle_async_request(httpx.Request("GET", url))
+            return before, transport.stats()
+        finally:
+            server.close()
+
+    before, after = asyncio.run(main())
+    assert before["connects"] == 1 and before["dns_lookups"] == 1
+    assert before["connections"] == 1
+    assert after["connections"] == 0
+
+
+def test_transport_errors_surface_as_httpx_errors():
+    async def main():
+        async with httpx.AsyncClient(transport=SharedTransport(http2=False)) as client:
+            await client.get(f"http://127.0.0.1:{free_port()}/")
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(main())
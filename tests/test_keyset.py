@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from keyset import keyset_pages
+
+ROWS = [{"id": i} for i in range(1, 8)]
+
+
+class Table:
+    def __init__(self):
+        self.fetches: list[int] = []
+
+    async def fetch(self, after_id: int, limit: int) -> list[dict]:
+        self.fetches.append(after_id)
+        return [r for r in ROWS if r["id"] > after_id][:limit]
+
+
+async def collect(pages) -> list[list[int]]:
+    return [[r["id"] for r in page] async for page in pages]
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_pages_follow_the_last_id(prefetch):
+    table = Table()
+    pages = asyncio.run(collect(keyset_pages(table.fetch, 3, prefetch=prefetch)))
+    assert pages == [[1, 2, 3], [4, 5, 6], [7]]
+    assert table.fetches == [0, 3, 6]
+
+
+def test_resumes_after_an_id_and_uses_a_fetched_first_page():
+    table = Table()
+    assert asyncio.run(collect(keyset_pages(table.fetch, 2, after_id=5))) == [[6, 7]]
+    table.fetches.clear()
+    assert asyncio.run(collect(keyset_pages(table.fetch, 4, first=[{"id": 1}]))) == [[1]]
+    assert table.fetches == []
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+from email.message import Message
+
+import pytest
+
+from mailer import EmailDispatcher
+
+pytest.importorskip("aiosmtpd")
+from fakes import start_smtp_sink  # noqa: E402
+
+
+@pytest.fixture
+def sink():
+    controller, handler = start_smtp_sink()
+    yield controller, handler
+    controller.stop()
+
+
+def dispatcher(controller, **kwargs) -> tuple[EmailDispatcher, list]:
+    """A dispatcher pointed at the sink; the list records every new SMTP session."""
+    kwargs.setdefault("workers", 1)
+    d = EmailDispatcher(
+        host=controller.hostname, port=controller.port, user="user", password="pass",
+        starttls=False, backoff=0.01, **kwargs,
+    )
+    sessions = []
+    connect = d._connect
+
+    def counting_connect():
+        sessions.append(time.monotonic())
+        return connect()
+
+    d._connect = counting_connect
+    return d, sessions
+
+
+def message(i: int) -> Message:
+    msg = Message()
+    msg["From"] = "user"
+    msg["To"] = f"m{i}@x.com"
+    msg["Subject"] = f"Registration {i}"
+    msg.set_payload("ok")
+    return msg
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_one_session_is_reused_for_every_message(sink):
+    controller, handler = sink
+    d, sessions = dispatcher(controller)
+    for i in range(5):
+        assert d.submit(message(i))
+    d.stop()
+    assert handler.count == d.sent == 5
+    assert len(sessions) == 1
+
+
+def test_reconnects_after_the_server_drops_the_session(sink):
+    controller, handler = sink
+    d, sessions = dispatcher(controller)
+    handle_data = handler.handle_DATA
+
+    async def accept_then_hang_up(server, session, envelope):
+        # like a relay closing an idle or overused session after a message
+        result = await handle_data(server, session, envelope)
+        asyncio.get_running_loop().call_soon(server.transport.close)
+        return result
+
+    handler.handle_DATA = accept_then_hang_up
+    d.submit(message(0))
+    wait_for(lambda: handler.count == 1)
+    time.sleep(0.05)
+    d.submit(message(1))
+    d.stop()
+    assert handler.count == d.sent == 2
+    assert d.failed == 0
+    assert len(sessions) == 2
+
+
+def test_full_queue_drops_and_counts(sink):
+    controller, handler = sink
+    d, _ = dispatcher(controller, queue_size=1)
+    release = threading.Event()
+    send = d._send
+
+    def slow_send(server, msg):
+        release.wait(5)
+        return send(server, msg)
+
+    d._send = slow_send
+    assert d.submit(message(0))
+    wait_for(lambda: d.pending() == 0)   # the worker is busy with message 0
+    assert d.submit(message(1))
+    assert not d.submit(message(2))
+    assert d.dropped == 1
+    release.set()
+    d.stop()
+    assert handler.count == d.sent == 2
+
+
+def test_concurrent_first_submits_start_one_pool(sink):
+    controller, _ = sink
+    d, _ = dispatcher(controller, workers=2)
+    before = set(threading.enumerate())
+    barrier = threading.Barrier(8)
+
+    def first_submit(i: int):
+        barrier.wait()
+        d.submit(message(i))
+
+    threads = [threading.Thread(target=first_submit, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    started = [t for t in set(threading.enumerate()) - before if t.name.startswith("mailer-")]
+    d.stop()
+    assert len(started) == 2
+    assert d.sent == 8
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from outbox import RegistrationOutbox
+
+ROW = {"name": "A", "email": "a@x.com", "phone": 9100000000, "tier": "Individual"}
+
+
+class Supabase:
+    """Sink standing in for insert_registrations; `down` fails whole calls."""
+
+    def __init__(self, down: int = 0):
+        self.down = down
+        self.calls = 0
+        self.rows = []
+
+    async def __call__(self, rows: list[dict]) -> list[dict]:
+        self.calls += 1
+        if self.calls <= self.down:
+            raise ConnectionError("supabase down")
+        self.rows.extend(rows)
+        return [{"stored": True, "error": None} for _ in rows]
+
+
+def outbox(tmp_path, sink, **kwargs) -> RegistrationOutbox:
+    return RegistrationOutbox(str(tmp_path / "outbox.sqlite3"), sink, **kwargs)
+
+
+def test_same_dedup_key_is_queued_once(tmp_path):
+    sink = Supabase()
+    box = outbox(tmp_path, sink)
+    assert box.add_many([ROW], "order_1", ["order_1:a@x.com"]) == 1
+    assert box.add_many([ROW, {**ROW, "email": "b@x.com"}], "order_1", ["order_1:a@x.com", "order_1:b@x.com"]) == 1
+    assert box.pending() == 2
+
+    assert asyncio.run(box.flush_once()) == 2
+    # still a no-op once the first copy was sent
+    assert box.add_many([ROW], "order_1", ["order_1:a@x.com"]) == 0
+    assert [r["email"] for r in sink.rows] == ["a@x.com", "b@x.com"]
+
+
+def test_leased_rows_come_back_after_the_lease(tmp_path):
+    sink = Supabase()
+    crashed = outbox(tmp_path, sink, lease=0.1)
+    other = outbox(tmp_path, sink, lease=0.1)
+    crashed.add_many([ROW], "order_1")
+
+    assert len(crashed.due(10)) == 1   # leased, then the worker dies
+    assert other.due(10) == []
+    time.sleep(0.15)
+    assert asyncio.run(other.flush_once()) == 1
+    assert other.pending() == 0
+    assert sink.rows == [ROW]
+
+
+def test_failed_send_is_retried(tmp_path):
+    sink = Supabase(down=2)
+    box = outbox(tmp_path, sink, max_backoff=0)
+    box.add_many([ROW], "order_1")
+
+    async def main():
+        assert await box.flush_once() == 0
+        assert await box.flush_once() == 0
+        return await box.flush_once()
+
+    assert asyncio.run(main()) == 1
+    assert sink.calls == 3
+    assert box.pending() == 0
+
+
+def test_failed_send_backs_off(tmp_path):
+    box = outbox(tmp_path, Supabase(down=1))
+    box.add_many([ROW], "order_1")
+    assert asyncio.run(box.flush_once()) == 0
+    attempts, retry_at, error = box._db().execute(
+        "SELECT attempts, next_attempt_at, last_error FROM registration_outbox"
+    ).fetchone()
+    assert (attempts, error) == (1, "supabase down")
+    assert retry_at > time.time()
+    assert box.due(10) == []
+
+
+def test_rows_survive_a_reopen(tmp_path):
+    box = outbox(tmp_path, Supabase())
+    box.add_many([ROW, {**ROW, "email": "b@x.com", "tier": "FREE"}], "order_1")
+    box.close()
+
+    sink = Supabase()
+    reopened = outbox(tmp_path, sink)
+    assert reopened.pending() == 2
+    assert reopened.pending_emails("FREE") == ["b@x.com"]
+    assert reopened.known_orders(["order_1", "order_2"]) == {"order_1"}
+    assert asyncio.run(reopened.flush_once()) == 2
+    assert [r["email"] for r in sink.rows] == ["a@x.com", "b@x.com"]
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import clients
+from payment_reconciler import PaymentReconciler
+from shared_state import MemoryBackend
+
+
+class Ledger:
+    """Stand-in for the outbox ledger and backfill_order."""
+
+    def __init__(self, known=(), unrecoverable=()):
+        self.known = set(known)
+        self.unrecoverable = set(unrecoverable)
+        self.backfilled = []
+
+    def known_orders(self, order_ids: list[str]) -> set[str]:
+        return self.known & set(order_ids)
+
+    async def notes_for_order(self, order_id: str) -> dict:
+        return (await clients.get_razorpay().order.fetch(order_id))["notes"]
+
+    async def backfill(self, order_id: str, notes: dict) -> str:
+        if order_id in self.unrecoverable:
+            return "unrecoverable"
+        self.backfilled.append(order_id)
+        self.known.add(order_id)
+        return "backfilled"
+
+
+def reconciler(tmp_path, ledger: Ledger, razorpay=clients.get_razorpay, **kwargs) -> PaymentReconciler:
+    return PaymentReconciler(
+        razorpay,
+        ledger.known_orders,
+        ledger.notes_for_order,
+        ledger.backfill,
+        ready=lambda: True,
+        state=MemoryBackend(),
+        checkpoint_path=str(tmp_path / "checkpoint.json"),
+        **kwargs,
+    )
+
+
+async def paid_orders(razorpay, n: int, at: int | None = None) -> list[str]:
+    ids = []
+    for i in range(n):
+        order = await clients.get_razorpay().order.create({"amount": 100, "currency": "INR", "notes": {"email": f"r{i}@x.com"}})
+        razorpay.state.capture(order["id"], at=at)
+        ids.append(order["id"])
+    return ids
+
+
+def test_each_paid_order_gets_one_outcome(razorpay, tmp_path):
+    async def main():
+        present, lost, broken = await paid_orders(razorpay, 3)
+        unpaid = await clients.get_razorpay().order.create({"amount": 100, "currency": "INR", "notes": {}})
+        ledger = Ledger(known=[present], unrecoverable=[broken])
+        now = int(time.time())
+        counts = await reconciler(tmp_path, ledger).run(now - 60, now + 60)
+        return ledger, counts, lost, unpaid
+
+    ledger, counts, lost, unpaid = asyncio.run(main())
+    assert ledger.backfilled == [lost]
+    assert unpaid["id"] not in ledger.known
+    # each paid order is seen in both lists; the second look finds it in the ledger
+    assert counts["orders"] == 4 and counts["payments"] == 3
+    assert (counts["backfilled"], counts["unrecoverable"]) == (1, 2)
+    assert counts["present"] == 3
+
+
+def test_background_job_leaves_the_settle_window_alone(razorpay, tmp_path):
+    async def main():
+        ledger = Ledger()
+        rec = reconciler(tmp_path, ledger, settle=600, lookback=3600)
+        old = await paid_orders(razorpay, 1, at=int(time.time()) - 1200)
+        await paid_orders(razorpay, 1)   # just paid; verify-payment may still confirm it
+        await rec.run_due()
+        first = list(ledger.backfilled)
+        # the next round starts where this one ended, so it finds nothing new
+        await rec.run_due()
+        assert ledger.backfilled == first
+        return ledger, old, rec.load_checkpoint()
+
+    ledger, old, checkpoint = asyncio.run(main())
+    assert ledger.backfilled == old
+    assert checkpoint["run"] is None
+    assert checkpoint["last_end"] <= time.time() - 600
+
+
+class Flaky:
+    """Razorpay client whose order list fails on call `fail_on`, like an outage mid-run."""
+
+    def __init__(self, client, fail_on: int):
+        self.client = client
+        self.fail_on = fail_on
+        self.calls = 0
+        self.order = self
+        self.payment = client.payment
+
+    async def all(self, params: dict) -> dict:
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise ConnectionError("razorpay down")
+        return await self.client.order.all(params)
+
+
+def test_restart_resumes_from_the_checkpoint(razorpay, tmp_path):
+    async def main():
+        orders = await paid_orders(razorpay, 5)
+        now = int(time.time())
+        window = (now - 60, now + 60)
+
+        ledger = Ledger()
+        flaky = Flaky(clients.get_razorpay(), fail_on=3)
+        with pytest.raises(ConnectionError):
+            await reconciler(tmp_path, ledger, razorpay=lambda: flaky, page_size=2).run(*window)
+        interrupted = list(ledger.backfilled)
+        saved = json.loads((tmp_path / "checkpoint.json").read_text())["run"]
+
+        # a new process, same checkpoint file
+        restarted = reconciler(tmp_path, ledger, page_size=2)
+        counts = await restarted.run(*window)
+        return window, orders, interrupted, saved, ledger, counts, restarted.load_checkpoint()
+
+    window, orders, interrupted, saved, ledger, counts, checkpoint = asyncio.run(main())
+    assert len(interrupted) == 4
+    assert (saved["list"], saved["skip"]) == ("orders", 4)
+    assert sorted(ledger.backfilled) == sorted(orders)
+    # counts carry over from the checkpoint; refetching the first pages would make it 9
+    assert counts["orders"] == 5 and counts["backfilled"] == 5
+    assert checkpoint == {"run": None, "last_end": window[1]}
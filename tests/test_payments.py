@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import payments
+from mailer import EmailDispatcher
+
+
+def member(i: int) -> tuple[int, dict]:
+    return i + 2, {"name": f"M{i}", "email": f"m{i}@x.com", "phone": 9000000000 + i, "college": None, "type": None}
+
+
+def group_notes(size: int) -> dict:
+    return {
+        "tier": f"Group ({size})",
+        "price_per_head": "300",
+        "group_size": str(size),
+        "staged_members": str(size),
+        "location": "T-HUB",
+        "conference_date": "2025-10-26",
+    }
+
+
+# --- staged groups ---
+
+def test_staged_group_missing_here_is_not_confirmed(stores):
+    staging, outbox = stores
+    order_id = "order_elsewhere"
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(payments.confirm_staged_group(order_id, group_notes(6)))
+    assert e.value.status_code == 503
+    assert outbox.pending() == 0
+    assert asyncio.run(payments.backfill_order(order_id, group_notes(6))) == "unrecoverable"
+
+
+def test_partly_staged_group_is_retried_once_complete(stores):
+    staging, outbox = stores
+    order_id = "order_partial"
+    staging.add_many(order_id, [member(i) for i in range(5)])
+
+    async def main():
+        with pytest.raises(HTTPException) as e:
+            await payments.confirm_staged_group(order_id, group_notes(6))
+        assert e.value.status_code == 503
+        assert outbox.pending() == 0
+        # not remembered as done, so the retry does the work
+        staging.add_many(order_id, [member(5)])
+        return await payments.confirm_staged_group(order_id, group_notes(6))
+
+    assert asyncio.run(main()) == {"group_size": 6, "group_failed": [], "emails_not_queued": 0}
+    assert outbox.pending() == 6
+    assert staging.count(order_id) == 0
+
+
+# --- confirmation emails ---
+
+@pytest.fixture
+def mail(monkeypatch):
+    """A dispatcher with a two-message queue and no workers; the test drains it."""
+    monkeypatch.setenv("TICKET_SECRET", "test-secret")
+    monkeypatch.setattr(payments, "SMTP_USER", "user")
+    monkeypatch.setattr(payments, "SMTP_PASS", "pass")
+    dispatcher = EmailDispatcher(workers=0, queue_size=2, submit_timeout=0.2)
+    monkeypatch.setattr(payments, "dispatcher", dispatcher)
+    return dispatcher
+
+
+def rows(n: int) -> list[dict]:
+    return [
+        payments.registration_row(f"M{i}", f"m{i}@x.com", None, "Group (5)", "300", "T-HUB", "2025-10-26", "IIT")
+        for i in range(n)
+    ]
+
+
+def test_full_mail_queue_holds_the_batch_back(mail):
+    delivered = []
+
+    async def drain():
+        while True:
+            while not mail._queue.empty():
+                delivered.append(mail._queue.get_nowait()["To"])
+            await asyncio.sleep(0.01)
+
+    async def main():
+        drainer = asyncio.create_task(drain())
+        try:
+            return await payments.send_ack_emails(rows(10))
+        finally:
+            drainer.cancel()
+
+    assert asyncio.run(main()) == 0
+    assert len(delivered) + mail.pending() == 10
+    assert mail.dropped == 0
+
+
+def test_mail_queue_that_stays_full_is_counted(mail):
+    assert asyncio.run(payments.send_ack_emails(rows(5))) == 3
+    assert mail.pending() == 2
+    assert mail.dropped == 3
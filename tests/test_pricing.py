@@ -0,0 +1,72 @@
+from datetime import date
+
+import pytest
+
+from pricing import PRICING_RULES, PricingEngine
+
+DAY = date(2025, 10, 1)
+
+
+def engine(free_left: bool = True) -> PricingEngine:
+    return PricingEngine(PRICING_RULES, quotas={"free": lambda: free_left})
+
+
+def old_price(size: int, coupon: str | None, free_left: bool = True) -> tuple[int, str]:
+    """(per-head rupees, coupon type) the way create_order priced before the rule table."""
+    code = (coupon or "").strip().upper()
+    if code == "FREEIPRISM2025" and free_left:
+        return 0, "FREE"
+    if size >= 2:
+        if size >= 10:
+            return 300, "NONE"
+        if size >= 5:
+            return 400, "NONE"
+        return 1000, "NONE"
+    if code == "IPRISM2025":
+        return 500, "DISCOUNT"
+    return 1000, "NONE"
+
+
+@pytest.mark.parametrize("size, coupon, free_left, per_head, ctype", [
+    (1, None, True, 1000, "NONE"),
+    (2, None, True, 1000, "NONE"),
+    (4, None, True, 1000, "NONE"),
+    (5, None, True, 400, "NONE"),
+    (9, None, True, 400, "NONE"),
+    # the old module defined group_discount_price twice; the first (shadowed)
+    # copy charged 10 members 400, the one that ran charged 300
+    (10, None, True, 300, "NONE"),
+    (11, None, True, 300, "NONE"),
+    (40, None, True, 300, "NONE"),
+    # a discount coupon applies to individuals only
+    (1, "IPRISM2025", True, 500, "DISCOUNT"),
+    (1, " iprism2025 ", True, 500, "DISCOUNT"),
+    (5, "IPRISM2025", True, 400, "NONE"),
+    (1, "BOGUS", True, 1000, "NONE"),
+    # FREE wins over everything while the quota has room
+    (1, "FREEIPRISM2025", True, 0, "FREE"),
+    (5, "freeiprism2025", True, 0, "FREE"),
+    (1, "FREEIPRISM2025", False, 1000, "NONE"),
+    (10, "FREEIPRISM2025", False, 300, "NONE"),
+])
+def test_quote_matches_the_old_prices(size, coupon, free_left, per_head, ctype):
+    quote = engine(free_left).quote(DAY, coupon, size)
+    assert (quote["final_rupees"], quote["coupon_type"]) == (per_head, ctype) == old_price(size, coupon, free_left)
+    assert quote["total_rupees"] == per_head * (size if ctype != "FREE" and size >= 2 else 1)
+    assert quote["tier"] == (f"Group ({size})" if ctype != "FREE" and size >= 2 else "Regular")
+
+
+@pytest.mark.parametrize("day, tier", [
+    (date(2025, 9, 9), "Early Bird"),
+    (date(2025, 9, 10), "Regular"),
+    (date(2025, 12, 11), "Regular"),
+    (date(2025, 12, 12), "Late/Onsite"),
+])
+def test_tier_by_date(day, tier):
+    assert engine().tier(day) == (tier, 1000)
+
+
+def test_quota_bound_coupons_are_not_cached():
+    assert engine().cache_key("freeiprism2025") is None
+    assert engine().cache_key(" iprism2025") == "IPRISM2025"
+    assert engine().cache_key("BOGUS") == engine().cache_key(None) == ""
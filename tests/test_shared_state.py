@@ -0,0 +1,130 @@
+"""
+The shared state backends under real multi-process contention, as with
+`uvicorn --workers N`: nothing may be granted twice or past its limit.
+
+Runs against a fresh SQLite file, and against Redis at TEST_REDIS_URL
+(default redis://localhost:6379/15) when the client is installed and the
+server answers.
+"""
+import multiprocessing
+import os
+import time
+import uuid
+
+import pytest
+
+from shared_state import open_backend
+
+PROCESSES = 4
+
+
+def redis_url() -> str:
+    url = os.environ.get("TEST_REDIS_URL", "redis://localhost:6379/15")
+    try:
+        import redis
+        redis.Redis.from_url(url, socket_timeout=0.5).ping()
+    except Exception as e:
+        pytest.skip(f"no redis at {url}: {e}")
+    return url
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def url(request, tmp_path):
+    if request.param == "redis":
+        return redis_url()
+    return f"sqlite:///{tmp_path / 'state.sqlite3'}"
+
+
+def run_workers(target, url: str, prefix: str, *args) -> list:
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(PROCESSES)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=target, args=(url, prefix, barrier, results, *args)) for _ in range(PROCESSES)]
+    for p in procs:
+        p.start()
+    outs = [results.get(timeout=60) for _ in procs]
+    for p in procs:
+        p.join(timeout=10)
+    assert all(p.exitcode == 0 for p in procs)
+    return outs
+
+
+# --- workers (module level so spawned processes can import them) ---
+
+def incr_worker(url, prefix, barrier, results, ops, limit):
+    state = open_backend(url, prefix)
+    barrier.wait()
+    granted = sum(state.incr("quota", 1, limit=limit) is not None for _ in range(ops))
+    state.close()
+    results.put(granted)
+
+
+def lock_worker(url, prefix, barrier, results, ops):
+    state = open_backend(url, prefix)
+    barrier.wait()
+    done, most_inside = 0, 0
+    while done < ops:
+        token = state.try_lock("section", ttl=10)
+        if token is None:
+            time.sleep(0.001)
+            continue
+        try:
+            most_inside = max(most_inside, state.incr("inside"))
+            # unguarded read-modify-write: only safe if the lock really excludes
+            value = int(state.get("counter") or 0)
+            time.sleep(0.0005)
+            state.set("counter", str(value + 1))
+            state.incr("inside", -1)
+        finally:
+            state.unlock("section", token)
+        done += 1
+    state.close()
+    results.put(most_inside)
+
+
+def token_worker(url, prefix, barrier, results, rate, burst, duration):
+    state = open_backend(url, prefix)
+    barrier.wait()
+    granted = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        if state.take_token("bucket", rate, burst) == 0:
+            granted += 1
+    state.close()
+    results.put(granted)
+
+
+# --- tests ---
+
+def prefix() -> str:
+    return f"test:{uuid.uuid4().hex[:8]}:"
+
+
+def test_incr_never_passes_its_limit(url):
+    p = prefix()
+    granted = run_workers(incr_worker, url, p, 200, 500)
+    state = open_backend(url, p)
+    try:
+        assert sum(granted) == 500
+        assert state.get("quota") == "500"
+    finally:
+        state.close()
+
+
+def test_try_lock_admits_one_process_at_a_time(url):
+    p = prefix()
+    most_inside = run_workers(lock_worker, url, p, 25)
+    state = open_backend(url, p)
+    try:
+        assert max(most_inside) == 1
+        assert state.get("counter") == str(PROCESSES * 25)
+    finally:
+        state.close()
+
+
+def test_take_token_never_grants_more_than_the_bucket_allows(url):
+    rate, burst, duration = 50.0, 20.0, 1.0
+    started = time.monotonic()
+    granted = sum(run_workers(token_worker, url, prefix(), rate, burst, duration))
+    # the bucket starts full; the wall time bounds how long any worker could refill
+    assert burst <= granted <= burst + rate * (time.monotonic() - started)
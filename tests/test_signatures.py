@@ -0,0 +1,84 @@
+import hashlib
+import hmac
+import json
+
+import pytest
+
+import payments
+from conftest import RAZORPAY_SECRET, WEBHOOK_SECRET
+from test_verify_payment import run, sign
+
+
+def webhook_signature(body: bytes, secret: str = WEBHOOK_SECRET) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def tampered(signature: str) -> str:
+    return signature[:-1] + ("1" if signature[-1] == "0" else "0")
+
+
+BODY = json.dumps({"event": "payment.captured", "payload": {}}).encode()
+
+
+@pytest.fixture
+def secrets(monkeypatch):
+    monkeypatch.setenv("RAZORPAY_SECRET", RAZORPAY_SECRET)
+    monkeypatch.setenv("RAZORPAY_WEBHOOK_SECRET", WEBHOOK_SECRET)
+
+
+def test_payment_signature_is_accepted(secrets):
+    assert payments.verify_payment_signature("order_1", "pay_1", sign("order_1", "pay_1"))
+
+
+@pytest.mark.parametrize("order_id, payment_id, signature", [
+    pytest.param("order_2", "pay_1", sign("order_1", "pay_1"), id="other order"),
+    pytest.param("order_1", "pay_2", sign("order_1", "pay_1"), id="other payment"),
+    pytest.param("order_1", "pay_1", tampered(sign("order_1", "pay_1")), id="tampered"),
+    pytest.param("order_1", "pay_1", "", id="empty"),
+    pytest.param("order_1", "pay_1", sign("order_1", "pay_1", secret="wrong"), id="wrong secret"),
+])
+def test_bad_payment_signature_is_rejected(secrets, order_id, payment_id, signature):
+    assert not payments.verify_payment_signature(order_id, payment_id, signature)
+
+
+def test_payment_signature_needs_a_secret(monkeypatch):
+    monkeypatch.setenv("RAZORPAY_SECRET", "")
+    assert not payments.verify_payment_signature("order_1", "pay_1", sign("order_1", "pay_1", secret=""))
+
+
+def test_webhook_signature_is_accepted(secrets):
+    assert payments.verify_webhook_signature(BODY, webhook_signature(BODY))
+
+
+@pytest.mark.parametrize("body, signature", [
+    pytest.param(BODY.replace(b"captured", b"failed"), webhook_signature(BODY), id="tampered body"),
+    pytest.param(BODY, tampered(webhook_signature(BODY)), id="tampered signature"),
+    pytest.param(BODY, "", id="empty"),
+    pytest.param(BODY, webhook_signature(BODY, secret="wrong"), id="wrong secret"),
+])
+def test_bad_webhook_signature_is_rejected(secrets, body, signature):
+    assert not payments.verify_webhook_signature(body, signature)
+
+
+def test_webhook_signature_needs_a_secret(monkeypatch):
+    monkeypatch.setenv("RAZORPAY_WEBHOOK_SECRET", "")
+    assert not payments.verify_webhook_signature(BODY, webhook_signature(BODY, secret=""))
+
+
+def test_routes_refuse_bad_signatures(razorpay, stores):
+    _, outbox = stores
+
+    async def calls(client):
+        verify = await client.post("/payments/verify-payment", json={
+            "razorpay_order_id": "order_1", "razorpay_payment_id": "pay_1",
+            "razorpay_signature": sign("order_1", "pay_1", secret="wrong"),
+        })
+        webhook = await client.post(
+            "/payments/webhook", content=BODY,
+            headers={"X-Razorpay-Signature": webhook_signature(BODY, secret="wrong"), "X-Razorpay-Event-Id": "evt_1"},
+        )
+        return verify, webhook
+
+    verify, webhook = run(calls)
+    assert verify.status_code == webhook.status_code == 400
+    assert outbox.pending() == 0
@@ -0,0 +1,52 @@
+import pytest
+
+import tickets
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setenv("TICKET_SECRET", "test-secret")
+
+
+def token() -> str:
+    return tickets.issue("Asha@X.com", "Asha", "Early Bird", "2025-10-04")
+
+
+def test_issued_ticket_verifies():
+    assert tickets.verify(token()) == {
+        "ticket_id": tickets.ticket_id("asha@x.com", "2025-10-04"),
+        "email": "Asha@X.com",
+        "name": "Asha",
+        "tier": "Early Bird",
+        "conference_date": "2025-10-04",
+    }
+    # re-sent emails carry the same ticket
+    assert token() == token()
+
+
+def swap(text: str, index: int) -> str:
+    return text[:index] + ("A" if text[index] != "A" else "B") + text[index + 1:]
+
+
+@pytest.mark.parametrize("tamper", [
+    pytest.param(lambda t: swap(t, 10), id="payload"),
+    pytest.param(lambda t: swap(t, len(t) - 2), id="mac"),
+    pytest.param(lambda t: t.rsplit(".", 1)[0], id="no mac"),
+    pytest.param(lambda t: "IP2" + t[3:], id="prefix"),
+    pytest.param(lambda t: "", id="empty"),
+    pytest.param(lambda t: "IP1.!!.!!", id="garbage"),
+])
+def test_tampered_ticket_is_refused(tamper):
+    assert tickets.verify(tamper(token())) is None
+
+
+def test_ticket_from_another_secret_is_refused(monkeypatch):
+    issued = token()
+    monkeypatch.setenv("TICKET_SECRET", "other-secret")
+    assert tickets.verify(issued) is None
+
+
+def test_missing_secret_fails_loudly(monkeypatch):
+    monkeypatch.setenv("TICKET_SECRET", "")
+    with pytest.raises(RuntimeError):
+        token()
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import hmac
+
+import httpx
+import pytest
+
+from conftest import RAZORPAY_SECRET
+
+
+def sign(order_id: str, payment_id: str, secret: str = RAZORPAY_SECRET) -> str:
+    return hmac.new(secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+
+
+def members(n: int, start: int = 0) -> list[dict]:
+    return [{"name": f"M{i}", "email": f"verify{i}@x.com", "phone": 9100000000 + i} for i in range(start, start + n)]
+
+
+def run(calls):
+    """Run `calls(client)` against the app (no lifespan) and return its result."""
+    import main
+
+    async def go():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await calls(client)
+
+    return asyncio.run(go())
+
+
+def verify_body(order_id: str, group_members: list[dict] | None = None, payment_id: str = "pay_1") -> dict:
+    body = {
+        "razorpay_order_id": order_id,
+        "razorpay_payment_id": payment_id,
+        "razorpay_signature": sign(order_id, payment_id),
+    }
+    if group_members is not None:
+        body["group_members"] = group_members
+    return body
+
+
+async def group_order(client, group: list[dict]) -> dict:
+    resp = await client.post("/payments/create-order", json={"group_members": group})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["order"]
+
+
+@pytest.mark.parametrize("sent", [
+    pytest.param(members(12), id="more members than paid for"),
+    pytest.param(members(2, start=50), id="different members"),
+    pytest.param([{"name": "M0", "email": "verify0@x.com", "phone": 9100000000}], id="fewer members"),
+])
+def test_group_members_must_match_the_paid_order(razorpay, stores, sent):
+    _, outbox = stores
+
+    async def calls(client):
+        order = await group_order(client, members(2))
+        return await client.post("/payments/verify-payment", json=verify_body(order["id"], sent))
+
+    resp = run(calls)
+    assert resp.status_code == 400
+    assert outbox.pending() == 0
+
+
+def test_group_is_registered_at_the_order_price(razorpay, stores):
+    _, outbox = stores
+    group = members(2, start=100)
+
+    async def calls(client):
+        order = await group_order(client, group)
+        resp = await client.post("/payments/verify-payment", json=verify_body(order["id"], list(reversed(group))))
+        return order, resp
+
+    order, resp = run(calls)
+    assert resp.status_code == 200, resp.text
+    rows = outbox.pending_rows()
+    assert len(rows) == 2
+    assert {r["amount_paid"] for r in rows} == {order["notes"]["price_per_head"]}
+    assert {r["tier"] for r in rows} == {"Group (2)"}
+
+
+def test_group_members_on_an_individual_order_are_refused(razorpay, stores):
+    _, outbox = stores
+
+    async def calls(client):
+        resp = await client.post("/payments/create-order", json={"name": "Solo", "email": "solo@x.com", "phone": 9199999999})
+        order_id = resp.json()["order"]["id"]
+        return await client.post("/payments/verify-payment", json=verify_body(order_id, members(5, start=200)))
+
+    assert run(calls).status_code == 400
+    assert outbox.pending() == 0
+
+
+def test_a_new_idempotency_key_does_not_confirm_the_order_again(razorpay, stores):
+    _, outbox = stores
+    group = members(2, start=300)
+
+    async def calls(client):
+        order = await group_order(client, group)
+        body = verify_body(order["id"], group)
+        first = await client.post("/payments/verify-payment", json=body, headers={"Idempotency-Key": "a"})
+        again = await client.post("/payments/verify-payment", json=body, headers={"Idempotency-Key": "b"})
+        changed = await client.post(
+            "/payments/verify-payment", json=verify_body(order["id"], members(2, start=310)), headers={"Idempotency-Key": "c"},
+        )
+        other = await group_order(client, members(2, start=320))
+        reused = await client.post(
+            "/payments/verify-payment", json=verify_body(other["id"], members(2, start=320)), headers={"Idempotency-Key": "a"},
+        )
+        return first, again, changed, reused
+
+    first, again, changed, reused = run(calls)
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json()
+    assert changed.status_code == 422
+    assert reused.status_code == 422
+    assert outbox.pending() == 2
@@ -0,0 +1,99 @@
+import asyncio
+
+from webhooks import WebhookPipeline
+
+EVENT = {"event": "payment.captured", "payload": {"payment": {"entity": {"order_id": "order_1"}}}}
+
+
+class Handler:
+    """Fails the first `failures` calls, like a handler behind an open Razorpay circuit."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+        self.handled = []
+
+    async def __call__(self, event: dict):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("razorpay circuit open")
+        self.handled.append(event)
+
+
+def pipeline(tmp_path, handler, **kwargs) -> WebhookPipeline:
+    kwargs.setdefault("backoff", 0.01)
+    kwargs.setdefault("interval", 0.01)
+    return WebhookPipeline(str(tmp_path / "inbox.sqlite3"), handler, **kwargs)
+
+
+async def drain(p: WebhookPipeline, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while await asyncio.to_thread(p.pending):
+        assert asyncio.get_running_loop().time() < deadline, "events still pending"
+        await asyncio.sleep(0.01)
+
+
+def test_failing_handler_keeps_being_retried(tmp_path):
+    handler = Handler(failures=6)
+    p = pipeline(tmp_path, handler)
+
+    async def main():
+        p.start()
+        await p.submit(EVENT, "evt_1")
+        await drain(p)
+        await p.stop()
+
+    asyncio.run(main())
+    assert handler.calls == 7
+    assert handler.handled == [EVENT]
+
+
+def test_acked_events_survive_a_restart(tmp_path):
+    async def before_restart():
+        assert await pipeline(tmp_path, Handler()).submit(EVENT, "evt_1")
+        # the worker dies before processing anything
+
+    asyncio.run(before_restart())
+
+    handler = Handler()
+    p = pipeline(tmp_path, handler)
+
+    async def after_restart():
+        p.start()
+        await drain(p)
+        await p.stop()
+
+    asyncio.run(after_restart())
+    assert handler.handled == [EVENT]
+
+
+def test_duplicate_event_ids_are_stored_once(tmp_path):
+    p = pipeline(tmp_path, Handler())
+
+    async def main():
+        return [await p.submit(EVENT, "evt_1"), await p.submit(EVENT, "evt_1"), await p.submit(EVENT)]
+
+    assert asyncio.run(main()) == [True, False, True]
+    assert p.pending() == 2
+
+
+def test_give_up_frees_the_event_id_for_redelivery(tmp_path):
+    released = []
+
+    async def on_give_up(event_id, event):
+        released.append(event_id)
+
+    handler = Handler(failures=1)
+    p = pipeline(tmp_path, handler, give_up_after=0, on_give_up=on_give_up)
+
+    async def main():
+        await p.submit(EVENT, "evt_1")
+        await p.process_once()
+        # Razorpay redelivers; this time the handler succeeds
+        assert await p.submit(EVENT, "evt_1")
+        await p.process_once()
+
+    asyncio.run(main())
+    assert released == ["evt_1"]
+    assert handler.handled == [EVENT]
+    assert p.pending() == 0
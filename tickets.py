@@ -0,0 +1,68 @@
+import base64
+import hashlib
+import hmac
+import json
+
+from decouple import config
+
+
+TICKET_PREFIX = "IP1"
+SIGNATURE_BYTES = 16
+
+
+def ticket_secret() -> bytes:
+    secret = config("TICKET_SECRET", default="")
+    if not secret:
+        raise RuntimeError("TICKET_SECRET is not set; it signs the tickets in confirmation emails")
+    return secret.encode()
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def ticket_id(email: str, conference_date: str) -> str:
+    """Stable per attendee and day, so a re-sent email carries the same ticket."""
+    digest = hmac.new(ticket_secret(), f"id|{email.strip().lower()}|{conference_date}".encode(), hashlib.sha256).digest()
+    return _b64(digest[:9])
+
+
+def issue(email: str, name: str, tier: str, conference_date: str) -> str:
+    """
+    Signed ticket token for a confirmation email (and its QR code):
+    IP1.<payload>.<signature>, both parts base64url. Anyone holding
+    TICKET_SECRET can verify it offline.
+    """
+    payload = json.dumps(
+        {"id": ticket_id(email, conference_date), "e": email, "n": name, "t": tier, "d": conference_date},
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode()
+    body = f"{TICKET_PREFIX}.{_b64(payload)}"
+    signature = hmac.new(ticket_secret(), body.encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+    return f"{body}.{_b64(signature)}"
+
+
+def verify(token: str) -> dict | None:
+    """The ticket's fields if the token is genuine, else None. No network involved."""
+    try:
+        prefix, payload, signature = token.strip().split(".")
+        if prefix != TICKET_PREFIX:
+            return None
+        expected = hmac.new(ticket_secret(), f"{prefix}.{payload}".encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+        if not hmac.compare_digest(expected, _unb64(signature)):
+            return None
+        fields = json.loads(_unb64(payload))
+    except (ValueError, TypeError):
+        return None
+    return {
+        "ticket_id": fields["id"],
+        "email": fields["e"],
+        "name": fields["n"],
+        "tier": fields["t"],
+        "conference_date": fields["d"],
+    }
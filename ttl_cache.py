@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Small thread-safe dict whose entries expire `ttl` seconds after they are set.
+
+    Bounded to `maxsize` entries; when full, the oldest entry is evicted.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10_000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None or item[0] < time.monotonic():
+            return default
+        return item[1]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DayCache:
+    """
+    Thread-safe dict for values that only hold for one day. Every get/set
+    names the day it is for; the first call for a new day drops everything
+    cached for the previous one. Bounded to `maxsize` entries.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._day = None
+        self._data: dict = {}
+        self._lock = threading.Lock()
+
+    def _roll(self, day):
+        if day != self._day:
+            self._day = day
+            self._data = {}
+
+    def get(self, day, key, default=None):
+        with self._lock:
+            self._roll(day)
+            return self._data.get(key, default)
+
+    def set(self, day, key, value):
+        with self._lock:
+            self._roll(day)
+            if key in self._data or len(self._data) < self.maxsize:
+                self._data[key] = value
+
+    def __len__(self):
+        return len(self._data)
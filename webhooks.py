@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from blocking import run_blocking
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id TEXT NOT NULL UNIQUE,
+    event TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    done_at REAL
+);
+CREATE INDEX IF NOT EXISTS webhook_events_pending
+    ON webhook_events (next_attempt_at) WHERE done_at IS NULL;
+"""
+
+
+class WebhookPipeline:
+    """
+    Durable queue for webhook events that have already been acknowledged.
+
+    The endpoint verifies the event and commits it here (SQLite, WAL mode)
+    before answering 200, so a restart can't lose an acked event. A
+    background task runs `handler` on due events, up to `workers` at a
+    time. Because Razorpay considers an acked event delivered, a failing
+    handler is retried here with capped exponential backoff (outliving a
+    Razorpay circuit that is open for a while) until the event is
+    `give_up_after` seconds old; then `on_give_up` is called so the caller
+    can let Razorpay's next redelivery through.
+
+    Like the registration outbox, several workers on one host can share
+    the file: due() leases the events it returns for `lease` seconds.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        handler: Callable[[dict], Awaitable[None]],
+        workers: int = 2,
+        backoff: float = 1.0,
+        max_backoff: float = 300.0,
+        give_up_after: float = 86400.0,
+        lease: float = 60.0,
+        interval: float = 1.0,
+        on_give_up: Callable[[str, dict], Awaitable[None]] | None = None,
+        synchronous: str = "FULL",
+    ):
+        self.path = path
+        self.handler = handler
+        self.workers = workers
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.give_up_after = give_up_after
+        self.lease = lease
+        self.interval = interval
+        self.on_give_up = on_give_up
+        self.synchronous = synchronous
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    # --- storage (blocking; call through run_blocking from async code) ---
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _write(self, sql: str, params) -> int:
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                cur = db.executemany(sql, params) if isinstance(params, list) else db.execute(sql, params)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return cur.rowcount
+
+    def add_event(self, event: dict, event_id: str | None = None) -> bool:
+        """Commit an event. Returns False if one with the same id is already stored."""
+        return self._write(
+            "INSERT OR IGNORE INTO webhook_events (event_id, event, created_at) VALUES (?, ?, ?)",
+            (event_id or uuid.uuid4().hex, json.dumps(event), time.time()),
+        ) > 0
+
+    def due(self, limit: int) -> list[tuple[int, str, int, float, dict]]:
+        """Lease up to `limit` events that are due; mark() ends the lease."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = db.execute(
+                    "SELECT id, event_id, attempts, created_at, event FROM webhook_events"
+                    " WHERE done_at IS NULL AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                db.executemany(
+                    "UPDATE webhook_events SET next_attempt_at = ? WHERE id = ?",
+                    [(now + self.lease, row[0]) for row in rows],
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return [(rid, event_id, attempts, created, json.loads(event)) for rid, event_id, attempts, created, event in rows]
+
+    def mark(self, rid: int, attempts: int, error: str | None = None):
+        """Record an attempt: handled if there's no error, otherwise due again after backoff."""
+        now = time.time()
+        if error is None:
+            self._write("UPDATE webhook_events SET attempts = ?, last_error = NULL, done_at = ? WHERE id = ?", (attempts, now, rid))
+        else:
+            retry_at = now + min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+            self._write(
+                "UPDATE webhook_events SET attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                (attempts, error, retry_at, rid),
+            )
+
+    def give_up(self, rid: int, attempts: int, error: str):
+        """Stop retrying an event, freeing its id so a redelivery is stored again."""
+        self._write(
+            "UPDATE webhook_events SET attempts = ?, last_error = ?, done_at = ?, event_id = event_id || ':gave-up:' || id WHERE id = ?",
+            (attempts, error, time.time(), rid),
+        )
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM webhook_events WHERE done_at IS NULL").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --- async API ---
+
+    async def submit(self, event: dict, event_id: str | None = None) -> bool:
+        """Commit an event for processing. Returns False if it was already stored."""
+        added = await run_blocking(self.add_event, event, event_id)
+        if self._wake is not None:
+            self._wake.set()
+        return added
+
+    async def process_once(self) -> int:
+        """Run the handler on one batch of due events. Returns how many were leased."""
+        batch = await run_blocking(self.due, self.workers)
+        await asyncio.gather(*(self._process(*row) for row in batch))
+        return len(batch)
+
+    async def _process(self, rid: int, event_id: str, attempts: int, created_at: float, event: dict):
+        attempts += 1
+        try:
+            await self.handler(event)
+        except Exception as e:
+            if time.time() - created_at < self.give_up_after:
+                log.warning("webhook handler failed, will retry", extra={"event": event.get("event"), "attempts": attempts, "error": str(e)})
+                await run_blocking(self.mark, rid, attempts, str(e))
+                return
+            log.error("webhook handler gave up", extra={"event": event.get("event"), "attempts": attempts, "error": str(e)})
+            await run_blocking(self.give_up, rid, attempts, str(e))
+            if self.on_give_up is not None:
+                await self.on_give_up(event_id, event)
+            return
+        await run_blocking(self.mark, rid, attempts)
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop taking events; anything unfinished stays stored for the next start."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                leased = await self.process_once()
+            except Exception as e:
+                log.error("webhook processing failed", extra={"error": str(e)})
+                leased = 0
+            if leased:
+                continue   # more may be waiting; keep draining
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()